@@ -6,6 +6,8 @@ class Settings(BaseSettings):
     NEO4J_USER: str
     NEO4J_PASSWORD: str
     LOG_LEVEL: str = "INFO"
+    # Max age of the in-memory item bank (question writes in this process invalidate it immediately)
+    ITEM_BANK_REFRESH_SECONDS: float = 60.0
 
     model_config = SettingsConfigDict(
         env_file=".env",
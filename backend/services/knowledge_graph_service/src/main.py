@@ -13,6 +13,7 @@ from neo4j import AsyncSession
 from . import schemas
 from .database import close_driver, get_db_session, init_driver
 from .logger import setup_logging
+from .services.item_bank import item_bank
 from .services.pathfinder import Pathfinder
 
 
@@ -129,6 +130,7 @@ async def delete_concept(concept_id: str, db: AsyncSession = Depends(get_db_sess
         if not await (await db.run("MATCH (c:Concept {id: $id}) RETURN c", {"id": concept_id})).single():
             raise HTTPException(status_code=404, detail="Not found")
         await db.run("MATCH (c:Concept {id: $id}) DETACH DELETE c", {"id": concept_id})
+        item_bank.invalidate()  # Its questions are no longer reachable
     except Exception as e:
         logger.error(f"Delete error: {e}")
         raise HTTPException(status_code=500, detail=str(e)) from e
@@ -520,6 +522,7 @@ async def add_question_to_concept(
         )
         if not await result.single():
             raise HTTPException(status_code=404, detail="Concept not found")
+        item_bank.invalidate()
         return {"status": "created", "question_id": q_id}
     except Exception as e:
         logger.error(f"Add question error: {e}")
@@ -587,47 +590,57 @@ async def get_questions_batch(req: schemas.BatchQuestionsRequest, db: AsyncSessi
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
-@app.post("/api/v1/questions/adaptive", response_model=schemas.AdaptiveQuestionResponse | None)
-async def get_adaptive_question(req: schemas.AdaptiveQuestionRequest, db: AsyncSession = Depends(get_db_session)):
+@app.put("/api/v1/questions/calibration", response_model=schemas.QuestionCalibrationResponse)
+async def update_question_calibration(
+    req: schemas.QuestionCalibrationRequest, db: AsyncSession = Depends(get_db_session)
+):
     """
-    Finds a single question closest to the target difficulty.
-    Returns the question AND its concept_id.
+    Bulk-writes calibrated IRT parameters (ML service item calibration) onto Question nodes.
+    Unknown question ids are ignored.
     """
     query = (
-        "MATCH (c:Concept)-[:HAS_QUESTION]->(q:Question) "
-        "WHERE c.id IN $concept_ids "
-        "AND NOT q.id IN $exclude_ids "
-        "WITH q, c, abs(q.difficulty - $target) as diff_delta "
-        "ORDER BY diff_delta ASC "
-        "LIMIT 1 "
-        "RETURN q, c.id as concept_id"
+        "UNWIND $items AS item "
+        "MATCH (q:Question {id: item.question_id}) "
+        "SET q.difficulty = item.difficulty, q.discrimination = item.discrimination, "
+        "q.calibration_responses = item.responses, q.calibrated_at = datetime() "
+        "RETURN count(q) AS updated"
     )
-
-    params = {"concept_ids": req.concept_ids, "exclude_ids": req.exclude_question_ids, "target": req.target_difficulty}
-
     try:
-        result = await db.run(query, params)
+        result = await db.run(query, {"items": [item.model_dump() for item in req.items]})
         record = await result.single()
+        item_bank.invalidate()
+        return schemas.QuestionCalibrationResponse(updated=record["updated"] if record else 0)
+    except Exception as e:
+        logger.error(f"Question calibration error: {e}")
+        raise HTTPException(status_code=500, detail=str(e)) from e
 
-        if not record:
-            return None
-
-        q_data = dict(record["q"])
-
-        # Handle JSON options if stored as string in Neo4j
-        if isinstance(q_data.get("options"), str):
-            q_data["options"] = json.loads(q_data["options"])
-
-        # 2. Inject concept_id from the graph relationship
-        q_data["concept_id"] = record["concept_id"]
-
-        # 3. Return using the NEW schema
-        return schemas.AdaptiveQuestionResponse(**q_data)
 
+@app.post("/api/v1/questions/adaptive", response_model=schemas.AdaptiveQuestionResponse | None)
+async def get_adaptive_question(req: schemas.AdaptiveQuestionRequest, db: AsyncSession = Depends(get_db_session)):
+    """
+    Finds a single question closest to the target difficulty.
+    Returns the question AND its concept_id.
+    Served from the in-memory item bank (bisect per concept), not a graph query.
+    """
+    try:
+        await item_bank.ensure_loaded(db)
     except Exception as e:
-        logger.error(f"Adaptive Q fetch error: {e}")
+        logger.error(f"Item bank load error: {e}")
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+    item = item_bank.select(req.concept_ids, req.target_difficulty, req.exclude_question_ids)
+    if item is None:
+        return None
+
+    return schemas.AdaptiveQuestionResponse(
+        id=item.id,
+        text=item.text,
+        options=item.options,
+        difficulty=item.difficulty,
+        discrimination=item.discrimination,
+        concept_id=item.concept_id,
+    )
+
 
 @app.post("/api/v1/path/optimal", response_model=schemas.OptimalPathResponse)
 async def generate_optimal_path(req: schemas.OptimalPathRequest, db: AsyncSession = Depends(get_db_session)):
@@ -115,9 +115,25 @@ class Question(BaseModel):
     text: str
     options: list[QuestionOption]
     difficulty: float = 1.0
+    discrimination: float = 1.0  # IRT 'a', set by the ML service's item calibration
     model_config = {"from_attributes": True}
 
 
+class QuestionCalibration(BaseModel):
+    question_id: str
+    difficulty: float  # KG scale (1.0 - 10.0)
+    discrimination: float
+    responses: int  # Responses the parameters were fitted on
+
+
+class QuestionCalibrationRequest(BaseModel):
+    items: list[QuestionCalibration]
+
+
+class QuestionCalibrationResponse(BaseModel):
+    updated: int
+
+
 class QuizResponse(BaseModel):
     questions: list[Question]
 
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+from neo4j import AsyncSession
+
+from ..config import settings
+
+
+@dataclass(frozen=True)
+class BankItem:
+    id: str
+    concept_id: str
+    text: str
+    options: list[dict[str, Any]]  # Parsed once at load time
+    difficulty: float
+    discrimination: float
+
+
+class ConceptItems:
+    """Questions of one concept sorted by difficulty, with a parallel key list for bisect."""
+
+    def __init__(self, items: list[BankItem]):
+        self.items = sorted(items, key=lambda item: item.difficulty)
+        self.difficulties = [item.difficulty for item in self.items]
+
+    def nearest(self, target: float, exclude: set[str]) -> BankItem | None:
+        """Closest non-excluded item to `target`: bisect, then walk outwards past excluded ids."""
+        right = bisect_left(self.difficulties, target)
+        left = right - 1
+        while left >= 0 and self.items[left].id in exclude:
+            left -= 1
+        while right < len(self.items) and self.items[right].id in exclude:
+            right += 1
+
+        if left < 0:
+            return self.items[right] if right < len(self.items) else None
+        if right >= len(self.items):
+            return self.items[left]
+        if target - self.difficulties[left] <= self.difficulties[right] - target:
+            return self.items[left]
+        return self.items[right]
+
+
+class ItemBank:
+    """
+    In-memory index of all questions per concept, used for adaptive (CAT) item selection.
+
+    Loaded with one graph query and kept until a question write in this process invalidates it
+    or `refresh_seconds` pass (picks up writes made by other workers or seed scripts).
+    Selecting an item is a bisect per path concept instead of a graph query over every question.
+    """
+
+    def __init__(self, refresh_seconds: float = 60.0):
+        self.refresh_seconds = refresh_seconds
+        self._concepts: dict[str, ConceptItems] = {}
+        self._loaded_at: float | None = None
+        self._generation = 0  # Bumped by every invalidation
+        self._lock = asyncio.Lock()
+
+    def invalidate(self):
+        """Marks the index stale; the next selection reloads it."""
+        self._generation += 1
+        self._loaded_at = None
+
+    def _is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.refresh_seconds
+
+    async def ensure_loaded(self, db: AsyncSession):
+        if self._is_fresh():
+            return
+        async with self._lock:
+            if not self._is_fresh():  # Another request may have reloaded it meanwhile
+                await self.reload(db)
+
+    async def reload(self, db: AsyncSession):
+        started = time.perf_counter()
+        loaded_at, generation = time.monotonic(), self._generation
+        query = "MATCH (c:Concept)-[:HAS_QUESTION]->(q:Question) RETURN c.id AS concept_id, q"
+        result = await db.run(query)
+
+        by_concept: dict[str, list[BankItem]] = {}
+        async for record in result:
+            q = dict(record["q"])
+            options = q.get("options", [])
+            if isinstance(options, str):
+                options = json.loads(options)
+            by_concept.setdefault(record["concept_id"], []).append(
+                BankItem(
+                    id=q["id"],
+                    concept_id=record["concept_id"],
+                    text=q.get("text", ""),
+                    options=options,
+                    difficulty=float(q.get("difficulty", 1.0)),
+                    discrimination=float(q.get("discrimination", 1.0)),
+                )
+            )
+
+        self._concepts = {concept_id: ConceptItems(items) for concept_id, items in by_concept.items()}
+        # A write that landed while loading may be missing from this snapshot: keep it stale then
+        self._loaded_at = loaded_at if generation == self._generation else None
+        total = sum(len(items.items) for items in self._concepts.values())
+        logger.info(
+            f"Item bank loaded: {total} questions over {len(self._concepts)} concepts "
+            f"in {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def select(self, concept_ids: list[str], target_difficulty: float, exclude_ids: list[str]) -> BankItem | None:
+        """The question closest to the target difficulty over all given concepts, skipping used ones."""
+        exclude = set(exclude_ids)
+        best: BankItem | None = None
+        for concept_id in concept_ids:
+            items = self._concepts.get(concept_id)
+            candidate = items.nearest(target_difficulty, exclude) if items else None
+            if candidate and (
+                best is None or abs(candidate.difficulty - target_difficulty) < abs(best.difficulty - target_difficulty)
+            ):
+                best = candidate
+        return best
+
+
+item_bank = ItemBank(settings.ITEM_BANK_REFRESH_SECONDS)
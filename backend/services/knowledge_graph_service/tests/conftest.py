@@ -16,6 +16,7 @@ if project_root not in sys.path:
 from src.config import settings
 from src.database import close_driver, get_db_session, init_driver
 from src.main import app
+from src.services.item_bank import item_bank
 
 
 @pytest_asyncio.fixture(scope="session")
@@ -88,6 +89,8 @@ async def client(db_session: AsyncSession) -> AsyncGenerator[httpx.AsyncClient,
         yield db_session
 
     app.dependency_overrides[get_db_session] = override_get_db_session
+    # The database is wiped between tests, so the in-memory item bank must not outlive one
+    item_bank.invalidate()
 
     # Launch the client
     transport = ASGITransport(app=app)
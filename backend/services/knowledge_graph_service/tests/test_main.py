@@ -161,3 +161,62 @@ async def test_get_shortest_path_no_path(client: httpx.AsyncClient):
     assert response.status_code == 200
     data = response.json()
     assert data["path"] == []
+
+
+async def test_update_question_calibration(client: httpx.AsyncClient, db_session: AsyncSession):
+    """Test 8: Bulk write-back of calibrated IRT parameters onto Question nodes."""
+    concept_id = (await client.post("/api/v1/concepts", json={"name": "Calibrated"})).json()["id"]
+    question = {"text": "2 + 2?", "options": [{"text": "4", "is_correct": True}], "difficulty": 5.0}
+    question_id = (await client.post(f"/api/v1/concepts/{concept_id}/questions", json=question)).json()["question_id"]
+
+    response = await client.put(
+        "/api/v1/questions/calibration",
+        json={
+            "items": [
+                {"question_id": question_id, "difficulty": 7.25, "discrimination": 1.6, "responses": 120},
+                {"question_id": "unknown", "difficulty": 3.0, "discrimination": 0.8, "responses": 60},
+            ]
+        },
+    )
+    assert response.status_code == 200
+    assert response.json() == {"updated": 1}
+
+    quiz = (await client.get(f"/api/v1/concepts/{concept_id}/quiz")).json()["questions"]
+    assert quiz[0]["difficulty"] == 7.25
+    assert quiz[0]["discrimination"] == 1.6
+
+    result = await db_session.run(
+        "MATCH (q:Question {id: $id}) RETURN q.calibration_responses AS responses", id=question_id
+    )
+    assert (await result.single())["responses"] == 120
+
+
+async def test_adaptive_question_from_item_bank(client: httpx.AsyncClient):
+    """Test 9: Nearest-difficulty question selection with exclusions, refreshed on question writes."""
+    concept_a = (await client.post("/api/v1/concepts", json={"name": "A"})).json()["id"]
+    concept_b = (await client.post("/api/v1/concepts", json={"name": "B"})).json()["id"]
+    options = [{"text": "yes", "is_correct": True}, {"text": "no", "is_correct": False}]
+    ids = {}
+    for concept_id, difficulty in [(concept_a, 2.0), (concept_a, 6.0), (concept_b, 4.5)]:
+        question = {"text": f"Q{difficulty}", "options": options, "difficulty": difficulty}
+        response = await client.post(f"/api/v1/concepts/{concept_id}/questions", json=question)
+        ids[difficulty] = response.json()["question_id"]
+
+    async def adaptive(target: float, exclude: list[str]):
+        request = {"concept_ids": [concept_a, concept_b], "target_difficulty": target, "exclude_question_ids": exclude}
+        response = await client.post("/api/v1/questions/adaptive", json=request)
+        assert response.status_code == 200
+        return response.json()
+
+    first = await adaptive(5.0, [])
+    assert first["id"] == ids[4.5]
+    assert first["concept_id"] == concept_b
+    assert first["options"][0] == {"text": "yes", "is_correct": True}
+
+    assert (await adaptive(5.0, [ids[4.5]]))["id"] == ids[6.0]
+    assert await adaptive(5.0, list(ids.values())) is None
+
+    # A new question is visible to the next selection
+    question = {"text": "Q5", "options": options, "difficulty": 5.0}
+    new_id = (await client.post(f"/api/v1/concepts/{concept_a}/questions", json=question)).json()["question_id"]
+    assert (await adaptive(5.0, []))["id"] == new_id
@@ -7,6 +7,16 @@ class Settings(BaseSettings):
     ML_SERVICE_URL: str
     LOG_LEVEL: str = "INFO"
 
+    # Adaptive assessment sessions are kept server-side (path, answer keys, history) for this long
+    # after their last answer. In memory per process by default; set a Redis URL to share them
+    # between workers and keep them across restarts.
+    ADAPTIVE_SESSION_TTL_SECONDS: int = 3600
+    ADAPTIVE_SESSION_MAX_IN_MEMORY: int = 10000
+    ADAPTIVE_SESSION_REDIS_URL: str | None = None
+    # Deprecated: grade submits without a live server-side session from the client-supplied state
+    # (history and current question are then trusted). Off by default; will be removed.
+    ADAPTIVE_SESSION_CLIENT_STATE_FALLBACK: bool = False
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -10,6 +10,7 @@ from . import config, schemas
 from .logger import setup_logging
 from .services.adaptation_engine import adaptation_engine
 from .services.assessment_service import assessment_service
+from .services.session_store import session_store
 
 # Storage for HTTP client
 client_store: dict[str, httpx.AsyncClient] = {}
@@ -24,6 +25,7 @@ async def lifespan(app: FastAPI):
     logger.info("Learning Path Service shutting down...")
     await client_store["client"].aclose()
     client_store.clear()
+    await session_store.close()
 
 
 app = FastAPI(title="Learning Path Service", lifespan=lifespan)
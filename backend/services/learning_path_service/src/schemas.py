@@ -177,15 +177,59 @@ class StudentProfile(BaseModel):
 class AdaptiveSessionState(BaseModel):
     student_id: UUID
     goal_concept_id: str
-    history: list[dict[str, Any]] = []  # List of {question_id, difficulty, correct}
+    history: list[dict[str, Any]] = []  # List of {question_id, difficulty, discrimination, correct}
     start_time: str
     current_question: AssessmentQuestion | None = None
+    session_id: str | None = None  # Server-side session (clients may send just this back)
+
+
+class ServedItem(BaseModel):
+    """Answer key of a question served in an adaptive session (never sent to the client)."""
+
+    correct_idx: int
+    discrimination: float = 1.0
+
+
+class AdaptiveSession(BaseModel):
+    """Server-side adaptive assessment session (see services/session_store.py)."""
+
+    session_id: str
+    student_id: UUID
+    goal_concept_id: str
+    start_time: str
+    path: list[dict[str, Any]] = []  # Goal path concepts as returned by the KG service
+    history: list[dict[str, Any]] = []
+    current_question: AssessmentQuestion | None = None
+    served: dict[str, ServedItem] = {}  # question_id -> answer key
+    exhausted_concepts: list[str] = []  # Path concepts with no questions left to serve
+
+    def public_state(self) -> AdaptiveSessionState:
+        return AdaptiveSessionState(
+            student_id=self.student_id,
+            goal_concept_id=self.goal_concept_id,
+            history=self.history,
+            start_time=self.start_time,
+            current_question=self.current_question,
+            session_id=self.session_id,
+        )
 
 
 class AdaptiveSubmitRequest(BaseModel):
-    session_state: AdaptiveSessionState
+    # Either the session id or the full state (older clients); the server-side session wins
+    session_id: str | None = None
+    session_state: AdaptiveSessionState | None = None
+    # The question being answered; required unless session_state carries it as current_question.
+    # A retried submit of an already graded question gets 409 instead of grading the next one.
+    question_id: str | None = None
     answer_index: int
 
+    @property
+    def answered_question_id(self) -> str | None:
+        if self.question_id:
+            return self.question_id
+        current = self.session_state.current_question if self.session_state else None
+        return current.id if current else None
+
 
 class AdaptiveResponse(BaseModel):
     session_state: AdaptiveSessionState
@@ -7,6 +7,7 @@ from fastapi import HTTPException
 from loguru import logger
 
 from .. import config, schemas
+from .session_store import session_store
 
 
 class AssessmentService:
@@ -114,6 +115,36 @@ class AssessmentService:
                 }
         return question_map
 
+    async def _log_item_responses(
+        self,
+        client: httpx.AsyncClient,
+        student_id: str,
+        question_map: dict[str, Any],
+        answers: dict[str, int],
+        source: str,
+    ):
+        """Sends the graded answers to the ML service's response log (input of IRT item calibration)."""
+        responses = [
+            {"question_id": q_id, "correct": question_map[q_id]["correct_idx"] == selected_idx}
+            for q_id, selected_idx in answers.items()
+            if q_id in question_map
+        ]
+        await self._post_item_responses(client, student_id, responses, source)
+
+    async def _post_item_responses(
+        self, client: httpx.AsyncClient, student_id: str, responses: list[dict[str, Any]], source: str
+    ):
+        if not responses:
+            return
+        try:
+            await client.post(
+                f"{config.settings.ML_SERVICE_URL}/api/v1/irt/responses",
+                json={"student_id": student_id, "source": source, "responses": responses},
+            )
+        except Exception as e:
+            logger.error(f"Failed to log item responses: {e}")
+            # Non-blocking error
+
     def _calculate_mastery_updates(
         self,
         concept_ids: list[str],
@@ -152,6 +183,9 @@ class AssessmentService:
         question_map = self._build_question_map(truth_data)
 
         ml_updates = self._calculate_mastery_updates(concept_ids, question_map, submission.answers)
+        await self._log_item_responses(
+            client, str(submission.student_id), question_map, submission.answers, "assessment"
+        )
 
         if not ml_updates:
             return {}
@@ -203,6 +237,7 @@ class AssessmentService:
 
         score = round(correct_count / total_questions, 2)
         passed = score >= 0.6  # 60% threshold
+        await self._log_item_responses(client, student_id, question_map, submission.answers, "quiz")
 
         # 3. Update ML Service (Mastery)
         # We assume if passed, mastery is high. If failed, it decreases or stays same.
@@ -241,86 +276,159 @@ class AssessmentService:
 
         return schemas.StepQuizResult(passed=passed, score=score, message=message)
 
+    async def _fetch_path(self, client: httpx.AsyncClient, goal_id: str) -> list[dict]:
+        url = f"{config.settings.KG_SERVICE_URL}/api/v1/path"
+        resp = await client.get(url, params={"end_id": goal_id})
+        resp.raise_for_status()
+        return resp.json().get("path", [])
+
     async def start_adaptive_assessment(
         self, client: httpx.AsyncClient, student_id: str, goal_concept_id: str
     ) -> schemas.AdaptiveResponse:
-        # 1. Initialize State
-        state = schemas.AdaptiveSessionState(
+        # 1. Initialize the server-side session; the goal path is fetched once and cached in it
+        session = schemas.AdaptiveSession(
+            session_id=str(uuid.uuid4()),
             student_id=uuid.UUID(student_id),
             goal_concept_id=goal_concept_id,
             start_time=datetime.now(UTC).isoformat(),
-            history=[],
+            path=await self._fetch_path(client, goal_concept_id),
         )
 
         # 2. Get Initial Question (Target Difficulty 5.0 - Average)
-        return await self._fetch_next_adaptive_step(client, state, target_diff=5.0)
+        return await self._fetch_next_adaptive_step(client, session, target_diff=5.0)
+
+    async def _resolve_adaptive_session(
+        self, client: httpx.AsyncClient, req: schemas.AdaptiveSubmitRequest
+    ) -> schemas.AdaptiveSession:
+        """
+        The stored session for the request, checked against the answered question (409 on a retry
+        or a stale client). Without a live session the request fails with 404, unless the deprecated
+        ADAPTIVE_SESSION_CLIENT_STATE_FALLBACK rebuilds it from the client state (answer key from the KG).
+        """
+        state = req.session_state
+        session_id = req.session_id or (state.session_id if state else None)
+        question_id = req.answered_question_id
+        if not question_id:
+            raise HTTPException(status_code=400, detail="question_id is required")
+        session = await session_store.get(session_id) if session_id else None
+
+        if session is not None:
+            if not session.current_question or session.current_question.id != question_id:
+                raise HTTPException(status_code=409, detail="Question was already answered or is out of date")
+            return session
+
+        if state is None or not config.settings.ADAPTIVE_SESSION_CLIENT_STATE_FALLBACK:
+            raise HTTPException(status_code=404, detail="Adaptive session not found or expired")
+
+        logger.warning(
+            f"No stored adaptive session for {session_id}; rebuilding it from the client state "
+            "(ADAPTIVE_SESSION_CLIENT_STATE_FALLBACK is deprecated)."
+        )
+        if not state.current_question or state.current_question.id != question_id:
+            raise HTTPException(status_code=409, detail="Question was already answered or is out of date")
+        session = schemas.AdaptiveSession(
+            session_id=session_id or str(uuid.uuid4()),
+            student_id=state.student_id,
+            goal_concept_id=state.goal_concept_id,
+            start_time=state.start_time,
+            path=await self._fetch_path(client, state.goal_concept_id),
+            history=state.history,
+            current_question=state.current_question,
+        )
+        last_q = state.current_question
+        if last_q:
+            truth_data = await self._fetch_truth_data(client, [last_q.concept_id], limit=100)
+            q_truth = next((q for item in truth_data for q in item["questions"] if q["id"] == last_q.id), None)
+            if not q_truth:
+                logger.error(f"Verification failed. QID: {last_q.id} not found in {len(truth_data)} concepts.")
+                raise HTTPException(status_code=500, detail="Question verification failed")
+            session.served[last_q.id] = schemas.ServedItem(
+                correct_idx=next((i for i, o in enumerate(q_truth["options"]) if o.get("is_correct")), -1),
+                discrimination=q_truth.get("discrimination", 1.0),
+            )
+        return session
 
     async def submit_adaptive_answer(
         self, client: httpx.AsyncClient, req: schemas.AdaptiveSubmitRequest, auth_header: str
     ) -> schemas.AdaptiveResponse:
-        state = req.session_state
-        last_q = state.current_question
+        session = await self._resolve_adaptive_session(client, req)
+        last_q = session.current_question
 
         if not last_q:
             raise HTTPException(status_code=400, detail="No active question in state")
 
-        # 1. Grade the Answer
-        # In a secure implementation, we'd verify against KG.
-        # For MVP, assuming the client sent back the state containing the options we gave them.
-        # We need to re-fetch truth or trust the options if we embed 'is_correct' (We sanitized it earlier).
-        # Let's fetch the truth briefly to be safe.
-        truth_data = await self._fetch_truth_data(client, [last_q.concept_id], limit=100)
-        q_truth = next((q for item in truth_data for q in item["questions"] if q["id"] == last_q.id), None)
+        # Concurrent submits (double taps, timeout retries) read the same session; only one may grade it
+        if not await session_store.claim(session.session_id, last_q.id):
+            raise HTTPException(status_code=409, detail="Question was already answered or is out of date")
+        try:
+            return await self._grade_adaptive_answer(client, session, last_q, req, auth_header)
+        except BaseException:
+            # Nothing was stored for this answer, so it may be submitted again
+            await session_store.release(session.session_id, last_q.id)
+            raise
 
-        if not q_truth:
-            logger.error(f"Verification failed. QID: {last_q.id} not found in {len(truth_data)} concepts.")
+    async def _grade_adaptive_answer(
+        self,
+        client: httpx.AsyncClient,
+        session: schemas.AdaptiveSession,
+        last_q: schemas.AssessmentQuestion,
+        req: schemas.AdaptiveSubmitRequest,
+        auth_header: str,
+    ) -> schemas.AdaptiveResponse:
+        # 1. Grade the Answer against the key stored when the question was served
+        served = session.served.get(last_q.id)
+        if served is None:
+            logger.error(f"No answer key stored for QID: {last_q.id} in session {session.session_id}.")
             raise HTTPException(status_code=500, detail="Question verification failed")
-
-        correct_idx = next((i for i, o in enumerate(q_truth["options"]) if o.get("is_correct")), -1)
-        is_correct = req.answer_index == correct_idx
+        is_correct = req.answer_index == served.correct_idx
 
         logger.info(
-            f"Grading Q={last_q.id}: StudentIdx={req.answer_index}, CorrectIdx={correct_idx}, "
-            f"IsCorrect={is_correct}. Options={q_truth['options']}"
+            f"Grading Q={last_q.id}: StudentIdx={req.answer_index}, CorrectIdx={served.correct_idx}, "
+            f"IsCorrect={is_correct}"
         )
 
         # 2. Update History
-        state.history.append({"question_id": last_q.id, "difficulty": last_q.difficulty, "correct": is_correct})
+        session.history.append(
+            {
+                "question_id": last_q.id,
+                "difficulty": last_q.difficulty,
+                "discrimination": served.discrimination,
+                "correct": is_correct,
+                "concept_id": last_q.concept_id,
+            }
+        )
+        session.current_question = None
 
         # 3. Call ML Service (IRT Engine)
         ml_url = f"{config.settings.ML_SERVICE_URL}/api/v1/irt/evaluate"
-        ml_resp = await client.post(ml_url, json={"history": state.history})
+        path_concept_ids = [c["id"] for c in session.path if c["id"] not in session.exhausted_concepts]
+        ml_resp = await client.post(ml_url, json={"history": session.history, "concept_ids": path_concept_ids})
         ml_resp.raise_for_status()
         irt_data = ml_resp.json()
 
         # 4. Check Stop Condition
-        if irt_data["stop_test"] or len(state.history) >= 15:
+        # The ML service owns the test length (SE stop, maximum items per IRT mode)
+        if irt_data["stop_test"]:
             # FINISH
             final_mastery = irt_data["current_mastery"]
 
             # Save to ML Service (Batch Update)
-            # We credit all concepts in the goal path with this estimated mastery
-            path_concepts = await self._fetch_concept_path(client, state.goal_concept_id)
-            updates = [{"concept_id": c, "mastery_level": final_mastery} for c in path_concepts]
+            # Per-concept IRT mode credits each path concept with its own estimate; otherwise every concept
+            # in the goal path (cached in the session) gets the overall mastery
+            kgs_concepts = [schemas.KGSConcept(**c) for c in session.path]
+            concept_mastery = {c["concept_id"]: c["mastery"] for c in irt_data.get("concepts", [])}
+            mastery_map = {c.id: concept_mastery.get(c.id, final_mastery) for c in kgs_concepts}
+            updates = [{"concept_id": c_id, "mastery_level": mastery} for c_id, mastery in mastery_map.items()]
 
             await client.post(
                 f"{config.settings.ML_SERVICE_URL}/api/v1/knowledge/batch-update",
-                json={"student_id": str(state.student_id), "updates": updates},
+                json={"student_id": str(session.student_id), "updates": updates},
             )
 
             logger.info(f"Adaptive test complete. Mastery: {final_mastery}. Generating path...")
 
-            # Fetch Raw Path from KG
             from .adaptation_engine import adaptation_engine  # Local import to avoid circular dependency
 
-            kg_path_url = f"{config.settings.KG_SERVICE_URL}/api/v1/path"
-            path_resp = await client.get(kg_path_url, params={"end_id": state.goal_concept_id})
-            kgs_path_data = path_resp.json().get("path", [])
-            kgs_concepts = [schemas.KGSConcept(**c) for c in kgs_path_data]
-
-            # Construct Mastery Map (All concepts get the estimated mastery)
-            mastery_map = {c.id: final_mastery for c in kgs_concepts}
-
             # Generate Personalized Steps
             # We pass 'None' for profile as we might not have it cached, or fetch it if needed.
             # For now, standard adaptation is fine.
@@ -328,7 +436,7 @@ class AssessmentService:
 
             # Prepare payload for User Service
             us_path_data = schemas.USLearningPathCreate(
-                goal_concepts=[state.goal_concept_id],
+                goal_concepts=[session.goal_concept_id],
                 steps=us_steps,
                 estimated_time=total_time,
             )
@@ -343,8 +451,10 @@ class AssessmentService:
             us_response.raise_for_status()
             created_path = schemas.LearningPathResponse(**us_response.json())
 
+            await session_store.delete(session.session_id)
+            await self._log_cat_response(client, session)
             return schemas.AdaptiveResponse(
-                session_state=state,
+                session_state=session.public_state(),
                 completed=True,
                 final_mastery=final_mastery,
                 message="Assessment Complete",
@@ -352,29 +462,60 @@ class AssessmentService:
             )
 
         # 5. Fetch Next Question
-        return await self._fetch_next_adaptive_step(client, state, irt_data["next_difficulty_target"])
+        response = await self._fetch_next_adaptive_step(
+            client, session, irt_data["next_difficulty_target"], irt_data.get("next_concept_id")
+        )
+        await self._log_cat_response(client, session)
+        return response
+
+    async def _log_cat_response(self, client: httpx.AsyncClient, session: schemas.AdaptiveSession):
+        """
+        Logs the answer just graded for item calibration. Only the submit that claimed the question gets
+        here, so concurrent or replayed submits (rejected with 409) cannot log the same answer twice.
+        """
+        last = session.history[-1]
+        await self._post_item_responses(
+            client,
+            str(session.student_id),
+            [{"question_id": last["question_id"], "correct": last["correct"]}],
+            "cat",
+        )
 
     async def _fetch_next_adaptive_step(
-        self, client: httpx.AsyncClient, state: schemas.AdaptiveSessionState, target_diff: float
+        self,
+        client: httpx.AsyncClient,
+        session: schemas.AdaptiveSession,
+        target_diff: float,
+        target_concept_id: str | None = None,
     ) -> schemas.AdaptiveResponse:
-        path_concepts = await self._fetch_concept_path(client, state.goal_concept_id)
-        used_ids = [h["question_id"] for h in state.history]
+        path_concepts = [c["id"] for c in session.path]
+        used_ids = [h["question_id"] for h in session.history]
 
         kg_url = f"{config.settings.KG_SERVICE_URL}/api/v1/questions/adaptive"
-        kg_resp = await client.post(
-            kg_url,
-            json={"concept_ids": path_concepts, "target_difficulty": target_diff, "exclude_question_ids": used_ids},
-        )
+        payload = {"concept_ids": path_concepts, "target_difficulty": target_diff, "exclude_question_ids": used_ids}
+        kg_resp = None
+        if target_concept_id:
+            # Per-concept IRT asks for the least certain concept; fall back to the whole path once it runs dry
+            kg_resp = await client.post(kg_url, json={**payload, "concept_ids": [target_concept_id]})
+        if kg_resp is None or kg_resp.status_code != 200 or not kg_resp.json():
+            if target_concept_id:
+                session.exhausted_concepts.append(target_concept_id)
+            kg_resp = await client.post(kg_url, json=payload)
 
         if kg_resp.status_code != 200 or not kg_resp.json():
             # Graceful exit if no questions remain
+            await session_store.delete(session.session_id)
             return schemas.AdaptiveResponse(
-                session_state=state, completed=True, message="No more suitable questions found."
+                session_state=session.public_state(), completed=True, message="No more suitable questions found."
             )
 
         q_raw = kg_resp.json()
 
-        # Sanitize options for client
+        # Keep the answer key server-side and sanitize options for client
+        session.served[q_raw["id"]] = schemas.ServedItem(
+            correct_idx=next((i for i, o in enumerate(q_raw["options"]) if o.get("is_correct")), -1),
+            discrimination=q_raw.get("discrimination", 1.0),
+        )
         options = [{"text": o["text"], "id": i} for i, o in enumerate(q_raw["options"])]
 
         assigned_concept_id = q_raw.get("concept_id")
@@ -390,8 +531,9 @@ class AssessmentService:
             difficulty=q_raw.get("difficulty", target_diff),
         )
 
-        state.current_question = next_q
-        return schemas.AdaptiveResponse(session_state=state)
+        session.current_question = next_q
+        await session_store.save(session)
+        return schemas.AdaptiveResponse(session_state=session.public_state())
 
 
 assessment_service = AssessmentService()
@@ -0,0 +1,114 @@
+import time
+from collections import OrderedDict
+
+from loguru import logger
+
+from .. import config, schemas
+
+
+class InMemorySessionStore:
+    """
+    Adaptive sessions of this process, expiring `ttl_seconds` after their last write.
+    At most `max_sessions` are kept; the least recently written one goes first.
+    """
+
+    def __init__(self, ttl_seconds: int, max_sessions: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: OrderedDict[str, tuple[float, schemas.AdaptiveSession]] = OrderedDict()
+        self._claims: OrderedDict[tuple[str, str], float] = OrderedDict()
+
+    async def get(self, session_id: str) -> schemas.AdaptiveSession | None:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        expires_at, session = entry
+        if expires_at < time.monotonic():
+            del self._sessions[session_id]
+            return None
+        # A copy, so a request that fails midway leaves the stored session untouched
+        return session.model_copy(deep=True)
+
+    async def save(self, session: schemas.AdaptiveSession):
+        self._sessions[session.session_id] = (time.monotonic() + self.ttl_seconds, session.model_copy(deep=True))
+        self._sessions.move_to_end(session.session_id)
+        self._purge()
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def claim(self, session_id: str, question_id: str) -> bool:
+        """
+        Marks the question of the session as being answered; False if it already was. No await between
+        the check and the write, so of concurrent submits on this event loop exactly one wins.
+        """
+        now = time.monotonic()
+        # Same TTL for every claim: the oldest expire first
+        while self._claims and next(iter(self._claims.values())) < now:
+            self._claims.popitem(last=False)
+        key = (session_id, question_id)
+        if key in self._claims:
+            return False
+        self._claims[key] = now + self.ttl_seconds
+        return True
+
+    async def release(self, session_id: str, question_id: str):
+        self._claims.pop((session_id, question_id), None)
+
+    async def close(self):
+        self._sessions.clear()
+        self._claims.clear()
+
+    def _purge(self):
+        now = time.monotonic()
+        # Oldest writes first: stop at the first live one once the size limit is met
+        while self._sessions:
+            session_id, (expires_at, _) = next(iter(self._sessions.items()))
+            if expires_at >= now and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+
+
+class RedisSessionStore:
+    """Adaptive sessions as JSON under `<prefix><session_id>`, with the TTL renewed on every write."""
+
+    def __init__(self, redis_url: str, ttl_seconds: int, prefix: str = "lps:adaptive:"):
+        import redis.asyncio as redis
+
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.client = redis.Redis.from_url(redis_url)
+
+    async def get(self, session_id: str) -> schemas.AdaptiveSession | None:
+        raw = await self.client.get(self.prefix + session_id)
+        return schemas.AdaptiveSession.model_validate_json(raw) if raw else None
+
+    async def save(self, session: schemas.AdaptiveSession):
+        await self.client.set(self.prefix + session.session_id, session.model_dump_json(), ex=self.ttl_seconds)
+
+    async def delete(self, session_id: str):
+        await self.client.delete(self.prefix + session_id)
+
+    async def claim(self, session_id: str, question_id: str) -> bool:
+        """SET NX on `<prefix>claim:<session_id>:<question_id>`: one submit wins across all processes."""
+        return bool(await self.client.set(self._claim_key(session_id, question_id), 1, nx=True, ex=self.ttl_seconds))
+
+    async def release(self, session_id: str, question_id: str):
+        await self.client.delete(self._claim_key(session_id, question_id))
+
+    def _claim_key(self, session_id: str, question_id: str) -> str:
+        return f"{self.prefix}claim:{session_id}:{question_id}"
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_session_store() -> InMemorySessionStore | RedisSessionStore:
+    settings = config.settings
+    if settings.ADAPTIVE_SESSION_REDIS_URL:
+        logger.info("Adaptive sessions are stored in Redis.")
+        return RedisSessionStore(settings.ADAPTIVE_SESSION_REDIS_URL, settings.ADAPTIVE_SESSION_TTL_SECONDS)
+    return InMemorySessionStore(settings.ADAPTIVE_SESSION_TTL_SECONDS, settings.ADAPTIVE_SESSION_MAX_IN_MEMORY)
+
+
+session_store = create_session_store()
@@ -0,0 +1,68 @@
+"""
+Throughput of batch-of-one DKT inference vs the dynamic micro-batcher under concurrent callers.
+
+Usage (from ml_service/):
+    python -m benchmarks.bench_dkt_batching --requests 4000 --concurrency 64 --max-batch 64 --max-wait-ms 5
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+from src.models.dkt import DKT
+from src.services.inference_batcher import InferenceBatcher
+
+NUM_CONCEPTS = 123
+HIDDEN_DIM = 128
+
+
+def make_requests(count: int, max_len: int) -> list[list[int]]:
+    rng = random.Random(42)
+    return [[rng.randrange(NUM_CONCEPTS * 2) for _ in range(rng.randint(1, max_len))] for _ in range(count)]
+
+
+def run(call, requests: list[list[int]], concurrency: int) -> float:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, requests))
+    return len(requests) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-len", type=int, default=50)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)
+    model = DKT(NUM_CONCEPTS, HIDDEN_DIM, 1, NUM_CONCEPTS).eval()
+    requests = make_requests(args.requests, args.max_len)
+
+    def unbatched(tokens: list[int]):
+        with torch.no_grad():
+            return model.step(torch.tensor([tokens], dtype=torch.long))
+
+    def forward(x, lengths, hidden):
+        with torch.no_grad():
+            return model.step(x, hidden, lengths)
+
+    batcher = InferenceBatcher(forward, 1, HIDDEN_DIM, args.max_batch, args.max_wait_ms)
+
+    unbatched_rps = run(unbatched, requests, args.concurrency)
+    batched_rps = run(batcher.submit, requests, args.concurrency)
+
+    print(
+        f"requests={args.requests} concurrency={args.concurrency} max_batch={args.max_batch} wait={args.max_wait_ms}ms"
+    )
+    print(f"unbatched: {unbatched_rps:>10.1f} req/s")
+    print(f"batched:   {batched_rps:>10.1f} req/s  ({batched_rps / unbatched_rps:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Latency of the full-sequence DKT path vs the incremental (cached hidden state) path.
+
+Usage (from ml_service/):
+    python -m benchmarks.bench_dkt_incremental --histories 50 200 1000 --iterations 500
+"""
+
+import argparse
+import time
+
+import numpy as np
+import torch
+
+from src.models.dkt import DKT
+
+NUM_CONCEPTS = 123
+HIDDEN_DIM = 128
+
+
+def percentiles(samples: list[float]) -> tuple[float, float]:
+    arr = np.array(samples) * 1000.0  # ms
+    return float(np.percentile(arr, 50)), float(np.percentile(arr, 99))
+
+
+def bench(model: DKT, history_len: int, window: int, iterations: int):
+    history = torch.randint(0, NUM_CONCEPTS * 2, (1, history_len), dtype=torch.long)
+    token = torch.randint(0, NUM_CONCEPTS * 2, (1, 1), dtype=torch.long)
+
+    with torch.no_grad():
+        _, hidden = model.step(history)
+
+        results = {}
+        for name, seq in (("full (window)", history[:, -window:]), ("full (all)", history)):
+            samples = []
+            for _ in range(iterations):
+                start = time.perf_counter()
+                model.step(seq)
+                samples.append(time.perf_counter() - start)
+            results[name] = percentiles(samples)
+
+        samples = []
+        for _ in range(iterations):
+            start = time.perf_counter()
+            model.step(token, hidden)
+            samples.append(time.perf_counter() - start)
+        results["incremental"] = percentiles(samples)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--histories", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--window", type=int, default=50, help="DKT_MAX_SEQ_LEN of the full path")
+    parser.add_argument("--iterations", type=int, default=500)
+    args = parser.parse_args()
+
+    torch.set_num_threads(1)  # One Celery task == one core
+    model = DKT(NUM_CONCEPTS, HIDDEN_DIM, 1, NUM_CONCEPTS).eval()
+
+    print(f"{'history':>8} | {'mode':<14} | {'p50 ms':>8} | {'p99 ms':>8}")
+    for history_len in args.histories:
+        for mode, (p50, p99) in bench(model, history_len, args.window, args.iterations).items():
+            print(f"{history_len:>8} | {mode:<14} | {p50:>8.3f} | {p99:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
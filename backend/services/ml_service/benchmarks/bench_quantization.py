@@ -0,0 +1,100 @@
+"""
+Per-call latency and resident memory of float32 vs int8 dynamically quantized DKT and DQN inference.
+
+Each mode runs in its own spawned process, so the resident-memory figures do not share allocations.
+Memory is reported as the RSS growth after torch is imported (models built, converted and run).
+
+Usage (from ml_service/):
+    python -m benchmarks.bench_quantization --calls 2000
+    python -m benchmarks.bench_quantization --hidden-dim 512 --window 200
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+import time
+
+import numpy as np
+import torch
+
+from src.models.dkt import DKT
+from src.models.quantization import max_deviation, quantize_dynamic
+from src.models.rl import DQN
+
+NUM_CONCEPTS = 123
+DQN_INPUT_DIM = NUM_CONCEPTS + 11
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        resident_pages = int(f.read().split()[1])
+    return resident_pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def percentiles(call, calls: int) -> tuple[float, float]:
+    for _ in range(50):
+        call()
+    timings = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    p50, p99 = np.percentile(timings, [50, 99])
+    return p50 * 1000, p99 * 1000
+
+
+def run_mode(quantized: bool, args, results):
+    torch.set_num_threads(1)
+    torch.manual_seed(0)
+    baseline = rss_mb()
+
+    dkt = DKT(NUM_CONCEPTS, args.hidden_dim, 1, NUM_CONCEPTS).eval()
+    dqn = DQN(DQN_INPUT_DIM, NUM_CONCEPTS).eval()
+    window = torch.randint(0, NUM_CONCEPTS * 2, (1, args.window))
+    token = torch.randint(0, NUM_CONCEPTS * 2, (1, 1))
+    state = torch.rand((1, DQN_INPUT_DIM))
+
+    deviation = {}
+    if quantized:
+        probe = torch.randint(0, NUM_CONCEPTS * 2, (64, args.window))
+        deviation["dkt"] = max_deviation(dkt, quantize_dynamic(dkt), probe, lambda m, x: m(x))
+        deviation["dqn"] = max_deviation(
+            dqn, quantize_dynamic(dqn), torch.rand((256, DQN_INPUT_DIM)), lambda m, x: m(x), True
+        )
+        dkt, dqn = quantize_dynamic(dkt), quantize_dynamic(dqn)
+
+    with torch.no_grad():
+        _, hidden = dkt.step(window)
+        latency = {
+            "dkt incremental": percentiles(lambda: dkt.step(token, hidden), args.calls),
+            f"dkt window={args.window}": percentiles(lambda: dkt.step(window), args.calls),
+            "dqn forward": percentiles(lambda: dqn(state), args.calls),
+        }
+    results[quantized] = {"latency": latency, "rss_mb": rss_mb() - baseline, "deviation": deviation}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2000)
+    parser.add_argument("--hidden-dim", type=int, default=128)
+    parser.add_argument("--window", type=int, default=50, help="History length of the full-replay call")
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    results = ctx.Manager().dict()
+    for quantized in (False, True):
+        process = ctx.Process(target=run_mode, args=(quantized, args, results))
+        process.start()
+        process.join()
+
+    float_run, int8_run = results[False], results[True]
+    print(f"calls={args.calls} hidden_dim={args.hidden_dim} window={args.window} (p50 / p99 ms)")
+    for name, (f50, f99) in float_run["latency"].items():
+        q50, q99 = int8_run["latency"][name]
+        print(f"{name:<22} float32 {f50:7.3f} / {f99:7.3f}   int8 {q50:7.3f} / {q99:7.3f}   ({f50 / q50:.2f}x p50)")
+    print(f"{'rss growth':<22} float32 {float_run['rss_mb']:7.1f} MB        int8 {int8_run['rss_mb']:7.1f} MB")
+    print(f"max deviation: dkt {int8_run['deviation']['dkt']:.4f} (abs), dqn {int8_run['deviation']['dqn']:.4f} (rel)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Sample + collate time and memory of the old deque-of-lists replay memory vs the NumPy ring buffer.
+
+Usage (from ml_service/):
+    python -m benchmarks.bench_replay --transitions 10000 --batch-size 64
+    python -m benchmarks.bench_replay --memmap /tmp/replay_bench
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+import torch
+
+from src.models.replay import ReplayBuffer
+
+STATE_DIM = 134  # INPUT_DIM_RL + 11 behaviour/cognitive/preference features
+
+
+def fill_deque(count: int) -> deque:
+    rng = random.Random(0)
+    memory = deque(maxlen=count)
+    for _ in range(count):
+        state = [rng.random() for _ in range(STATE_DIM)]
+        next_state = [rng.random() for _ in range(STATE_DIM)]
+        memory.append((state, rng.randrange(123), rng.random(), next_state, False))
+    return memory
+
+
+def fill_buffer(count: int, path: str | None) -> ReplayBuffer:
+    rng = np.random.default_rng(0)
+    buffer = ReplayBuffer(count, STATE_DIM, path=path)
+    for _ in range(count):
+        buffer.add(rng.random(STATE_DIM, dtype=np.float32), 1, 0.5, rng.random(STATE_DIM, dtype=np.float32), False)
+    return buffer
+
+
+def collate_deque(memory: deque, batch_size: int):
+    batch = random.sample(memory, batch_size)
+    states, actions, rewards, next_states, dones = zip(*batch, strict=False)
+    return (
+        torch.FloatTensor(states),
+        torch.LongTensor(actions),
+        torch.FloatTensor(rewards),
+        torch.FloatTensor(next_states),
+        torch.FloatTensor(dones),
+    )
+
+
+def time_per_call(call, iterations: int) -> float:
+    for _ in range(20):
+        call()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        call()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transitions", type=int, default=10000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--memmap", default=None, help="Directory for a memory-mapped ring buffer")
+    args = parser.parse_args()
+
+    tracemalloc.start()
+    memory = fill_deque(args.transitions)
+    deque_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    buffer = fill_buffer(args.transitions, args.memmap)
+
+    deque_us = time_per_call(lambda: collate_deque(memory, args.batch_size), args.iterations)
+    buffer_us = time_per_call(lambda: buffer.sample(args.batch_size), args.iterations)
+
+    per_10k = 10000 / args.transitions / 2**20
+    print(f"transitions={args.transitions} batch={args.batch_size} storage={'memmap' if args.memmap else 'ram'}")
+    print(f"deque of lists: {deque_us:8.1f} us/sample+collate   {deque_bytes * per_10k:7.1f} MB per 10k transitions")
+    print(
+        f"ring buffer:    {buffer_us:8.1f} us/sample+collate   {buffer.nbytes * per_10k:7.1f} MB per 10k transitions"
+        f"   ({deque_us / buffer_us:.1f}x faster)"
+    )
+
+
+if __name__ == "__main__":
+    main()
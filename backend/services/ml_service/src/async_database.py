@@ -0,0 +1,105 @@
+"""
+Async (asyncpg) access for the reads behind the async RL endpoints.
+
+The Celery worker, the offline jobs and the sync endpoints (which FastAPI already runs in its
+threadpool) keep using `database.py`. Only the `async def` handlers await these, so a slow query
+no longer blocks the event loop. Result shapes match the sync functions of the same name.
+"""
+
+import numpy as np
+from loguru import logger
+from sqlalchemy import make_url, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from .config import settings
+from .database import BEHAVIOR_FIELDS, MASTERY_DTYPE, _decode_mastery_vector
+from .utils import CONCEPT_TO_INDEX
+
+async_engine = create_async_engine(
+    make_url(settings.DATABASE_URL).set(drivername="postgresql+asyncpg"),
+    pool_pre_ping=True,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+)
+
+
+async def get_behavioral_profiles_batch(student_ids: list[str], raise_errors: bool = False) -> dict[str, dict]:
+    """
+    Behavioral profiles of many students in one query. Students without a row get the zero profile,
+    as do all students on a DB error unless raise_errors is set.
+    """
+    profiles = {sid: dict.fromkeys(BEHAVIOR_FIELDS, 0.0) for sid in student_ids}
+    if not student_ids:
+        return profiles
+
+    query = text("""
+        SELECT student_id, procrastination_index, gaming_score, engagement_score, hint_rate, error_rate
+        FROM behavioral_profiles
+        WHERE student_id = ANY(CAST(:student_ids AS uuid[]))
+    """)
+    try:
+        async with async_engine.connect() as conn:
+            for row in (await conn.execute(query, {"student_ids": list(student_ids)})).fetchall():
+                profiles[str(row[0])] = dict(zip(BEHAVIOR_FIELDS, row[1:], strict=True))
+    except Exception as e:
+        logger.error(f"DB Error async batch fetch behavior: {e}")
+        if raise_errors:
+            raise
+    return profiles
+
+
+async def get_behavioral_profile(student_id: str) -> dict:
+    return (await get_behavioral_profiles_batch([student_id]))[student_id]
+
+
+async def get_mastery_vectors_batch(student_ids: list[str], raise_errors: bool = False) -> np.ndarray:
+    """
+    Dense mastery of many students, shape (len(student_ids), OUTPUT_DIM_DKT), NaN where unknown
+    (everywhere on a DB error unless raise_errors is set).
+    mastery_vectors in vector mode (rows only for students without a vector), knowledge_states otherwise.
+    """
+    matrix = np.full((len(student_ids), settings.OUTPUT_DIM_DKT), np.nan, dtype=MASTERY_DTYPE)
+    if not student_ids:
+        return matrix
+    position = {sid: i for i, sid in enumerate(student_ids)}
+    missing = list(student_ids)
+
+    try:
+        async with async_engine.connect() as conn:
+            if settings.MASTERY_STORE == "vector":
+                rows = (
+                    await conn.execute(
+                        text(
+                            "SELECT student_id, mastery FROM mastery_vectors WHERE student_id = ANY(CAST(:ids AS uuid[]))"
+                        ),
+                        {"ids": missing},
+                    )
+                ).fetchall()
+                for student_id, raw in rows:
+                    matrix[position[str(student_id)]] = _decode_mastery_vector(raw)[: settings.OUTPUT_DIM_DKT]
+                found = {str(row[0]) for row in rows}
+                missing = [sid for sid in student_ids if sid not in found]
+
+            if missing:
+                rows = (
+                    await conn.execute(
+                        text("""
+                            SELECT student_id, concept_id, mastery_level FROM knowledge_states
+                            WHERE student_id = ANY(CAST(:ids AS uuid[])) AND concept_id = ANY(:vocabulary)
+                        """),
+                        {"ids": missing, "vocabulary": list(CONCEPT_TO_INDEX)},
+                    )
+                ).fetchall()
+                for student_id, concept_id, mastery in rows:
+                    idx = CONCEPT_TO_INDEX[concept_id]
+                    if idx < settings.OUTPUT_DIM_DKT:
+                        matrix[position[str(student_id)], idx] = mastery
+    except Exception as e:
+        logger.error(f"DB Error async batch fetch mastery vectors: {e}")
+        if raise_errors:
+            raise
+    return matrix
+
+
+async def get_mastery_vector(student_id: str) -> np.ndarray:
+    return (await get_mastery_vectors_batch([student_id]))[0]
@@ -11,4 +11,10 @@ celery_app.conf.update(
     timezone="UTC",
     enable_utc=True,
     task_track_started=True,
+    beat_schedule={
+        "sweep-pending-interactions": {
+            "task": "sweep_pending_interactions",
+            "schedule": settings.DKT_PENDING_SWEEP_SECONDS,
+        },
+    },
 )
@@ -1,3 +1,5 @@
+import os
+
 from pydantic_settings import BaseSettings
 
 
@@ -14,6 +16,98 @@ class Settings(BaseSettings):
     OUTPUT_DIM_RL: int = 123
     HIDDEN_DIM: int = 128  # Size of the hidden layer of the LSTM
     LAYER_DIM: int = 1
+    # Concept vocabulary ({concept_id: slot} JSON, default src/concept_mapping.json), synced from the
+    # knowledge graph by `python -m src.training.sync_vocabulary`. When it outgrows the dims above,
+    # the dims grow to the next multiple of CONCEPT_SLOT_GROWTH.
+    CONCEPT_VOCABULARY_PATH: str | None = None
+    CONCEPT_VOCABULARY_RELOAD_SECONDS: float = 30.0
+    CONCEPT_SLOT_GROWTH: int = 32
+    KG_SERVICE_URL: str = "http://knowledge_graph_service:8000"
+
+    # Versioned weights written by the offline jobs: <dir>/dkt/<version>.pth (+ <version>.json)
+    MODEL_REGISTRY_DIR: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models", "data", "registry")
+    # How often each process checks the registry for newer DKT/DQN versions (0 disables hot-swap)
+    MODEL_WATCH_INTERVAL_SECONDS: float = 30.0
+
+    # Async engine (asyncpg) used by the async RL endpoints
+    ASYNC_DB_POOL_SIZE: int = 20
+    ASYNC_DB_MAX_OVERFLOW: int = 10
+    # Threads running CPU-bound torch calls for the async endpoints (bounds concurrent forward passes)
+    TORCH_EXECUTOR_WORKERS: int = 4
+
+    # Background DQN learner: train after this many new transitions, or this long after the last round
+    RL_TRAIN_EVERY_TRANSITIONS: int = 16
+    RL_TRAIN_INTERVAL_SECONDS: float = 5.0
+    RL_CHECKPOINT_INTERVAL_SECONDS: float = 60.0
+    RL_TARGET_SYNC_STEPS: int = 100  # Gradient steps between target-network syncs
+    # "local": every API process trains its own agent in the background. "remote": API processes only act
+    # and push transitions to a Redis stream; one `python -m src.training.dqn_learner` process trains and
+    # publishes "dqn" registry versions (the registry directory must be shared with the API processes).
+    RL_LEARNER_MODE: str = "local"
+    # Local mode keeps training its own checkpoint (rl_model.pth); published "dqn" versions replace it only
+    # with this set (e.g. to roll out a pretrain_dqn policy). Remote mode always follows the registry.
+    RL_LOCAL_FOLLOW_REGISTRY: bool = False
+    RL_TRANSITION_STREAM: str = "ml:rl:transitions"
+    RL_TRANSITION_STREAM_MAXLEN: int = 100000  # Approximate cap; the oldest entries go first
+    RL_REGISTRY_KEEP_VERSIONS: int = 5  # Published DQN versions kept by the learner
+    RL_REPLAY_CAPACITY: int = 10000
+    # Directory for a memory-mapped replay buffer that survives restarts (None = in memory)
+    RL_REPLAY_PATH: str | None = None
+    # Prioritized replay: sample by |TD error|^alpha, correct with importance weights^beta
+    RL_PRIORITIZED_REPLAY: bool = False
+    RL_PER_ALPHA: float = 0.6
+    RL_PER_BETA: float = 0.4
+
+    # Per-student RL state cache (knowledge + behavior features). Invalidations are always broadcast over
+    # REDIS_URL to every process; RL_STATE_CACHE_REDIS adds a value tier in Redis shared by the API processes.
+    RL_STATE_CACHE_SIZE: int = 50000
+    RL_STATE_CACHE_TTL_SECONDS: float = 300.0
+    RL_STATE_CACHE_REDIS: bool = False
+
+    # Serve DKT/DQN through int8 dynamic quantization (CPU only). At load time the quantized model
+    # must stay within the tolerance of the float one (absolute for DKT probabilities,
+    # relative to the largest Q-value for the DQN), otherwise float32 is served.
+    INFERENCE_QUANTIZE: bool = False
+    QUANTIZATION_TOLERANCE: float = 0.1
+
+    # DKT Inference
+    DKT_MAX_SEQ_LEN: int = 50  # Window replayed by the full-sequence fallback (and the limit of incremental steps)
+    DKT_STATE_CACHE_SIZE: int = 10000  # Max students whose LSTM (h, c) is kept in memory
+    DKT_STATE_TTL_SECONDS: int = 3600  # Cached states older than this are rebuilt from history
+    # Micro-batching only helps when tasks run concurrently in one process (celery worker -P threads)
+    DKT_BATCHING_ENABLED: bool = False
+    DKT_BATCH_MAX_SIZE: int = 64
+    DKT_BATCH_MAX_WAIT_MS: float = 5.0
+    # The DKT worker skips concepts whose mastery moved by less than this since the last write
+    KNOWLEDGE_WRITE_EPSILON: float = 0.01
+    # "rows": knowledge_states only. "vector": also keep a dense float32 vector per student
+    # (mastery_vectors) and serve model-vocabulary reads from it.
+    MASTERY_STORE: str = "rows"
+    # Queue interactions per student in Redis so a burst is processed as one DKT run
+    DKT_COALESCE_INTERACTIONS: bool = True
+    DKT_COALESCE_LOCK_TTL_SECONDS: int = 30
+    # Celery beat requeues the pending interactions of students whose draining task died
+    DKT_PENDING_SWEEP_SECONDS: float = 60.0
+
+    # Adaptive test (IRT). Estimator: "eap" (posterior mean, N(0, IRT_PRIOR_SD) prior), "mle" (Newton-Raphson)
+    # or "grid" (max likelihood on the quadrature grid). The test stops once the standard error of theta
+    # is below IRT_SE_THRESHOLD (after IRT_MIN_ITEMS) or after IRT_MAX_ITEMS items.
+    IRT_ESTIMATOR: str = "eap"
+    IRT_PRIOR_SD: float = 1.0
+    IRT_QUADRATURE_POINTS: int = 61
+    IRT_SE_THRESHOLD: float = 0.5  # With a=1 items, ~12 well-targeted answers under the N(0, 1) prior
+    IRT_MIN_ITEMS: int = 5
+    IRT_MAX_ITEMS: int = 15
+    # "global" (one theta) or "concept": one theta per concept of the goal path, shrunk toward the global
+    # theta by a N(0, IRT_CONCEPT_SHRINKAGE_SD) deviation prior. Items then target the concept with the
+    # highest posterior variance, and the test stops once every concept's SE is below IRT_CONCEPT_SE_THRESHOLD
+    # or after IRT_CONCEPT_ITEMS_PER_CONCEPT items per path concept (at least IRT_MAX_ITEMS, at most
+    # IRT_CONCEPT_MAX_ITEMS).
+    IRT_DIMENSIONS: str = "global"
+    IRT_CONCEPT_SHRINKAGE_SD: float = 0.5
+    IRT_CONCEPT_SE_THRESHOLD: float = 0.6
+    IRT_CONCEPT_ITEMS_PER_CONCEPT: int = 5
+    IRT_CONCEPT_MAX_ITEMS: int = 50
 
 
 settings = Settings()
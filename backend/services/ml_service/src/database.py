@@ -1,9 +1,11 @@
-import json
-
+import numpy as np
 from loguru import logger
 from sqlalchemy import create_engine, text
+from sqlalchemy.exc import IntegrityError
 
 from .config import settings
+from .services.state_cache import student_state_cache
+from .utils import CONCEPT_TO_INDEX
 
 engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, pool_size=20, max_overflow=10)
 
@@ -33,71 +35,356 @@ def init_behavioral_table():
 
 def init_history_table():
     """
-    Creates table to store DKT interaction sequences.
+    Creates the append-only interaction log used as the DKT sequence store.
+    One row per answer, ordered per student by `seq`, so appends never rewrite
+    earlier rows and "last N" reads are a backward scan of the primary key.
+
+    Also migrates the legacy `interaction_histories` JSONB arrays (if that table exists)
+    for students that have no log rows yet. The legacy table itself is left untouched.
+    """
+    create_query = text("""
+        CREATE TABLE IF NOT EXISTS interaction_log (
+            student_id UUID NOT NULL,
+            seq INTEGER NOT NULL, -- 1-based position in the student's history
+            concept_id VARCHAR(100) NOT NULL,
+            correct BOOLEAN NOT NULL,
+            created_at TIMESTAMP DEFAULT NOW(),
+            PRIMARY KEY (student_id, seq)
+        );
+    """)
+    # Client-supplied id of the answer event (the Celery task id), so a re-run append skips it
+    event_query = text("""
+        ALTER TABLE interaction_log ADD COLUMN IF NOT EXISTS event_id VARCHAR(64);
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_interaction_log_event ON interaction_log (student_id, event_id);
+    """)
+    backfill_query = text("""
+        INSERT INTO interaction_log (student_id, seq, concept_id, correct, created_at)
+        SELECT h.student_id, e.ord, e.item->>'concept_id', COALESCE((e.item->>'correct')::boolean, FALSE), h.updated_at
+        FROM interaction_histories h
+        CROSS JOIN LATERAL jsonb_array_elements(h.sequence) WITH ORDINALITY AS e(item, ord)
+        WHERE NOT EXISTS (SELECT 1 FROM interaction_log l WHERE l.student_id = h.student_id)
+        ON CONFLICT DO NOTHING;
+    """)
+    try:
+        with engine.begin() as conn:
+            conn.execute(create_query)
+            conn.execute(event_query)
+            logger.info("Initialized interaction_log table.")
+            if conn.execute(text("SELECT to_regclass('interaction_histories')")).scalar() is not None:
+                migrated = conn.execute(backfill_query).rowcount
+                if migrated:
+                    logger.info(f"Backfilled {migrated} interactions from interaction_histories.")
+    except Exception as e:
+        logger.error(f"Failed to init history table: {e}")
+
+
+def init_mastery_vector_table():
+    """
+    Creates the dense mastery store: one float32 vector per student, one slot per
+    CONCEPT_TO_INDEX index (NaN = no estimate yet). Used when MASTERY_STORE = "vector".
     """
     query = text("""
-        CREATE TABLE IF NOT EXISTS interaction_histories (
+        CREATE TABLE IF NOT EXISTS mastery_vectors (
             student_id UUID PRIMARY KEY,
-            sequence JSONB DEFAULT '[]', -- List of {"concept_id": str, "correct": bool}
+            mastery BYTEA NOT NULL, -- little-endian float32[OUTPUT_DIM_DKT]
             updated_at TIMESTAMP DEFAULT NOW()
         );
     """)
     try:
         with engine.begin() as conn:
             conn.execute(query)
-            logger.info("Initialized interaction_histories table.")
+            logger.info("Initialized mastery_vectors table.")
     except Exception as e:
-        logger.error(f"Failed to init history table: {e}")
+        logger.error(f"Failed to init mastery vector table: {e}")
+
+
+def init_item_response_table():
+    """
+    Creates the per-question response log (adaptive test answers and graded quizzes),
+    the input of the IRT item calibration job (src/training/calibrate_irt.py).
+    """
+    create_query = text("""
+        CREATE TABLE IF NOT EXISTS item_responses (
+            id BIGSERIAL PRIMARY KEY,
+            student_id UUID NOT NULL,
+            question_id VARCHAR(100) NOT NULL,
+            correct BOOLEAN NOT NULL,
+            source VARCHAR(20) NOT NULL, -- "cat", "quiz" or "assessment"
+            created_at TIMESTAMP DEFAULT NOW()
+        );
+    """)
+    # The calibration job reads responses grouped by student
+    index_query = text("CREATE INDEX IF NOT EXISTS ix_item_responses_student ON item_responses (student_id, id);")
+    try:
+        with engine.begin() as conn:
+            conn.execute(create_query)
+            conn.execute(index_query)
+            logger.info("Initialized item_responses table.")
+    except Exception as e:
+        logger.error(f"Failed to init item response table: {e}")
 
 
 init_behavioral_table()
 init_history_table()
+init_mastery_vector_table()
+init_item_response_table()
+
+MASTERY_DTYPE = np.dtype("<f4")
+
+
+def _decode_mastery_vector(raw) -> np.ndarray:
+    """
+    Read-only zero-copy view over a bytea payload. Vectors written before the
+    vocabulary grew are shorter than OUTPUT_DIM_DKT and get padded (copied) with NaN.
+    """
+    vector = np.frombuffer(raw, dtype=MASTERY_DTYPE)
+    if len(vector) < settings.OUTPUT_DIM_DKT:
+        vector = np.concatenate([vector, np.full(settings.OUTPUT_DIM_DKT - len(vector), np.nan, dtype=MASTERY_DTYPE)])
+    return vector
 
 
-def get_student_history(student_id: str) -> list[dict]:
-    query = text("SELECT sequence FROM interaction_histories WHERE student_id = :uid")
+def _mastery_map_to_vector(mastery_map: dict[str, float]) -> np.ndarray:
+    vector = np.full(settings.OUTPUT_DIM_DKT, np.nan, dtype=MASTERY_DTYPE)
+    for concept_id, mastery in mastery_map.items():
+        idx = CONCEPT_TO_INDEX.get(concept_id)
+        if idx is not None and idx < len(vector) and mastery is not None:
+            vector[idx] = mastery
+    return vector
+
+
+def _merge_mastery_vectors(conn, latest: dict[tuple[str, str], float]):
+    """
+    Patches the given (student_id, concept_id) -> mastery values into the students' vectors
+    inside the caller's transaction (rows are locked with FOR UPDATE).
+    A student without a vector is seeded from knowledge_states first.
+    """
+    by_student: dict[str, dict[str, float]] = {}
+    for (student_id, concept_id), mastery in latest.items():
+        if concept_id in CONCEPT_TO_INDEX:
+            by_student.setdefault(str(student_id), {})[concept_id] = mastery
+    if not by_student:
+        return
+
+    student_ids = list(by_student)
+    rows = conn.execute(
+        text("""
+            SELECT student_id, mastery FROM mastery_vectors
+            WHERE student_id = ANY(CAST(:student_ids AS uuid[]))
+            FOR UPDATE
+        """),
+        {"student_ids": student_ids},
+    ).fetchall()
+    vectors = {str(row[0]): _decode_mastery_vector(row[1]).copy() for row in rows}
+
+    missing = [sid for sid in student_ids if sid not in vectors]
+    if missing:
+        seed_rows = conn.execute(
+            text("""
+                SELECT student_id, concept_id, mastery_level FROM knowledge_states
+                WHERE student_id = ANY(CAST(:student_ids AS uuid[]))
+            """),
+            {"student_ids": missing},
+        ).fetchall()
+        seeds: dict[str, dict[str, float]] = {}
+        for student_id, concept_id, mastery in seed_rows:
+            seeds.setdefault(str(student_id), {})[concept_id] = mastery
+        for sid in missing:
+            vectors[sid] = _mastery_map_to_vector(seeds.get(sid, {}))
+
+    for sid, values in by_student.items():
+        for concept_id, mastery in values.items():
+            idx = CONCEPT_TO_INDEX[concept_id]
+            if idx < len(vectors[sid]):
+                vectors[sid][idx] = mastery
+
+    conn.execute(
+        text("""
+            INSERT INTO mastery_vectors (student_id, mastery, updated_at)
+            SELECT u.student_id, u.mastery, NOW()
+            FROM unnest(CAST(:student_ids AS uuid[]), CAST(:vectors AS bytea[])) AS u(student_id, mastery)
+            ON CONFLICT (student_id)
+            DO UPDATE SET mastery = EXCLUDED.mastery, updated_at = NOW();
+        """),
+        {"student_ids": student_ids, "vectors": [vectors[sid].tobytes() for sid in student_ids]},
+    )
+
+
+def get_student_history(student_id: str, limit: int | None = None) -> list[dict]:
+    """
+    Returns the last `limit` interactions (all if None) in chronological order:
+    [{"seq": int, "concept_id": str, "correct": bool}, ...]
+    """
+    query = text("""
+        SELECT seq, concept_id, correct
+        FROM (
+            SELECT seq, concept_id, correct
+            FROM interaction_log
+            WHERE student_id = :uid
+            ORDER BY seq DESC
+            LIMIT :limit
+        ) recent
+        ORDER BY seq
+    """)
     try:
         with engine.connect() as conn:
-            result = conn.execute(query, {"uid": student_id}).fetchone()
-            if result and result[0]:
-                return result[0]
-            return []
+            rows = conn.execute(query, {"uid": student_id, "limit": limit}).fetchall()
+            return [{"seq": row[0], "concept_id": row[1], "correct": row[2]} for row in rows]
     except Exception as e:
         logger.error(f"DB Error fetch history: {e}")
         return []
 
 
-def append_interaction(student_id: str, concept_id: str, is_correct: bool):
+def get_student_histories_batch(student_ids: list[str], limit: int) -> dict[str, list[dict]]:
     """
-    Appends a new interaction to the JSONB list.
+    Last `limit` interactions of many students in one query (one index range scan per student).
+    Returns {student_id: [{"seq", "concept_id", "correct"}, ...]} in chronological order.
     """
-    new_item = json.dumps({"concept_id": concept_id, "correct": is_correct})
+    if not student_ids:
+        return {}
 
-    # Postgres specific JSONB append
     query = text("""
-        INSERT INTO interaction_histories (student_id, sequence, updated_at)
-        VALUES (:uid, :item::jsonb, NOW())
-        ON CONFLICT (student_id)
-        DO UPDATE SET
-            sequence = interaction_histories.sequence || :item_single::jsonb,
-            updated_at = NOW();
+        SELECT s.student_id, r.seq, r.concept_id, r.correct
+        FROM unnest(CAST(:student_ids AS uuid[])) AS s(student_id)
+        CROSS JOIN LATERAL (
+            SELECT seq, concept_id, correct
+            FROM interaction_log l
+            WHERE l.student_id = s.student_id
+            ORDER BY seq DESC
+            LIMIT :limit
+        ) r
+        ORDER BY s.student_id, r.seq
     """)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(query, {"student_ids": [str(sid) for sid in student_ids], "limit": limit}).fetchall()
+            histories: dict[str, list[dict]] = {}
+            for student_id, seq, concept_id, correct in rows:
+                histories.setdefault(str(student_id), []).append(
+                    {"seq": seq, "concept_id": concept_id, "correct": correct}
+                )
+            return histories
+    except Exception as e:
+        logger.error(f"DB Error batch fetch history: {e}")
+        raise
+
 
+def list_students_with_history(after: str | None, limit: int) -> list[str]:
+    """
+    Keyset page of distinct student ids in interaction_log, ordered by id.
+    Uses a recursive skip-scan so each id costs one index probe instead of a scan of all rows.
+    """
+    query = text("""
+        WITH RECURSIVE students AS (
+            (
+                SELECT student_id FROM interaction_log
+                WHERE student_id > CAST(:after AS uuid)
+                ORDER BY student_id LIMIT 1
+            )
+            UNION ALL
+            SELECT (
+                SELECT l.student_id FROM interaction_log l
+                WHERE l.student_id > students.student_id
+                ORDER BY l.student_id LIMIT 1
+            )
+            FROM students
+            WHERE students.student_id IS NOT NULL
+        )
+        SELECT student_id FROM students WHERE student_id IS NOT NULL LIMIT :limit
+    """)
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(
+                query, {"after": after or "00000000-0000-0000-0000-000000000000", "limit": limit}
+            ).fetchall()
+            return [str(row[0]) for row in rows]
+    except Exception as e:
+        logger.error(f"DB Error list students: {e}")
+        raise
+
+
+def append_interaction(student_id: str, concept_id: str, is_correct: bool) -> int:
+    """
+    Appends a new interaction to the student's log.
+    Returns its `seq`, i.e. the history length including the new item (used to validate cached DKT states).
+    """
+    return append_interactions(student_id, [(concept_id, is_correct)])
+
+
+def append_interactions(
+    student_id: str, interactions: list[tuple[str, bool]], event_ids: list[str | None] | None = None
+) -> int:
+    """
+    Appends several interactions (in the given order) to the student's log in one statement.
+    interactions: [(concept_id, is_correct), ...]
+    event_ids: optional id per interaction; ids already in the log are skipped, so re-running an
+    append that committed before its caller failed stores nothing twice.
+    Returns the history length afterwards (the `seq` of the last stored interaction).
+    """
+    query = text("""
+        INSERT INTO interaction_log (student_id, seq, concept_id, correct, event_id)
+        SELECT CAST(:uid AS uuid), base.max_seq + ROW_NUMBER() OVER (ORDER BY n.ord), n.concept_id, n.correct,
+            n.event_id
+        FROM (
+            SELECT COALESCE(MAX(seq), 0) AS max_seq FROM interaction_log WHERE student_id = :uid
+        ) base
+        CROSS JOIN unnest(CAST(:concept_ids AS varchar[]), CAST(:corrects AS boolean[]), CAST(:event_ids AS varchar[]))
+            WITH ORDINALITY AS n(concept_id, correct, event_id, ord)
+        WHERE n.event_id IS NULL OR NOT EXISTS (
+            SELECT 1 FROM interaction_log l WHERE l.student_id = CAST(:uid AS uuid) AND l.event_id = n.event_id
+        )
+        RETURNING seq;
+    """)
+    length_query = text("SELECT COALESCE(MAX(seq), 0) FROM interaction_log WHERE student_id = :uid")
+    params = {
+        "uid": student_id,
+        "concept_ids": [concept_id for concept_id, _ in interactions],
+        "corrects": [bool(is_correct) for _, is_correct in interactions],
+        "event_ids": event_ids or [None] * len(interactions),
+    }
+
+    # Two concurrent appends for one student can compute the same seq (or store the same event);
+    # the loser hits the primary key and simply retries with the next one.
+    attempt = 0
+    while True:
+        attempt += 1
+        try:
+            with engine.begin() as conn:
+                seqs = list(conn.execute(query, params).scalars())
+                # Nothing inserted (every event already stored): the length is unchanged
+                return max(seqs) if seqs else conn.execute(length_query, {"uid": student_id}).scalar()
+        except IntegrityError as e:
+            if attempt < 3:
+                continue
+            logger.error(f"DB Error append history: {e}")
+            raise
+        except Exception as e:
+            logger.error(f"DB Error append history: {e}")
+            raise
+
+
+def log_item_responses(student_id: str, responses: list[tuple[str, bool]], source: str) -> int:
+    """
+    Appends graded answers to the item response log in one statement.
+    responses: [(question_id, is_correct), ...]
+    """
+    if not responses:
+        return 0
+    query = text("""
+        INSERT INTO item_responses (student_id, question_id, correct, source)
+        SELECT CAST(:uid AS uuid), r.question_id, r.correct, :source
+        FROM unnest(CAST(:question_ids AS varchar[]), CAST(:corrects AS boolean[])) AS r(question_id, correct)
+    """)
+    params = {
+        "uid": student_id,
+        "question_ids": [question_id for question_id, _ in responses],
+        "corrects": [bool(correct) for _, correct in responses],
+        "source": source,
+    }
     try:
         with engine.begin() as conn:
-            # We pass the list for INSERT and single item for UPDATE concatenation
-            # Note: Formatting JSON for SQL params can be tricky.
-            # Ideally use a wrapper, but for this pure SQL approach:
-            conn.execute(
-                query,
-                {
-                    "uid": student_id,
-                    "item": json.dumps([{"concept_id": concept_id, "correct": is_correct}]),
-                    "item_single": new_item,
-                },
-            )
+            return conn.execute(query, params).rowcount
     except Exception as e:
-        logger.error(f"DB Error append history: {e}")
+        logger.error(f"DB Error logging item responses: {e}")
         raise
 
 
@@ -137,6 +424,7 @@ def update_behavioral_profile(
     except Exception as e:
         logger.error(f"DB Error behavioral upsert: {e}")
         raise
+    student_state_cache.invalidate([student_id])
 
 
 def get_behavioral_profile(student_id: str) -> dict:
@@ -168,6 +456,31 @@ def get_behavioral_profile(student_id: str) -> dict:
         return {}
 
 
+BEHAVIOR_FIELDS = ("procrastination_index", "gaming_score", "engagement_score", "hint_rate", "error_rate")
+
+
+def get_behavioral_profiles_batch(student_ids: list[str]) -> dict[str, dict]:
+    """
+    Behavioral profiles of many students in one query. Students without a row get the zero profile.
+    """
+    profiles = {sid: dict.fromkeys(BEHAVIOR_FIELDS, 0.0) for sid in student_ids}
+    if not student_ids:
+        return profiles
+
+    query = text("""
+        SELECT student_id, procrastination_index, gaming_score, engagement_score, hint_rate, error_rate
+        FROM behavioral_profiles
+        WHERE student_id = ANY(CAST(:student_ids AS uuid[]))
+    """)
+    try:
+        with engine.connect() as conn:
+            for row in conn.execute(query, {"student_ids": list(student_ids)}).fetchall():
+                profiles[str(row[0])] = dict(zip(BEHAVIOR_FIELDS, row[1:], strict=True))
+    except Exception as e:
+        logger.error(f"DB Error batch fetch behavior: {e}")
+    return profiles
+
+
 def update_knowledge_state(student_id: str, concept_id: str, mastery_level: float):
     """
     Thread-safe UPSERT using PostgreSQL ON CONFLICT.
@@ -185,28 +498,46 @@ def update_knowledge_state(student_id: str, concept_id: str, mastery_level: floa
     try:
         with engine.begin() as conn:
             conn.execute(query, {"student_id": student_id, "concept_id": concept_id, "mastery": mastery_level})
+            if settings.MASTERY_STORE == "vector":
+                _merge_mastery_vectors(conn, {(student_id, concept_id): mastery_level})
             logger.info(f"Upserted mastery for {student_id}/{concept_id}")
     except Exception as e:
         logger.error(f"DB Error during upsert: {e}")
         raise
+    student_state_cache.invalidate([student_id])
 
 
-def update_knowledge_state_batch(updates: list[dict]):
+def update_knowledge_state_batch(updates: list[dict], epsilon: float = 0.0) -> int:
     """
-    Batch UPSERT for knowledge states.
+    Batch UPSERT for knowledge states as a single set-based statement.
     updates: list of dicts with keys {'student_id', 'concept_id', 'mastery_level'}
+    epsilon: rows whose stored mastery differs by less than this are skipped entirely
+             (no new tuple, no WAL, no row lock). 0.0 writes every row.
+    Returns the number of rows actually written.
+
+    With MASTERY_STORE = "vector" the full-precision values are also patched into the
+    students' dense vectors (one row per student); knowledge_states stays the shared
+    per-concept table other services read.
     """
     if not updates:
-        return
+        return 0
 
-    # Constructing a VALUES list for the query
-    # Note: In a real high-load scenario, we might use postgres-specific unnest or copy,
-    # but for <100 items, a loop with execute_many or a generated query is fine.
-    # We will use explicit transaction for safety.
+    # ON CONFLICT cannot touch the same row twice in one statement: keep the last value per key
+    latest = {(u["student_id"], u["concept_id"]): u["mastery_level"] for u in updates}
 
     query = text("""
         INSERT INTO knowledge_states (student_id, concept_id, mastery_level, updated_at, confidence)
-        VALUES (:student_id, :concept_id, :mastery_level, NOW(), 0.9)
+        SELECT u.student_id, u.concept_id, u.mastery_level, NOW(), 0.9
+        FROM unnest(
+            CAST(:student_ids AS uuid[]),
+            CAST(:concept_ids AS varchar[]),
+            CAST(:mastery_levels AS float8[])
+        ) AS u(student_id, concept_id, mastery_level)
+        LEFT JOIN knowledge_states ks
+            ON ks.student_id = u.student_id AND ks.concept_id = u.concept_id
+        WHERE ks.id IS NULL
+            OR ks.mastery_level IS NULL
+            OR abs(ks.mastery_level - u.mastery_level) >= :epsilon
         ON CONFLICT (student_id, concept_id)
         DO UPDATE SET
             mastery_level = EXCLUDED.mastery_level,
@@ -214,23 +545,49 @@ def update_knowledge_state_batch(updates: list[dict]):
             confidence = 0.9;
     """)
 
+    params = {
+        "student_ids": [str(student_id) for student_id, _ in latest],
+        "concept_ids": [concept_id for _, concept_id in latest],
+        "mastery_levels": [float(m) for m in latest.values()],
+        "epsilon": epsilon,
+    }
+
     try:
         with engine.begin() as conn:
-            # SQLAlchemy execute with a list of dicts performs an executemany
-            conn.execute(query, updates)
-            logger.info(f"Batch upserted {len(updates)} knowledge states.")
+            written = conn.execute(query, params).rowcount
+            if settings.MASTERY_STORE == "vector":
+                _merge_mastery_vectors(conn, latest)
+            logger.info(f"Batch upserted {written}/{len(latest)} knowledge states.")
     except Exception as e:
         logger.error(f"DB Error during batch upsert: {e}")
         raise
+    # After the commit; readers that fetched the old state before it skip caching it (per-student version check)
+    student_state_cache.invalidate(student_id for student_id, _ in latest)
+    return written
 
 
 def get_knowledge_states_batch(student_id: str, concept_ids: list[str]) -> dict[str, float]:
     """
     Batch retrieval of mastery levels. Returns dict {concept_id: mastery}.
+    In vector mode concepts of the model vocabulary come from the student's vector;
+    only concepts outside it are looked up row by row.
     """
     if not concept_ids:
         return {}
 
+    found_states: dict[str, float] = {}
+    row_concepts = concept_ids
+    if settings.MASTERY_STORE == "vector":
+        vector = _get_stored_mastery_vector(student_id)
+        if vector is not None:
+            for cid in concept_ids:
+                idx = CONCEPT_TO_INDEX.get(cid)
+                if idx is not None and idx < len(vector) and not np.isnan(vector[idx]):
+                    found_states[cid] = float(vector[idx])
+            row_concepts = [cid for cid in concept_ids if cid not in CONCEPT_TO_INDEX]
+        if not row_concepts:
+            return {cid: found_states.get(cid, 0.0) for cid in concept_ids}
+
     query = text("""
         SELECT concept_id, mastery_level
         FROM knowledge_states
@@ -239,8 +596,8 @@ def get_knowledge_states_batch(student_id: str, concept_ids: list[str]) -> dict[
 
     try:
         with engine.connect() as conn:
-            result = conn.execute(query, {"student_id": student_id, "concept_ids": concept_ids}).fetchall()
-            found_states = {row[0]: row[1] for row in result}
+            result = conn.execute(query, {"student_id": student_id, "concept_ids": row_concepts}).fetchall()
+            found_states.update({row[0]: row[1] for row in result})
             return {cid: found_states.get(cid, 0.0) for cid in concept_ids}
     except Exception as e:
         logger.error(f"DB Error batch fetch: {e}")
@@ -257,10 +614,92 @@ def get_all_student_knowledge(student_id: str):
         WHERE student_id = :student_id
     """)
 
+    vector = _get_stored_mastery_vector(student_id) if settings.MASTERY_STORE == "vector" else None
+    if vector is not None:
+        # Vocabulary concepts come from the vector; the rows only fill in the rest
+        query = text("""
+            SELECT concept_id, mastery_level
+            FROM knowledge_states
+            WHERE student_id = :student_id AND NOT (concept_id = ANY(:vocabulary))
+        """)
+
     try:
         with engine.connect() as conn:
-            result = conn.execute(query, {"student_id": student_id}).fetchall()
-            return {row[0]: row[1] for row in result}
+            result = conn.execute(query, {"student_id": student_id, "vocabulary": list(CONCEPT_TO_INDEX)}).fetchall()
+            knowledge = {row[0]: row[1] for row in result}
     except Exception as e:
         logger.error(f"DB Error fetch all: {e}")
         return {}
+
+    if vector is not None:
+        for cid, idx in CONCEPT_TO_INDEX.items():
+            if idx < len(vector) and not np.isnan(vector[idx]):
+                knowledge[cid] = float(vector[idx])
+    return knowledge
+
+
+def _get_stored_mastery_vector(student_id: str) -> np.ndarray | None:
+    query = text("SELECT mastery FROM mastery_vectors WHERE student_id = :student_id")
+    try:
+        with engine.connect() as conn:
+            row = conn.execute(query, {"student_id": student_id}).fetchone()
+            return _decode_mastery_vector(row[0]) if row else None
+    except Exception as e:
+        logger.error(f"DB Error fetch mastery vector: {e}")
+        return None
+
+
+def get_mastery_vector(student_id: str) -> np.ndarray:
+    """
+    Dense (OUTPUT_DIM_DKT,) float32 mastery indexed by concept slot, NaN where there is no estimate.
+    One row read and a zero-copy decode in vector mode; built from knowledge_states otherwise
+    (or when the student has no vector yet).
+    """
+    if settings.MASTERY_STORE == "vector":
+        vector = _get_stored_mastery_vector(student_id)
+        if vector is not None:
+            return vector
+    return _mastery_map_to_vector(get_all_student_knowledge(student_id))
+
+
+def get_mastery_vectors_batch(student_ids: list[str]) -> np.ndarray:
+    """
+    Dense mastery of many students, shape (len(student_ids), OUTPUT_DIM_DKT), NaN where unknown.
+    One set-based query: mastery_vectors in vector mode (rows only for students without a vector),
+    knowledge_states otherwise.
+    """
+    matrix = np.full((len(student_ids), settings.OUTPUT_DIM_DKT), np.nan, dtype=MASTERY_DTYPE)
+    if not student_ids:
+        return matrix
+    position = {sid: i for i, sid in enumerate(student_ids)}
+    missing = list(student_ids)
+
+    try:
+        with engine.connect() as conn:
+            if settings.MASTERY_STORE == "vector":
+                rows = conn.execute(
+                    text(
+                        "SELECT student_id, mastery FROM mastery_vectors WHERE student_id = ANY(CAST(:ids AS uuid[]))"
+                    ),
+                    {"ids": missing},
+                ).fetchall()
+                for student_id, raw in rows:
+                    matrix[position[str(student_id)]] = _decode_mastery_vector(raw)[: settings.OUTPUT_DIM_DKT]
+                found = {str(row[0]) for row in rows}
+                missing = [sid for sid in student_ids if sid not in found]
+
+            if missing:
+                rows = conn.execute(
+                    text("""
+                        SELECT student_id, concept_id, mastery_level FROM knowledge_states
+                        WHERE student_id = ANY(CAST(:ids AS uuid[])) AND concept_id = ANY(:vocabulary)
+                    """),
+                    {"ids": missing, "vocabulary": list(CONCEPT_TO_INDEX)},
+                ).fetchall()
+                for student_id, concept_id, mastery in rows:
+                    idx = CONCEPT_TO_INDEX[concept_id]
+                    if idx < settings.OUTPUT_DIM_DKT:
+                        matrix[position[str(student_id)], idx] = mastery
+    except Exception as e:
+        logger.error(f"DB Error batch fetch mastery vectors: {e}")
+    return matrix
@@ -4,17 +4,24 @@ from fastapi import FastAPI, HTTPException, status
 from loguru import logger
 
 from . import schemas
+from .async_database import async_engine
+from .config import settings
 from .database import (
     get_all_student_knowledge,
     get_behavioral_profile,
     get_knowledge_states_batch,
     init_behavioral_table,
     init_history_table,
+    init_item_response_table,
+    init_mastery_vector_table,
+    log_item_responses,
     update_behavioral_profile,
     update_knowledge_state_batch,
 )
+from .models.quantization import precision
 from .services.irt_engine import irt_engine
-from .services.rl_engine import rl_engine
+from .services.model_manager import reported_serving
+from .services.rl_engine import rl_agent, rl_engine, rl_learner, rl_models
 
 
 @asynccontextmanager
@@ -23,11 +30,17 @@ async def lifespan(app: FastAPI):
     try:
         init_behavioral_table()
         init_history_table()
+        init_mastery_vector_table()
+        init_item_response_table()
     except Exception as e:
         logger.critical("FAILED TO INITIALIZE DATABASE. Exiting.")
         raise e
+    rl_models.start_watching()
+    rl_learner.start()
     yield
     logger.info("ML Service Shutting Down...")
+    rl_learner.stop()
+    await async_engine.dispose()
 
 
 app = FastAPI(title="ML Service API", lifespan=lifespan)
@@ -163,6 +176,27 @@ async def get_rl_recommendation(request: schemas.RLRecommendationRequest):
         }
 
 
+@app.post("/api/v1/rl/recommend/batch", response_model=schemas.RLBatchRecommendationResponse)
+async def get_rl_recommendations_batch(request: schemas.RLBatchRecommendationRequest):
+    """
+    Recommendations for many students (class dashboards, cohort warm-up) in one forward pass.
+    """
+    items = [item.model_dump() for item in request.requests]
+    try:
+        concept_ids = await rl_engine.get_recommendations_batch(items)
+    except Exception as e:
+        logger.error(f"RL Batch Error: {e}")
+        # Fallback
+        concept_ids = [item["valid_concept_ids"][0] if item["valid_concept_ids"] else "" for item in items]
+
+    return {
+        "recommendations": [
+            {"student_id": item["student_id"], "recommended_concept_id": concept_id, "exploration_flag": False}
+            for item, concept_id in zip(items, concept_ids, strict=True)
+        ]
+    }
+
+
 @app.post("/api/v1/rl/reward", status_code=status.HTTP_200_OK)
 async def process_rl_reward(request: schemas.RLRewardRequest):
     """
@@ -184,24 +218,79 @@ def evaluate_adaptive_step(req: schemas.IRTRequest):
     """
     Calculates current ability and determines next step.
     """
-    # 1. Estimate Theta
-    theta = irt_engine.estimate_ability(req.history)
+    if irt_engine.dimensions == "concept" and (req.concept_ids or any(h.get("concept_id") for h in req.history)):
+        return _evaluate_per_concept(req)
+
+    # 1. Estimate Theta and its Standard Error
+    theta, standard_error = irt_engine.estimate(req.history)
 
     # 2. Calculate next target
     next_diff = irt_engine.get_next_target_difficulty(theta)
 
-    # 3. Check Stop Condition (Simple Rule-based for MVP)
-    # Real implementations check Standard Error (SE) < threshold
-    should_stop = len(req.history) >= 15
+    # 3. Check Stop Condition: SE below threshold (or maximum test length)
+    should_stop = irt_engine.should_stop(len(req.history), standard_error)
 
     return {
         "estimated_theta": theta,
+        "standard_error": standard_error,
         "next_difficulty_target": next_diff,
         "current_mastery": irt_engine.calculate_mastery(theta),
         "stop_test": should_stop,
     }
 
 
+def _evaluate_per_concept(req: schemas.IRTRequest) -> dict:
+    """Per-concept thetas; the next item targets the least certain concept at its own estimate."""
+    abilities = irt_engine.estimate_concepts(req.history, req.concept_ids)
+    concepts = [
+        {"concept_id": c, "theta": float(t), "standard_error": float(se), "mastery": irt_engine.calculate_mastery(t)}
+        for c, t, se in zip(
+            abilities.concept_ids, abilities.concept_thetas, abilities.concept_standard_errors, strict=True
+        )
+    ]
+    # Only the requested concepts are still measured (the caller drops those without questions left)
+    measured = req.concept_ids or None
+    next_concept_id = abilities.most_uncertain_concept(measured)
+    next_theta = abilities.concept_thetas[abilities.concept_ids.index(next_concept_id)]
+
+    return {
+        "estimated_theta": abilities.theta,
+        "standard_error": abilities.standard_error,
+        "next_difficulty_target": irt_engine.get_next_target_difficulty(next_theta),
+        "current_mastery": irt_engine.calculate_mastery(abilities.theta),
+        "stop_test": irt_engine.should_stop_concepts(len(req.history), abilities, measured),
+        "next_concept_id": next_concept_id,
+        "concepts": concepts,
+    }
+
+
+@app.post("/api/v1/irt/responses", status_code=status.HTTP_202_ACCEPTED)
+def log_responses(req: schemas.ItemResponseLogRequest):
+    """
+    Logs graded answers (quizzes, placement tests) for offline item calibration.
+    """
+    try:
+        logged = log_item_responses(
+            str(req.student_id), [(r.question_id, r.correct) for r in req.responses], req.source
+        )
+        return {"status": "logged", "count": logged}
+    except Exception as e:
+        logger.error(f"Item response log error: {e}")
+        raise HTTPException(status_code=500, detail="Failed to log responses") from e
+
+
 @app.get("/health")
 def health_check():
-    return {"status": "ok", "service": "ML Service", "framework": "PyTorch", "device": "CPU"}
+    return {
+        "status": "ok",
+        "service": "ML Service",
+        "framework": "PyTorch",
+        "device": "CPU",
+        "rl_learner": settings.RL_LEARNER_MODE,
+        "models": {
+            "dqn": {"version": rl_models.version, "precision": precision(rl_agent.serving_net)},
+            # DKT runs in the Celery workers, which report what they serve (switching to the latest registry
+            # version within MODEL_WATCH_INTERVAL_SECONDS)
+            "dkt": reported_serving("dkt") or {"version": "unknown", "precision": "unknown"},
+        },
+    }
@@ -1,4 +1,5 @@
 import torch.nn as nn
+from torch.nn.utils.rnn import pack_padded_sequence, pad_packed_sequence
 
 
 class DKT(nn.Module):
@@ -18,17 +19,42 @@ class DKT(nn.Module):
         self.fc = nn.Linear(hidden_dim, output_dim)
         self.sigmoid = nn.Sigmoid()
 
-    def forward(self, x):
+    def forward(self, x, lengths=None):
         # x shape: (batch_size, sequence_length)
+        # lengths: Optional true length of each row when x is right-padded (packed internally)
         embed = self.embedding(x)
 
         # LSTM output shape: (batch_size, seq_len, hidden_dim)
-        out, _ = self.lstm(embed)
+        if lengths is None:
+            out, _ = self.lstm(embed)
+        else:
+            packed = pack_padded_sequence(embed, lengths, batch_first=True, enforce_sorted=False)
+            out, _ = self.lstm(packed)
+            out, _ = pad_packed_sequence(out, batch_first=True, total_length=x.size(1))
 
         # Prediction shape: (batch_size, seq_len, output_dim)
         res = self.sigmoid(self.fc(out))
         return res
 
+    def step(self, x, hidden=None, lengths=None):
+        """
+        Advances the LSTM from an explicit (h, c) state instead of a zero state.
+        x shape: (batch_size, steps), hidden: (h, c) of shape (layer_dim, batch_size, hidden_dim) or None.
+        lengths: Optional true length of each row when x is right-padded (packed internally).
+        Returns the prediction after the last step (batch_size, output_dim) and the new (h, c).
+        """
+        embed = self.embedding(x)
+        if lengths is None:
+            out, hidden = self.lstm(embed, hidden)
+            last = out[:, -1, :]
+        else:
+            packed = pack_padded_sequence(embed, lengths, batch_first=True, enforce_sorted=False)
+            _, hidden = self.lstm(packed, hidden)
+            # h of the top layer is the output at each row's last valid step
+            last = hidden[0][-1]
+        res = self.sigmoid(self.fc(last))
+        return res, hidden
+
 
 # Factory function for model initialization
 def get_model(config):
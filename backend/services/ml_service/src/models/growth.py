@@ -0,0 +1,72 @@
+import torch
+import torch.nn as nn
+
+from .dkt import DKT
+
+# Warm start when the concept vocabulary outgrows a checkpoint: every learned weight keeps its meaning.
+# New DQN knowledge-slot inputs start with no influence (zero columns). DKT embeds an answer on a new
+# concept as the average answer of the same correctness (mean embedding rows), so it does feed the LSTM.
+# New concept outputs of both start as the average of the existing ones (mean rows), i.e. "an average
+# concept" until they are trained.
+
+
+def _mean_rows(weight: torch.Tensor, count: int) -> torch.Tensor:
+    return weight.mean(dim=0, keepdim=True).expand(count, *weight.shape[1:]).clone()
+
+
+def grow_dkt_state(state_dict: dict, num_concepts: int) -> dict:
+    """
+    DKT weights for `num_concepts` concepts from a checkpoint trained with fewer.
+    Input tokens are concept + num_concepts * correct, so the "correct" block of the embedding moves.
+    """
+    state = dict(state_dict)
+    embedding = state["embedding.weight"]
+    old = embedding.shape[0] // 2
+    if num_concepts == old:
+        return state
+    if num_concepts < old:
+        raise ValueError(f"Cannot shrink DKT from {old} to {num_concepts} concepts")
+
+    added = num_concepts - old
+    wrong, correct = embedding[:old], embedding[old:]
+    state["embedding.weight"] = torch.cat([wrong, _mean_rows(wrong, added), correct, _mean_rows(correct, added)], dim=0)
+    state["fc.weight"] = torch.cat([state["fc.weight"], _mean_rows(state["fc.weight"], added)], dim=0)
+    state["fc.bias"] = torch.cat([state["fc.bias"], state["fc.bias"].mean().expand(added)], dim=0)
+    return state
+
+
+def grow_dqn_state(state_dict: dict, num_concepts: int, state_features: int) -> dict:
+    """
+    DQN weights for `num_concepts` knowledge slots / actions from a checkpoint trained with fewer.
+    The state is [knowledge slots | state_features profile features], so new input columns go in between.
+    """
+    state = dict(state_dict)
+    fc1 = state["fc1.weight"]
+    old = fc1.shape[1] - state_features
+    if num_concepts == old:
+        return state
+    if num_concepts < old:
+        raise ValueError(f"Cannot shrink DQN from {old} to {num_concepts} concepts")
+
+    added = num_concepts - old
+    state["fc1.weight"] = torch.cat([fc1[:, :old], fc1.new_zeros((fc1.shape[0], added)), fc1[:, old:]], dim=1)
+    state["fc3.weight"] = torch.cat([state["fc3.weight"], _mean_rows(state["fc3.weight"], added)], dim=0)
+    state["fc3.bias"] = torch.cat([state["fc3.bias"], state["fc3.bias"].mean().expand(added)], dim=0)
+    return state
+
+
+def fit_state_dict(model: nn.Module, state_dict: dict) -> dict:
+    """Grows a smaller DKT/DQN checkpoint to the concept dimension of `model` (no-op when they match)."""
+    from .rl import DQN, STATE_FEATURES  # rl.py loads its checkpoints through this module
+
+    if isinstance(model, DKT):
+        return grow_dkt_state(state_dict, model.input_dim)
+    if isinstance(model, DQN):
+        return grow_dqn_state(state_dict, model.fc1.in_features - STATE_FEATURES, STATE_FEATURES)
+    return state_dict
+
+
+def load_weights(model: nn.Module, path: str, map_location=None) -> nn.Module:
+    """torch.load + load_state_dict, warm-starting checkpoints made before the vocabulary grew."""
+    model.load_state_dict(fit_state_dict(model, torch.load(path, map_location=map_location)))
+    return model
@@ -0,0 +1,70 @@
+from collections.abc import Callable
+
+import torch
+import torch.nn as nn
+from loguru import logger
+
+# Layers served as int8 weights with per-batch activation scales; embeddings stay float32
+QUANTIZED_LAYERS = {nn.LSTM, nn.Linear}
+
+
+def quantize_dynamic(model: nn.Module) -> nn.Module:
+    """Returns an int8 dynamically quantized copy of `model` for CPU inference (the original is untouched)."""
+    return torch.ao.quantization.quantize_dynamic(model, QUANTIZED_LAYERS, dtype=torch.qint8).eval()
+
+
+def precision(model: nn.Module) -> str:
+    """Precision a model is actually served in: "int8-dynamic" if any layer is dynamically quantized."""
+    if any(type(m).__module__.startswith("torch.ao.nn.quantized.dynamic") for m in model.modules()):
+        return "int8-dynamic"
+    return "float32"
+
+
+def max_deviation(
+    reference: nn.Module,
+    candidate: nn.Module,
+    inputs: torch.Tensor,
+    predict: Callable[[nn.Module, torch.Tensor], torch.Tensor],
+    relative: bool = False,
+) -> float:
+    """
+    Largest absolute difference between the two models' outputs on `inputs`.
+    relative=True divides by the largest reference magnitude (for unscaled outputs such as Q-values).
+    """
+    was_training = reference.training
+    reference.eval()  # Compare without dropout noise
+    try:
+        with torch.no_grad():
+            expected = predict(reference, inputs)
+            actual = predict(candidate, inputs)
+    finally:
+        reference.train(was_training)
+    deviation = (expected - actual).abs().max().item()
+    if relative:
+        deviation /= max(expected.abs().max().item(), 1e-8)
+    return deviation
+
+
+def quantize_checked(
+    model: nn.Module,
+    inputs: torch.Tensor,
+    predict: Callable[[nn.Module, torch.Tensor], torch.Tensor],
+    tolerance: float,
+    relative: bool = False,
+) -> nn.Module:
+    """
+    Quantizes `model` and validates it against the float model on `inputs`.
+    Falls back to the float model when quantization fails or drifts beyond `tolerance`.
+    """
+    try:
+        quantized = quantize_dynamic(model)
+        deviation = max_deviation(model, quantized, inputs, predict, relative)
+    except Exception as e:
+        logger.error(f"Dynamic quantization failed, serving float32: {e}")
+        return model
+
+    if deviation > tolerance:
+        logger.error(f"Quantized model deviates by {deviation:.4f} (> {tolerance}), serving float32.")
+        return model
+    logger.info(f"Serving int8 dynamically quantized model (max deviation {deviation:.4f}).")
+    return quantized
@@ -0,0 +1,81 @@
+import json
+import os
+from datetime import UTC, datetime
+
+import torch
+
+from ..config import settings
+
+# Layout: <MODEL_REGISTRY_DIR>/<kind>/<version>.pth  (state_dict)
+#         <MODEL_REGISTRY_DIR>/<kind>/<version>.json (dims, metrics)
+# Versions are UTC timestamps, so lexicographic order == publication order.
+
+
+def new_version() -> str:
+    return datetime.now(UTC).strftime("%Y%m%d%H%M%S%f")
+
+
+def kind_dir(kind: str) -> str:
+    return os.path.join(settings.MODEL_REGISTRY_DIR, kind)
+
+
+def atomic_save(obj, path: str):
+    """torch.save to a temp file + os.replace, so readers never see a partially written file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    torch.save(obj, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def publish(kind: str, state_dict: dict, metadata: dict, version: str | None = None) -> str:
+    """
+    Publishes weights as a new version. The metadata file is written first and the
+    weights last, so a visible <version>.pth always has its metadata next to it.
+    """
+    version = version or new_version()
+    directory = kind_dir(kind)
+    os.makedirs(directory, exist_ok=True)
+
+    meta_path = os.path.join(directory, f"{version}.json")
+    with open(f"{meta_path}.tmp", "w") as f:
+        json.dump({"version": version, **metadata}, f, indent=2)
+    os.replace(f"{meta_path}.tmp", meta_path)
+
+    atomic_save(state_dict, os.path.join(directory, f"{version}.pth"))
+    return version
+
+
+def list_versions(kind: str) -> list[str]:
+    directory = kind_dir(kind)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[: -len(".pth")] for name in os.listdir(directory) if name.endswith(".pth"))
+
+
+def latest_version(kind: str) -> str | None:
+    versions = list_versions(kind)
+    return versions[-1] if versions else None
+
+
+def weights_path(kind: str, version: str) -> str:
+    return os.path.join(kind_dir(kind), f"{version}.pth")
+
+
+def read_metadata(kind: str, version: str) -> dict:
+    path = os.path.join(kind_dir(kind), f"{version}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def prune(kind: str, keep: int) -> list[str]:
+    """Deletes all but the newest `keep` versions of a kind. Returns the removed versions."""
+    removed = list_versions(kind)[:-keep] if keep > 0 else []
+    for version in removed:
+        for suffix in (".pth", ".json"):
+            try:
+                os.remove(os.path.join(kind_dir(kind), f"{version}{suffix}"))
+            except FileNotFoundError:
+                pass
+    return removed
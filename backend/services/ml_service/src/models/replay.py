@@ -0,0 +1,245 @@
+import os
+
+import numpy as np
+import torch
+from loguru import logger
+
+
+class ReplayBuffer:
+    """
+    Fixed-capacity ring buffer of (state, action, reward, next_state, done) transitions.
+
+    Each field is one preallocated contiguous array, so sampling is a single fancy-index gather
+    per field and the resulting batches are handed to torch without copying (`torch.from_numpy`).
+    With `path`, the arrays are memory-mapped .npy files in that directory and the experience
+    survives restarts; the write cursor is kept in `cursor.npy` next to them.
+    """
+
+    def __init__(self, capacity: int, state_dim: int, path: str | None = None):
+        self.capacity = capacity
+        self.state_dim = state_dim
+        self.path = path
+        self._rng = np.random.default_rng()
+        self._restored = False  # Set by _open when the files on disk matched the layout
+        layout = {
+            "states": ((capacity, state_dim), np.float32),
+            "actions": ((capacity,), np.int64),
+            "rewards": ((capacity,), np.float32),
+            "next_states": ((capacity, state_dim), np.float32),
+            "dones": ((capacity,), np.float32),
+            "cursor": ((2,), np.int64),  # [next write position, number of stored transitions]
+        }
+        arrays = (
+            self._open(layout) if path else {name: np.zeros(shape, dtype) for name, (shape, dtype) in layout.items()}
+        )
+        self.states = arrays["states"]
+        self.actions = arrays["actions"]
+        self.rewards = arrays["rewards"]
+        self.next_states = arrays["next_states"]
+        self.dones = arrays["dones"]
+        self._cursor = arrays["cursor"]
+        self._arrays = list(arrays.values())
+
+    def _open(self, layout: dict) -> dict:
+        os.makedirs(self.path, exist_ok=True)
+        files = {name: os.path.join(self.path, f"{name}.npy") for name in layout}
+        try:
+            arrays = {name: np.load(files[name], mmap_mode="r+") for name in layout}
+            if all(
+                arrays[name].shape == shape and arrays[name].dtype == dtype for name, (shape, dtype) in layout.items()
+            ):
+                logger.info(f"Replay buffer restored from {self.path} ({int(arrays['cursor'][1])} transitions)")
+                self._restored = True
+                return arrays
+            logger.warning(f"Replay buffer in {self.path} has another shape; starting empty.")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.error(f"Failed to open replay buffer in {self.path}, starting empty: {e}")
+
+        return {
+            name: np.lib.format.open_memmap(files[name], mode="w+", dtype=dtype, shape=shape)
+            for name, (shape, dtype) in layout.items()
+        }
+
+    def __len__(self) -> int:
+        return int(self._cursor[1])
+
+    def add(self, state, action: int, reward: float, next_state, done: bool) -> int:
+        """Stores a transition, overwriting the oldest one when full. Returns its slot."""
+        position = int(self._cursor[0])
+        self.states[position] = state
+        self.actions[position] = action
+        self.rewards[position] = reward
+        self.next_states[position] = next_state
+        self.dones[position] = float(done)
+        self._cursor[0] = (position + 1) % self.capacity
+        self._cursor[1] = min(int(self._cursor[1]) + 1, self.capacity)
+        return position
+
+    def add_batch(self, states, actions, rewards, next_states, dones) -> np.ndarray:
+        """Stores n transitions at once (wrapping around the ring). Returns their slots."""
+        n = len(actions)
+        if n > self.capacity:  # Only the newest `capacity` transitions would survive anyway
+            states, actions, rewards, next_states, dones = (
+                a[-self.capacity :] for a in (states, actions, rewards, next_states, dones)
+            )
+            n = self.capacity
+        positions = (int(self._cursor[0]) + np.arange(n)) % self.capacity
+        self.states[positions] = states
+        self.actions[positions] = actions
+        self.rewards[positions] = rewards
+        self.next_states[positions] = next_states
+        self.dones[positions] = dones
+        self._cursor[0] = (int(self._cursor[0]) + n) % self.capacity
+        self._cursor[1] = min(int(self._cursor[1]) + n, self.capacity)
+        return positions
+
+    def sample(self, batch_size: int, rng: np.random.Generator | None = None) -> tuple[torch.Tensor, ...]:
+        """
+        Uniformly samples `batch_size` stored transitions (with replacement: O(batch), not O(capacity)).
+        Returns (states, actions, rewards, next_states, dones) tensors sharing memory with the gathered arrays.
+        """
+        idx = (rng or self._rng).integers(0, len(self), size=batch_size)
+        return self.gather(idx)
+
+    def gather(self, idx: np.ndarray) -> tuple[torch.Tensor, ...]:
+        return (
+            torch.from_numpy(self.states[idx]),
+            torch.from_numpy(self.actions[idx]),
+            torch.from_numpy(self.rewards[idx]),
+            torch.from_numpy(self.next_states[idx]),
+            torch.from_numpy(self.dones[idx]),
+        )
+
+    def flush(self):
+        """Writes a memory-mapped buffer back to its files (no-op in memory)."""
+        if self.path:
+            for array in self._arrays:
+                array.flush()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.states, self.actions, self.rewards, self.next_states, self.dones))
+
+
+class SumTree:
+    """
+    Binary tree over `capacity` leaf priorities where every node holds the sum of its children.
+    Proportional sampling and priority updates are O(log n), vectorized over a whole batch.
+    Leaves live at [size, 2 * size) of a flat array (size = capacity rounded up to a power of two).
+    """
+
+    def __init__(self, capacity: int, tree: np.ndarray | None = None):
+        self.size = 1 << max(1, capacity - 1).bit_length()
+        self.tree = tree if tree is not None else np.zeros(2 * self.size, dtype=np.float64)
+
+    @staticmethod
+    def length_for(capacity: int) -> int:
+        return 2 * (1 << max(1, capacity - 1).bit_length())
+
+    @property
+    def total(self) -> float:
+        return float(self.tree[1])
+
+    def get(self, idx: np.ndarray) -> np.ndarray:
+        return self.tree[idx + self.size]
+
+    def update(self, idx: np.ndarray, priorities: np.ndarray):
+        nodes = np.asarray(idx, dtype=np.int64) + self.size
+        self.tree[nodes] = priorities  # Duplicate indices: the last value wins
+        while nodes[0] > 1:
+            nodes = np.unique(nodes // 2)
+            self.tree[nodes] = self.tree[2 * nodes] + self.tree[2 * nodes + 1]
+
+    def find(self, values: np.ndarray) -> np.ndarray:
+        """Leaf index whose cumulative priority range contains each value in [0, total)."""
+        nodes = np.ones(len(values), dtype=np.int64)
+        values = values.astype(np.float64, copy=True)
+        while nodes[0] < self.size:
+            left = 2 * nodes
+            left_sums = self.tree[left]
+            go_right = values >= left_sums
+            values -= np.where(go_right, left_sums, 0.0)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - self.size
+
+
+class PrioritizedReplayBuffer(ReplayBuffer):
+    """
+    Proportional prioritized replay (Schaul et al., 2016) on top of the ring buffer.
+
+    Transition i is drawn with probability p_i^alpha / sum_k p_k^alpha, where p_i is its last
+    |TD error| (new transitions get the current maximum, so each is replayed at least once).
+    `sample_prioritized` also returns importance-sampling weights (N * P(i))^-beta / max_j w_j that
+    correct the loss for the non-uniform sampling. The sum-tree is persisted next to the
+    memory-mapped arrays when `path` is set.
+    """
+
+    def __init__(
+        self,
+        capacity: int,
+        state_dim: int,
+        path: str | None = None,
+        alpha: float = 0.6,
+        beta: float = 0.4,
+        epsilon: float = 1e-6,
+    ):
+        super().__init__(capacity, state_dim, path)
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.tree = SumTree(capacity, self._open_tree())
+        if self.path:
+            self._arrays.append(self.tree.tree)
+
+        stored = self.tree.get(np.arange(len(self)))
+        self.max_priority = float(stored.max()) if len(self) and stored.max() > 0 else 1.0
+        if len(self) and self.tree.total == 0:
+            # Experience restored without priorities: start them all at the maximum
+            self.tree.update(np.arange(len(self)), np.full(len(self), self.max_priority))
+
+    def _open_tree(self) -> np.ndarray | None:
+        if not self.path:
+            return None
+        length = SumTree.length_for(self.capacity)
+        tree_path = os.path.join(self.path, "priorities.npy")
+        # Priorities belong to the stored transitions: when those were reset (e.g. the state shape grew
+        # with the vocabulary), old priorities of the same length would point the sampling at empty slots
+        if self._restored and os.path.exists(tree_path):
+            tree = np.load(tree_path, mmap_mode="r+")
+            if tree.shape == (length,) and tree.dtype == np.float64:
+                return tree
+        return np.lib.format.open_memmap(tree_path, mode="w+", dtype=np.float64, shape=(length,))
+
+    def add(self, state, action: int, reward: float, next_state, done: bool) -> int:
+        position = super().add(state, action, reward, next_state, done)
+        self.tree.update(np.array([position]), np.array([self.max_priority]))
+        return position
+
+    def add_batch(self, states, actions, rewards, next_states, dones) -> np.ndarray:
+        positions = super().add_batch(states, actions, rewards, next_states, dones)
+        self.tree.update(positions, np.full(len(positions), self.max_priority))
+        return positions
+
+    def sample_prioritized(
+        self, batch_size: int, rng: np.random.Generator | None = None
+    ) -> tuple[tuple[torch.Tensor, ...], torch.Tensor, np.ndarray]:
+        """
+        Stratified proportional sample: one draw from each of `batch_size` equal slices of the total priority.
+        Returns (transition tensors as in `sample`, importance weights (batch,), sampled slots).
+        """
+        rng = rng or self._rng
+        segment = self.tree.total / batch_size
+        values = (np.arange(batch_size) + rng.random(batch_size)) * segment
+        idx = np.minimum(self.tree.find(values), len(self) - 1)
+
+        probabilities = self.tree.get(idx) / self.tree.total
+        weights = (len(self) * probabilities) ** -self.beta
+        weights /= weights.max()
+        return self.gather(idx), torch.from_numpy(weights.astype(np.float32)), idx
+
+    def update_priorities(self, idx: np.ndarray, td_errors: np.ndarray):
+        priorities = (np.abs(td_errors) + self.epsilon) ** self.alpha
+        self.tree.update(idx, priorities)
+        self.max_priority = max(self.max_priority, float(priorities.max()))
@@ -1,13 +1,22 @@
 import os
 import random
-from collections import deque
+import threading
 
-# import numpy as np
+import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F  # noqa: N812
 from loguru import logger
 
+from . import registry
+from .growth import load_weights
+from .quantization import quantize_checked, quantize_dynamic
+from .registry import atomic_save
+from .replay import PrioritizedReplayBuffer, ReplayBuffer
+
+# Profile features after the knowledge slots in the state: Behavior (5) + Cognitive (2) + Preferences (4)
+STATE_FEATURES = 11
+
 
 class DQN(nn.Module):
     """
@@ -35,7 +44,19 @@ class RLAgent:
     Manages the DQN policy, exploration (epsilon-greedy), and experience replay.
     """
 
-    def __init__(self, input_dim: int, output_dim: int, device="cpu"):
+    def __init__(
+        self,
+        input_dim: int,
+        output_dim: int,
+        device="cpu",
+        quantize: bool = False,
+        quantization_tolerance: float = 0.1,
+        memory_capacity: int = 10000,
+        memory_path: str | None = None,
+        prioritized: bool = False,
+        per_alpha: float = 0.6,
+        per_beta: float = 0.4,
+    ):
         self.input_dim = input_dim
         self.output_dim = output_dim
         self.device = device
@@ -48,15 +69,30 @@ class RLAgent:
         self.target_net.eval()
 
         self.optimizer = torch.optim.Adam(self.policy_net.parameters(), lr=1e-3)
-        self.memory = deque(maxlen=10000)
+        # Preallocated ring buffer; memory-mapped (survives restarts) when memory_path is set
+        self.prioritized = prioritized
+        if prioritized:
+            self.memory = PrioritizedReplayBuffer(
+                memory_capacity, input_dim, path=memory_path, alpha=per_alpha, beta=per_beta
+            )
+        else:
+            self.memory = ReplayBuffer(memory_capacity, input_dim, path=memory_path)
+        # Guards the networks/optimizer against a hot-swap in the middle of a training step
+        self._lock = threading.Lock()
 
         # Hyperparameters
         self.batch_size = 64
         self.gamma = 0.99
         self.epsilon = 0.1  # Exploration rate (can be decayed)
 
+        # Inference mode: select_action reads `serving_net` (the policy itself, or an int8 copy of it)
+        self.quantize = quantize and device == "cpu"
+        self.quantization_tolerance = quantization_tolerance
+        self.serving_net: nn.Module = self.policy_net
+
         # Load weights if exist
         self.load_checkpoint()
+        self._refresh_serving_net(check=True)
 
     def select_action(self, state_vector: list[float], valid_actions: list[int] = None) -> int:
         """
@@ -69,8 +105,8 @@ class RLAgent:
             return random.randint(0, self.output_dim - 1)
 
         with torch.no_grad():
-            state_tensor = torch.FloatTensor(state_vector).unsqueeze(0).to(self.device)
-            q_values = self.policy_net(state_tensor)
+            state_tensor = torch.as_tensor(state_vector, dtype=torch.float32).unsqueeze(0).to(self.device)
+            q_values = self.serving_net(state_tensor)
 
             # Mask invalid actions (set Q to -inf)
             if valid_actions:
@@ -80,24 +116,62 @@ class RLAgent:
 
             return q_values.argmax().item()
 
+    def select_actions(self, states: np.ndarray, valid_mask: np.ndarray) -> np.ndarray:
+        """
+        Batched epsilon-greedy: one forward pass over states (n, input_dim) and a masked argmax per row.
+        valid_mask (n, output_dim) bool; a row with no valid action may pick any action.
+        Returns the chosen action per row (n,).
+        """
+        valid_mask = valid_mask.copy()
+        valid_mask[~valid_mask.any(axis=1)] = True
+
+        with torch.no_grad():
+            q_values = self.serving_net(torch.as_tensor(states, dtype=torch.float32).to(self.device)).cpu().numpy()
+        actions = np.where(valid_mask, q_values, -np.inf).argmax(axis=1)
+
+        # Exploration rows: uniform over their valid actions (argmax of random keys restricted to the mask)
+        explore = np.random.random(len(states)) < self.epsilon
+        if explore.any():
+            keys = np.where(valid_mask[explore], np.random.random(valid_mask[explore].shape), -1.0)
+            actions[explore] = keys.argmax(axis=1)
+        return actions
+
     def store_transition(self, state, action, reward, next_state, done):
-        self.memory.append((state, action, reward, next_state, done))
+        self.memory.add(state, action, reward, next_state, done)
 
-    def train_step(self):
+    def train_step(self, steps: int = 1) -> int:
         """
         Standard DQN training step: Sample batch -> Calc Loss -> Backprop
+        Runs `steps` of them back to back and returns how many ran (0 until the memory holds a batch).
         """
-        if len(self.memory) < self.batch_size:
-            return
+        if len(self.memory) < self.batch_size or steps <= 0:
+            return 0
+
+        with self._lock:
+            for _ in range(steps):
+                if self.prioritized:
+                    batch, weights, idx = self.memory.sample_prioritized(self.batch_size)
+                    td_errors = self._train_on_batch(batch, weights)
+                    self.memory.update_priorities(idx, td_errors)
+                else:
+                    self._train_on_batch(self.memory.sample(self.batch_size))
+            self._refresh_serving_net()
+        return steps
+
+    def sync_target(self):
+        """Copies the policy weights into the target network."""
+        with self._lock:
+            self.target_net.load_state_dict(self.policy_net.state_dict())
 
-        batch = random.sample(self.memory, self.batch_size)
-        batch_state, batch_action, batch_reward, batch_next_state, batch_done = zip(*batch, strict=False)
+    def _train_on_batch(self, batch, weights: torch.Tensor | None = None) -> np.ndarray:
+        """One gradient step. `weights` are importance-sampling weights (prioritized replay). Returns |TD errors|."""
+        batch_state, batch_action, batch_reward, batch_next_state, batch_done = batch
 
-        state = torch.FloatTensor(batch_state).to(self.device)
-        action = torch.LongTensor(batch_action).unsqueeze(1).to(self.device)
-        reward = torch.FloatTensor(batch_reward).unsqueeze(1).to(self.device)
-        next_state = torch.FloatTensor(batch_next_state).to(self.device)
-        done = torch.FloatTensor(batch_done).unsqueeze(1).to(self.device)
+        state = batch_state.to(self.device)
+        action = batch_action.unsqueeze(1).to(self.device)
+        reward = batch_reward.unsqueeze(1).to(self.device)
+        next_state = batch_next_state.to(self.device)
+        done = batch_done.unsqueeze(1).to(self.device)
 
         # Q(s, a)
         curr_q = self.policy_net(state).gather(1, action)
@@ -106,24 +180,88 @@ class RLAgent:
         next_q = self.target_net(next_state).max(1)[0].unsqueeze(1)
         expected_q = reward + (self.gamma * next_q * (1 - done))
 
-        loss = F.mse_loss(curr_q, expected_q.detach())
+        td_errors = curr_q - expected_q.detach()
+        if weights is None:
+            loss = td_errors.pow(2).mean()
+        else:
+            loss = (weights.to(self.device).unsqueeze(1) * td_errors.pow(2)).mean()
 
         self.optimizer.zero_grad()
         loss.backward()
         self.optimizer.step()
+        return td_errors.detach().abs().squeeze(1).cpu().numpy()
+
+    def install_policy(self, policy_net: DQN, version: str):
+        """
+        Replaces the policy with externally trained weights (model hot-swap).
+        The target network is re-synced and the optimizer restarted for the new parameters;
+        the replay memory is kept.
+        """
+        policy_net.to(self.device).train()  # Keeps learning online, like the original policy
+        target_net = DQN(self.input_dim, self.output_dim).to(self.device)
+        target_net.load_state_dict(policy_net.state_dict())
+        target_net.eval()
+        with self._lock:
+            self.policy_net = policy_net
+            self.target_net = target_net
+            self.optimizer = torch.optim.Adam(self.policy_net.parameters(), lr=1e-3)
+            self._refresh_serving_net(check=True)
+        logger.info(f"RL policy replaced with version {version}")
+
+    def _refresh_serving_net(self, check: bool = False):
+        """
+        Rebuilds the int8 serving copy after the float policy changed. The tolerance check runs
+        when new weights arrive (check=True); a policy that failed it keeps being served in float32.
+        """
+        if not self.quantize:
+            self.serving_net = self.policy_net
+        elif check:
+            states = torch.rand((256, self.input_dim), generator=torch.Generator().manual_seed(0)).to(self.device)
+            self.serving_net = quantize_checked(
+                self.policy_net, states, lambda m, x: m(x), self.quantization_tolerance, relative=True
+            )
+        elif self.serving_net is not self.policy_net:
+            self.serving_net = quantize_dynamic(self.policy_net)
 
     def save_checkpoint(self):
-        """Saves model weights to disk."""
+        """Saves model weights to disk (temp file + rename, so a crash never leaves a truncated file)."""
         try:
-            torch.save(self.policy_net.state_dict(), self.model_path)
+            with self._lock:
+                state_dict = {k: v.detach().clone() for k, v in self.policy_net.state_dict().items()}
+            atomic_save(state_dict, self.model_path)
+            self.memory.flush()
         except Exception as e:
             logger.error(f"Failed to save RL model: {e}")
 
+    def publish_policy(self, metadata: dict | None = None) -> str | None:
+        """
+        Publishes the current policy as a new "dqn" registry version (central learner mode).
+        Serving processes pick it up through their model watcher. Returns the version, or None on failure.
+        """
+        try:
+            with self._lock:
+                state_dict = {k: v.detach().clone() for k, v in self.policy_net.state_dict().items()}
+            version = registry.publish(
+                "dqn",
+                state_dict,
+                {
+                    "input_dim": self.input_dim,
+                    "output_dim": self.output_dim,
+                    "replay_size": len(self.memory),
+                    **(metadata or {}),
+                },
+            )
+            self.memory.flush()
+            return version
+        except Exception as e:
+            logger.error(f"Failed to publish RL model: {e}")
+            return None
+
     def load_checkpoint(self):
         """Loads model weights from disk."""
         if os.path.exists(self.model_path):
             try:
-                self.policy_net.load_state_dict(torch.load(self.model_path, map_location=self.device))
+                load_weights(self.policy_net, self.model_path, map_location=self.device)
                 self.target_net.load_state_dict(self.policy_net.state_dict())
                 logger.info(f"RL Model loaded from {self.model_path}")
             except Exception as e:
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Literal
 from uuid import UUID
 
 from pydantic import BaseModel
@@ -67,6 +67,18 @@ class RLRecommendationResponse(BaseModel):
     exploration_flag: bool = False
 
 
+class RLBatchRecommendationRequest(BaseModel):
+    requests: list[RLRecommendationRequest]
+
+
+class RLStudentRecommendation(RLRecommendationResponse):
+    student_id: UUID
+
+
+class RLBatchRecommendationResponse(BaseModel):
+    recommendations: list[RLStudentRecommendation]
+
+
 class RLRewardRequest(BaseModel):
     student_id: UUID
     prev_state_vector: list[float] | None = None  # Optional for stateless update
@@ -75,11 +87,35 @@ class RLRewardRequest(BaseModel):
 
 
 class IRTRequest(BaseModel):
-    history: list[dict[str, Any]]  # [{"difficulty": float, "correct": bool}]
+    history: list[dict[str, Any]]  # [{"question_id": str, "difficulty": float, "correct": bool, "concept_id": str}]
+    # Concepts to estimate in the "concept" IRT mode (e.g. the goal path); concepts of the history are added
+    concept_ids: list[str] | None = None
+
+
+class ItemResponse(BaseModel):
+    question_id: str
+    correct: bool
+
+
+class ItemResponseLogRequest(BaseModel):
+    student_id: UUID
+    source: Literal["cat", "quiz", "assessment"] = "quiz"
+    responses: list[ItemResponse]
+
+
+class ConceptAbility(BaseModel):
+    concept_id: str
+    theta: float
+    standard_error: float
+    mastery: float
 
 
 class IRTResponse(BaseModel):
     estimated_theta: float
+    standard_error: float
     next_difficulty_target: float
     current_mastery: float
     stop_test: bool = False
+    # "concept" IRT mode only: the concept the next item should come from, and every concept's estimate
+    next_concept_id: str | None = None
+    concepts: list[ConceptAbility] = []
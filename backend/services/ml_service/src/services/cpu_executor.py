@@ -0,0 +1,18 @@
+import asyncio
+import functools
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import TypeVar
+
+from ..config import settings
+
+T = TypeVar("T")
+
+# Bounded pool for CPU-bound torch calls made from async endpoints. torch releases the GIL inside
+# its kernels, so a few threads overlap forward passes while the event loop keeps serving I/O.
+torch_executor = ThreadPoolExecutor(max_workers=settings.TORCH_EXECUTOR_WORKERS, thread_name_prefix="torch")
+
+
+async def run_cpu_bound(fn: Callable[..., T], *args, **kwargs) -> T:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(torch_executor, functools.partial(fn, *args, **kwargs))
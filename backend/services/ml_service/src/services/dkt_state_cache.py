@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import torch
+
+
+@dataclass(slots=True)
+class CachedState:
+    hidden: tuple[torch.Tensor, torch.Tensor]  # (h, c), each (layer_dim, 1, hidden_dim)
+    seq_len: int  # Number of interactions already folded into the state
+    model_version: str  # States from other weights are meaningless to the active model
+    updated_at: float
+
+
+class DKTStateCache:
+    """
+    Bounded LRU store of per-student LSTM states.
+
+    An entry is only useful if it has consumed exactly the interactions that precede the
+    new one, so every entry remembers the history length it represents. Callers compare it
+    with the persisted length to detect gaps (e.g. another worker processed an answer),
+    and the model version with the active one to detect a hot-swap.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict[str, CachedState] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, student_id: str) -> CachedState | None:
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is None:
+                return None
+            if time.monotonic() - entry.updated_at > self.ttl_seconds:
+                del self._entries[student_id]
+                return None
+            self._entries.move_to_end(student_id)
+            return entry
+
+    def put(self, student_id: str, hidden: tuple[torch.Tensor, torch.Tensor], seq_len: int, model_version: str):
+        entry = CachedState(hidden=hidden, seq_len=seq_len, model_version=model_version, updated_at=time.monotonic())
+        with self._lock:
+            self._entries[student_id] = entry
+            self._entries.move_to_end(student_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, student_id: str):
+        with self._lock:
+            self._entries.pop(student_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
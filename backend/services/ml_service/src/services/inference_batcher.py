@@ -0,0 +1,105 @@
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+import torch
+from loguru import logger
+
+Hidden = tuple[torch.Tensor, torch.Tensor]
+# (padded tokens, lengths, initial hidden) -> (predictions, final hidden)
+ForwardFn = Callable[[torch.Tensor, torch.Tensor, Hidden], tuple[torch.Tensor, Hidden]]
+
+
+@dataclass(slots=True)
+class _Request:
+    tokens: list[int]
+    hidden: Hidden | None
+    future: Future = field(default_factory=Future)
+
+
+class InferenceBatcher:
+    """
+    Dynamic micro-batcher for DKT inference.
+
+    Callers block in `submit` while a background thread collects pending requests for up to
+    `max_wait_ms` (or `max_batch_size` items), right-pads the variable-length sequences,
+    runs a single packed forward pass and hands each caller its own row.
+    """
+
+    def __init__(self, forward_fn: ForwardFn, layer_dim: int, hidden_dim: int, max_batch_size: int, max_wait_ms: float):
+        self.forward_fn = forward_fn
+        self.layer_dim = layer_dim
+        self.hidden_dim = hidden_dim
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: queue.Queue[_Request] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._owner_pid: int | None = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, tokens: list[int], hidden: Hidden | None = None) -> tuple[torch.Tensor, Hidden]:
+        """
+        Returns (prediction (output_dim,), (h, c) of shape (layer_dim, 1, hidden_dim)).
+        """
+        self._ensure_started()
+        request = _Request(tokens, hidden)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _ensure_started(self):
+        # The service is built at import time, before Celery forks its workers,
+        # so the thread is started lazily inside the process that uses it.
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._owner_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._thread = threading.Thread(target=self._run, name="dkt-batcher", daemon=True)
+                self._owner_pid = os.getpid()
+                self._thread.start()
+
+    def _collect(self) -> list[_Request]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                self._process(batch)
+            except Exception as e:
+                logger.error(f"DKT batch of {len(batch)} failed: {e}")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _process(self, batch: list[_Request]):
+        size = len(batch)
+        lengths = torch.tensor([len(r.tokens) for r in batch], dtype=torch.long)
+        x = torch.zeros((size, int(lengths.max())), dtype=torch.long)
+        h0 = torch.zeros((self.layer_dim, size, self.hidden_dim))
+        c0 = torch.zeros((self.layer_dim, size, self.hidden_dim))
+
+        for i, request in enumerate(batch):
+            x[i, : len(request.tokens)] = torch.tensor(request.tokens, dtype=torch.long)
+            if request.hidden is not None:
+                h0[:, i, :] = request.hidden[0][:, 0, :]
+                c0[:, i, :] = request.hidden[1][:, 0, :]
+
+        predictions, (h, c) = self.forward_fn(x, lengths, (h0, c0))
+
+        for i, request in enumerate(batch):
+            request.future.set_result((predictions[i], (h[:, i : i + 1, :], c[:, i : i + 1, :])))
@@ -6,90 +6,183 @@ from loguru import logger
 from ..config import settings
 from ..database import get_student_history
 from ..models.dkt import get_model
-from ..utils import get_concept_index
+from ..models.growth import load_weights
+from ..models.quantization import quantize_checked
+from ..utils import CONCEPT_TO_INDEX, get_concept_index
+from .dkt_state_cache import DKTStateCache
+from .inference_batcher import InferenceBatcher
+from .model_manager import ModelManager, report_serving
 
 
 class InferenceService:
     def __init__(self):
-        self.model = get_model(settings)
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self.model.to(self.device)
-        self._load_weights()
-
-    def _load_weights(self):
+        model = self._build_model()
+        version = self._load_weights(model)
+        self.models = ModelManager(
+            "dkt",
+            self._build_model,
+            initial=(self._prepare(model), version),
+            prepare_fn=self._prepare,
+            warmup_fn=self._warmup,
+            on_swap=lambda swapped, swapped_version: report_serving("dkt", swapped, swapped_version),
+            poll_seconds=settings.MODEL_WATCH_INTERVAL_SECONDS,
+            device=self.device,
+        )
+        # A published registry version wins over the bundled weights
+        if not self.models.refresh():
+            report_serving("dkt", self.models.model, self.models.version)
+        self.state_cache = DKTStateCache(settings.DKT_STATE_CACHE_SIZE, settings.DKT_STATE_TTL_SECONDS)
+        self.batcher = None
+        if settings.DKT_BATCHING_ENABLED:
+            self.batcher = InferenceBatcher(
+                self._forward,
+                settings.LAYER_DIM,
+                settings.HIDDEN_DIM,
+                settings.DKT_BATCH_MAX_SIZE,
+                settings.DKT_BATCH_MAX_WAIT_MS,
+            )
+
+    @property
+    def model(self):
+        return self.models.model
+
+    def _build_model(self):
+        return get_model(settings).to(self.device).eval()
+
+    def _load_weights(self, model) -> str:
         """
-        Loads trained weights if they exist.
-        In a real production scenario, this would load from S3 or a Model Registry.
+        Loads the bundled weights if they exist. Returns the version label of what was loaded.
+        Newer weights are picked up from the model registry by the ModelManager.
         """
         base_dir = os.path.dirname(os.path.abspath(__file__))
         model_path = os.path.join(base_dir, "..", "models", "data", "dkt_model.pth")
         if os.path.exists(model_path):
             try:
-                self.model.load_state_dict(torch.load(model_path, map_location=self.device))
-                self.model.eval()
+                load_weights(model, model_path, map_location=self.device)
+                model.eval()
                 logger.info(f"Model weights loaded from {model_path}")
+                return "legacy"
             except Exception as e:
                 logger.error(f"Failed to load model weights: {e}")
         else:
             logger.warning("No model weights found. Using random initialization (untrained).")
+        return "untrained"
+
+    def _prepare(self, model):
+        """Swaps in the int8 dynamically quantized model when INFERENCE_QUANTIZE is on and it passes the check."""
+        if not settings.INFERENCE_QUANTIZE:
+            return model
+        if self.device.type != "cpu":
+            logger.warning("INFERENCE_QUANTIZE only applies to CPU inference; serving float32.")
+            return model
+        # Random full-window histories; forward() predicts after every prefix, so short ones are checked too
+        generator = torch.Generator().manual_seed(0)
+        inputs = torch.randint(0, settings.INPUT_DIM_DKT * 2, (64, settings.DKT_MAX_SEQ_LEN), generator=generator)
+        return quantize_checked(model, inputs, lambda m, x: m(x), settings.QUANTIZATION_TOLERANCE)
+
+    def _warmup(self, model):
+        """Runs the shapes seen in production once, so the first request after a swap is not slower."""
+        with torch.no_grad():
+            for steps in (1, settings.DKT_MAX_SEQ_LEN):
+                model.step(torch.zeros((1, steps), dtype=torch.long, device=self.device))
 
-    def predict_next_state(self, student_id: str, current_concept: str, current_correct: bool) -> dict[str, float]:
+    def predict_next_state(
+        self, student_id: str, interactions: list[tuple[str, bool]], seq_len: int | None = None
+    ) -> dict[str, float]:
+        """
+        Returns map of {concept_id: probability} for ALL concepts after the new interactions.
+        interactions: [(concept_id, is_correct), ...] already persisted, in order;
+        seq_len is the history length including them.
+
+        Fast path: advance the cached (h, c) of the student by the new steps - O(1) in history length.
+        Fallback: replay the last DKT_MAX_SEQ_LEN interactions from the DB and re-seed the cache.
+        The fast path only runs while the whole history fits in that window: beyond it the replay sees
+        the last DKT_MAX_SEQ_LEN interactions only, and a cached state (the whole history) would give
+        another prediction depending on whether the cache was warm.
         """
-        1. Loads history.
-        2. Appends current interaction.
-        3. Runs DKT.
-        4. Returns map of {concept_id: probability} for ALL concepts.
+        # One model for the whole request, even if a hot-swap happens meanwhile
+        model, version = self.models.active()
+        cached = self.state_cache.get(student_id)
+        if (
+            seq_len is not None
+            and seq_len <= settings.DKT_MAX_SEQ_LEN
+            and cached is not None
+            and cached.model_version == version
+            and cached.seq_len == seq_len - len(interactions)
+        ):
+            tokens = self._encode_all((concept_id, correct) for concept_id, correct in interactions)
+            if tokens:
+                prediction, hidden = self._run(model, tokens, cached.hidden)
+                self.state_cache.put(student_id, hidden, seq_len, version)
+                return self._decode(prediction)
+
+        return self._predict_full(student_id, model, version)
+
+    def _predict_full(self, student_id: str, model, version: str) -> dict[str, float]:
+        """
+        1. Loads history (already containing the current interaction).
+        2. Runs DKT over the most recent window.
+        3. Caches the resulting LSTM state for the incremental path.
         """
         # 1. Fetch History
-        history = get_student_history(student_id)
-
-        # 2. Prepare Sequence
-        # Add the current one conceptually to see the *result* state
-        history.append({"concept_id": current_concept, "correct": current_correct})
-
         # Limit sequence length for performance (e.g., last 50 interactions)
-        max_seq_len = 50
-        if len(history) > max_seq_len:
-            history = history[-max_seq_len:]
-
-        # 3. Vectorize
-        input_seq = []
-        input_dim = settings.INPUT_DIM_DKT
-
-        for item in history:
-            c_idx = get_concept_index(item["concept_id"])
-            # x = concept_index + (TotalConcepts * Correctness)
-            val = c_idx + (input_dim if item["correct"] else 0)
-            input_seq.append(val)
+        history = get_student_history(student_id, limit=settings.DKT_MAX_SEQ_LEN)
+        if not history:
+            return {}
+        total_len = history[-1]["seq"]
 
+        # 2. Vectorize
+        input_seq = self._encode_all((item["concept_id"], item["correct"]) for item in history)
         if not input_seq:
             return {}
 
-        # Shape: (Batch=1, SeqLen)
-        input_tensor = torch.tensor([input_seq], dtype=torch.long).to(self.device)
-
-        # 4. Inference
-        self.model.eval()
-        with torch.no_grad():
-            # Output Shape: (1, SeqLen, OutputDim)
-            output = self.model(input_tensor)
+        # 3. Inference
+        # We are interested in the prediction AFTER the last step, shape: (OutputDim,)
+        prediction, hidden = self._run(model, input_seq)
 
-        # We are interested in the prediction AFTER the last step
-        # shape: (OutputDim,)
-        last_step_prediction = output[0, -1, :]
+        # A state that already spans the whole window cannot be advanced (see predict_next_state)
+        if total_len < settings.DKT_MAX_SEQ_LEN:
+            self.state_cache.put(student_id, hidden, total_len, version)
+        return self._decode(prediction)
 
-        # 5. Decode to Concept IDs
-        # We need the reverse mapping or just iterate indices
-        mastery_map = {}
-        # Assuming utils has CONCEPT_TO_INDEX. We iterate it to map back.
-        # Ideally we'd have INDEX_TO_CONCEPT.
-        from ..utils import CONCEPT_TO_INDEX
+    def _run(self, model, tokens: list[int], hidden=None):
+        """
+        Runs one sequence through DKT, via the micro-batcher when enabled
+        (batches always run on the currently active model).
+        Returns (prediction (OutputDim,), (h, c)).
+        """
+        if self.batcher is not None:
+            return self.batcher.submit(tokens, hidden)
 
-        for c_id, idx in CONCEPT_TO_INDEX.items():
-            if idx < len(last_step_prediction):
-                mastery_map[c_id] = float(last_step_prediction[idx].item())
+        # Shape: (Batch=1, SeqLen)
+        input_tensor = torch.tensor([tokens], dtype=torch.long).to(self.device)
+        with torch.no_grad():
+            prediction, hidden = model.step(input_tensor, hidden)
+        return prediction[0], hidden
 
-        return mastery_map
+    def _forward(self, x: torch.Tensor, lengths: torch.Tensor, hidden):
+        """Batched forward pass used by the InferenceBatcher (padded x, lengths on CPU)."""
+        hidden = (hidden[0].to(self.device), hidden[1].to(self.device))
+        with torch.no_grad():
+            return self.model.step(x.to(self.device), hidden, lengths)
+
+    def _encode(self, concept_id: str, correct: bool) -> int | None:
+        # x = concept_index + (TotalConcepts * Correctness); None for concepts without a model slot
+        idx = get_concept_index(concept_id)
+        if idx is None or idx >= settings.INPUT_DIM_DKT:
+            return None
+        return idx + (settings.INPUT_DIM_DKT if correct else 0)
+
+    def _encode_all(self, interactions) -> list[int]:
+        """Tokens of the (concept_id, correct) pairs, skipping concepts unknown to the model."""
+        tokens = [self._encode(concept_id, correct) for concept_id, correct in interactions]
+        return [token for token in tokens if token is not None]
+
+    def _decode(self, prediction: torch.Tensor) -> dict[str, float]:
+        """Maps the output vector (OutputDim,) back to {concept_id: probability}."""
+        probabilities = prediction.tolist()
+        return {c_id: probabilities[idx] for c_id, idx in CONCEPT_TO_INDEX.items() if idx < len(probabilities)}
 
 
 inference_service = InferenceService()
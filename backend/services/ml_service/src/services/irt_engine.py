@@ -1,6 +1,34 @@
+from dataclasses import dataclass
+
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from ..config import settings
+
+
+@dataclass
+class ConceptAbilities:
+    """Per-concept estimate: the global theta and one shrunken theta per concept, all with standard errors."""
 
-# from loguru import logger
+    theta: float
+    standard_error: float
+    concept_ids: list[str]
+    concept_thetas: np.ndarray
+    concept_standard_errors: np.ndarray
+
+    def standard_errors_of(self, concept_ids: list[str] | None = None) -> dict[str, float]:
+        """Standard error per concept, restricted to `concept_ids` when given (in the estimate's order)."""
+        wanted = None if concept_ids is None else set(concept_ids)
+        return {
+            concept_id: float(se)
+            for concept_id, se in zip(self.concept_ids, self.concept_standard_errors, strict=True)
+            if wanted is None or concept_id in wanted
+        }
+
+    def most_uncertain_concept(self, concept_ids: list[str] | None = None) -> str | None:
+        """The concept with the highest posterior variance (first in the given order on ties)."""
+        standard_errors = self.standard_errors_of(concept_ids)
+        return max(standard_errors, key=standard_errors.get) if standard_errors else None
 
 
 class IRTEngine:
@@ -13,13 +41,66 @@ class IRTEngine:
     Where:
     - theta: Student ability (standard normal scale, approx -3 to +3)
     - b: Item difficulty (standard normal scale)
-    - a: Discrimination parameter (assumed 1.0 for this MVP)
+    - a: Discrimination parameter (history items may carry "discrimination", default 1.0)
+
+    Estimators (all vectorized over the quadrature grid x answered items):
+    - "eap": posterior mean under a N(0, prior_sd) prior; SE = posterior standard deviation.
+    - "mle": Newton-Raphson on the log-likelihood; SE = 1 / sqrt(test information).
+    - "grid": max likelihood on the quadrature grid (the original MVP estimator).
+
+    Dimensions:
+    - "global": one theta for the whole test (the estimators above).
+    - "concept": one theta per concept (history items carry "concept_id"), theta_c = theta + delta_c with
+      delta_c ~ N(0, concept_shrinkage_sd), so concepts with few answers are shrunk toward the global theta.
+      Exact posterior means/SDs on the (global grid x deviation grid) per concept; see estimate_concepts.
     """
 
+    def __init__(
+        self,
+        estimator: str = "eap",
+        prior_sd: float = 1.0,
+        quadrature_points: int = 61,
+        se_threshold: float = 0.5,
+        min_items: int = 5,
+        max_items: int = 15,
+        dimensions: str = "global",
+        concept_shrinkage_sd: float = 0.5,
+        concept_se_threshold: float = 0.6,
+        concept_items_per_concept: int = 5,
+        concept_max_items: int = 50,
+    ):
+        if estimator not in ("eap", "mle", "grid"):
+            raise ValueError(f"Unknown IRT estimator: {estimator}")
+        if dimensions not in ("global", "concept"):
+            raise ValueError(f"Unknown IRT dimensions: {dimensions}")
+        self.estimator = estimator
+        self.dimensions = dimensions
+        self.concept_se_threshold = concept_se_threshold
+        self.concept_items_per_concept = concept_items_per_concept
+        self.concept_max_items = concept_max_items
+        self.prior_sd = prior_sd
+        self.se_threshold = se_threshold
+        self.min_items = min_items
+        self.max_items = max_items
+        # Range -3 to +3 (step 0.1 with the default 61 points)
+        self.thetas = np.linspace(-3.0, 3.0, quadrature_points)
+        self.log_prior = -0.5 * (self.thetas / prior_sd) ** 2
+
+        # Concept deviations live on the same step as the grid, so theta + delta is a node of an extended grid
+        step = self.thetas[1] - self.thetas[0] if quadrature_points > 1 else 1.0
+        half_width = int(np.ceil(4.0 * concept_shrinkage_sd / step)) if concept_shrinkage_sd > 0 else 0
+        offsets = np.arange(-half_width, half_width + 1) * step
+        log_weights = -0.5 * (offsets / concept_shrinkage_sd) ** 2 if half_width else np.zeros(1)
+        self.deviation_log_prior = log_weights - np.log(np.exp(log_weights).sum())
+        self.extended_thetas = np.concatenate(
+            [self.thetas[0] + offsets[:half_width], self.thetas, self.thetas[-1] + offsets[half_width + 1 :]]
+        )
+        self.half_width = half_width
+
     def sigmoid(self, x):
         return 1 / (1 + np.exp(-x))
 
-    def normalize_difficulty(self, kg_difficulty: float) -> float:
+    def normalize_difficulty(self, kg_difficulty):
         """
         Maps KG difficulty (1.0 - 10.0) to Standard Normal (-3.0 to +3.0).
         Center (5.5) -> 0.0
@@ -33,39 +114,155 @@ class IRTEngine:
         val = (theta * 1.5) + 5.5
         return float(np.clip(val, 1.0, 10.0))
 
-    def estimate_ability(self, history: list[dict]) -> float:
+    def item_arrays(self, history: list[dict]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """history -> (b, a, responses) arrays of shape (n_items,)."""
+        b = self.normalize_difficulty(np.array([float(item["difficulty"]) for item in history]))
+        a = np.array([float(item.get("discrimination") or 1.0) for item in history])
+        u = np.array([1.0 if item["correct"] else 0.0 for item in history])
+        return b, a, u
+
+    def item_log_likelihoods(self, thetas: np.ndarray, b: np.ndarray, a: np.ndarray, u: np.ndarray) -> np.ndarray:
+        """Log-likelihood of every response at every theta: (n_thetas, n_items)."""
+        z = a * (thetas[:, None] - b)
+        # log P = -log(1 + e^-z), log(1 - P) = -log(1 + e^z): exact, no clipping needed
+        return -(u * np.logaddexp(0.0, -z) + (1.0 - u) * np.logaddexp(0.0, z))
+
+    def log_likelihood(self, thetas: np.ndarray, b: np.ndarray, a: np.ndarray, u: np.ndarray) -> np.ndarray:
+        """Log-likelihood of the responses at every theta: (n_thetas,) from one (n_thetas, n_items) pass."""
+        return self.item_log_likelihoods(thetas, b, a, u).sum(axis=1)
+
+    def information(self, theta: float, b: np.ndarray, a: np.ndarray) -> float:
+        """Test information at theta: sum of a^2 * P * (1 - P)."""
+        p = self.sigmoid(a * (theta - b))
+        return float((a * a * p * (1.0 - p)).sum())
+
+    def estimate_grid(self, b: np.ndarray, a: np.ndarray, u: np.ndarray) -> tuple[float, float]:
+        theta = float(self.thetas[np.argmax(self.log_likelihood(self.thetas, b, a, u))])
+        return theta, self._information_se(theta, b, a)
+
+    def estimate_eap(self, b: np.ndarray, a: np.ndarray, u: np.ndarray) -> tuple[float, float]:
+        log_posterior = self.log_likelihood(self.thetas, b, a, u) + self.log_prior
+        weights = np.exp(log_posterior - log_posterior.max())
+        weights /= weights.sum()
+        theta = float(weights @ self.thetas)
+        return theta, float(np.sqrt(weights @ (self.thetas - theta) ** 2))
+
+    def estimate_mle(
+        self, b: np.ndarray, a: np.ndarray, u: np.ndarray, max_iter: int = 20, tol: float = 1e-6
+    ) -> tuple[float, float]:
+        """
+        Newton-Raphson from the EAP estimate. All-correct / all-wrong histories have no finite MLE;
+        theta then stops at the grid bound (+/-3), like the grid estimator.
+        """
+        theta, _ = self.estimate_eap(b, a, u)
+        low, high = self.thetas[0], self.thetas[-1]
+        for _ in range(max_iter):
+            p = self.sigmoid(a * (theta - b))
+            gradient = float((a * (u - p)).sum())
+            curvature = float((a * a * p * (1.0 - p)).sum())
+            if curvature <= 0.0:
+                break
+            updated = float(np.clip(theta + gradient / curvature, low, high))
+            if abs(updated - theta) < tol:
+                theta = updated
+                break
+            theta = updated
+        return theta, self._information_se(theta, b, a)
+
+    def estimate(self, history: list[dict]) -> tuple[float, float]:
         """
-        Estimates theta using a simplified iterative approach (Hill Climbing)
-        maximizing the Likelihood function based on response history.
+        Estimates (theta, standard error) from the response history with the configured estimator.
 
-        history: [{"difficulty": 5.0, "correct": True}, ...]
+        history: [{"difficulty": 5.0, "correct": True, "discrimination": 1.0 (optional)}, ...]
         """
         if not history:
-            return 0.0  # Start at average ability
+            return 0.0, self.prior_sd  # Start at average ability
+
+        b, a, u = self.item_arrays(history)
+        if self.estimator == "mle":
+            return self.estimate_mle(b, a, u)
+        if self.estimator == "grid":
+            return self.estimate_grid(b, a, u)
+        return self.estimate_eap(b, a, u)
 
-        # Grid search for MVP (Robust and stateless)
-        # Range -3 to +3 with step 0.1
-        thetas = np.linspace(-3.0, 3.0, 61)
-        log_likelihoods = np.zeros_like(thetas)
+    def estimate_concepts(self, history: list[dict], concept_ids: list[str] | None = None) -> ConceptAbilities:
+        """
+        Per-concept abilities for `concept_ids` (e.g. the goal path) plus any concept in the history.
+        Concepts without answers get the global estimate with the extra deviation variance.
 
-        for i, theta in enumerate(thetas):
-            ll = 0.0
-            for item in history:
-                b = self.normalize_difficulty(item["difficulty"])
-                prob = self.sigmoid(theta - b)  # a=1.0
+        The response log-likelihoods on the extended grid are summed per concept with one
+        (nodes x items) @ (items x concepts) product; the (global node, deviation) pairs of a concept are
+        then sliding windows over its row. Summing the deviations out per concept gives the global
+        posterior, and conditioning on each node gives the concept posteriors.
+        """
+        concept_ids = list(
+            dict.fromkeys([*(concept_ids or []), *(h["concept_id"] for h in history if h.get("concept_id"))])
+        )
+        index = {concept_id: i for i, concept_id in enumerate(concept_ids)}
+        width = 2 * self.half_width + 1
 
-                # Avoid log(0)
-                prob = np.clip(prob, 1e-9, 1.0 - 1e-9)
+        if history:
+            b, a, u = self.item_arrays(history)
+            item_ll = self.item_log_likelihoods(self.extended_thetas, b, a, u)  # (extended nodes, items)
+        else:
+            item_ll = np.zeros((len(self.extended_thetas), 0))
+        membership = np.zeros((len(history), len(concept_ids)))
+        rows = [(i, index[h["concept_id"]]) for i, h in enumerate(history) if h.get("concept_id")]
+        if rows:
+            membership[tuple(np.array(rows).T)] = 1.0
+        concept_ll = (item_ll @ membership).T  # (concepts, extended nodes)
+        # Answers without a concept inform the global theta only
+        unassigned = ~membership.any(axis=1)
+        global_ll = item_ll[self.half_width : self.half_width + len(self.thetas), unassigned].sum(axis=1)
 
-                if item["correct"]:
-                    ll += np.log(prob)
-                else:
-                    ll += np.log(1.0 - prob)
-            log_likelihoods[i] = ll
+        # Per concept and global node g: sums over the deviations d of w_d * L_c(g + d) * theta^k, k = 0, 1, 2,
+        # each a window product over the concept's likelihood row (scaled by its max, kept in log_scale)
+        log_scale = concept_ll.max(axis=1, keepdims=True)
+        likelihood = np.exp(concept_ll - log_scale)
+        deviation_prior = np.exp(self.deviation_log_prior)
+        moments = [
+            sliding_window_view(likelihood * self.extended_thetas**k, width, axis=1) @ deviation_prior for k in range(3)
+        ]  # Each (concepts, nodes)
+        marginal = np.maximum(moments[0], np.finfo(float).tiny)
 
-        # Return theta with max likelihood
-        best_idx = np.argmax(log_likelihoods)
-        return float(thetas[best_idx])
+        log_posterior = self.log_prior + global_ll + (np.log(marginal) + log_scale).sum(axis=0)
+        weights = np.exp(log_posterior - log_posterior.max())
+        weights /= weights.sum()
+        theta = float(weights @ self.thetas)
+        standard_error = float(np.sqrt(weights @ (self.thetas - theta) ** 2))
+
+        # E[theta_c^k] = sum over g of P(g) * E[(g + d)^k | g, answers of c]
+        concept_thetas = (moments[1] / marginal) @ weights
+        second_moments = (moments[2] / marginal) @ weights
+        return ConceptAbilities(
+            theta=theta,
+            standard_error=standard_error,
+            concept_ids=concept_ids,
+            concept_thetas=concept_thetas,
+            concept_standard_errors=np.sqrt(np.maximum(second_moments - concept_thetas**2, 0.0)),
+        )
+
+    def estimate_ability(self, history: list[dict]) -> float:
+        return self.estimate(history)[0]
+
+    def should_stop(self, num_items: int, standard_error: float) -> bool:
+        """Stops once theta is precise enough (after a minimum test length) or at the maximum length."""
+        if num_items >= self.max_items:
+            return True
+        return num_items >= self.min_items and standard_error <= self.se_threshold
+
+    def should_stop_concepts(
+        self, num_items: int, abilities: ConceptAbilities, concept_ids: list[str] | None = None
+    ) -> bool:
+        """Like should_stop, but the standard error of every (given) concept must be below concept_se_threshold."""
+        if num_items >= self.max_items_for_concepts(len(abilities.concept_ids)):
+            return True
+        worst = max(abilities.standard_errors_of(concept_ids).values(), default=abilities.standard_error)
+        return num_items >= self.min_items and worst <= self.concept_se_threshold
+
+    def max_items_for_concepts(self, num_concepts: int) -> int:
+        """Per-concept test length cap: concept_items_per_concept per concept, within [max_items, concept_max_items]."""
+        return max(self.max_items, min(self.concept_max_items, self.concept_items_per_concept * num_concepts))
 
     def get_next_target_difficulty(self, current_theta: float) -> float:
         """
@@ -79,5 +276,21 @@ class IRTEngine:
         # Map -3..+3 to 0..1 roughly
         return float(self.sigmoid(theta))
 
+    def _information_se(self, theta: float, b: np.ndarray, a: np.ndarray) -> float:
+        information = self.information(theta, b, a)
+        return float(1.0 / np.sqrt(information)) if information > 0.0 else float("inf")
+
 
-irt_engine = IRTEngine()
+irt_engine = IRTEngine(
+    estimator=settings.IRT_ESTIMATOR,
+    prior_sd=settings.IRT_PRIOR_SD,
+    quadrature_points=settings.IRT_QUADRATURE_POINTS,
+    se_threshold=settings.IRT_SE_THRESHOLD,
+    min_items=settings.IRT_MIN_ITEMS,
+    max_items=settings.IRT_MAX_ITEMS,
+    dimensions=settings.IRT_DIMENSIONS,
+    concept_shrinkage_sd=settings.IRT_CONCEPT_SHRINKAGE_SD,
+    concept_se_threshold=settings.IRT_CONCEPT_SE_THRESHOLD,
+    concept_items_per_concept=settings.IRT_CONCEPT_ITEMS_PER_CONCEPT,
+    concept_max_items=settings.IRT_CONCEPT_MAX_ITEMS,
+)
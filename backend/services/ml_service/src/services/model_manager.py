@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from collections.abc import Callable
+
+import redis
+import torch
+import torch.nn as nn
+from loguru import logger
+
+from ..config import settings
+from ..models import registry
+from ..models.growth import load_weights
+from ..models.quantization import precision
+
+_SERVING_KEY = "ml:serving:"
+
+
+def report_serving(kind: str, model: nn.Module, version: str):
+    """
+    Records the (version, precision) a process serves for `kind` in Redis, for /health of processes
+    that do not serve that model themselves (DKT runs in the Celery workers). Best effort.
+    """
+    status = {"version": version, "precision": precision(model)}
+    try:
+        redis.Redis.from_url(settings.REDIS_URL).set(_SERVING_KEY + kind, json.dumps(status))
+    except redis.RedisError as e:
+        logger.error(f"Failed to report the served {kind} model: {e}")
+
+
+def reported_serving(kind: str) -> dict | None:
+    """The last (version, precision) reported by a process serving `kind`, if any."""
+    try:
+        raw = redis.Redis.from_url(settings.REDIS_URL).get(_SERVING_KEY + kind)
+    except redis.RedisError as e:
+        logger.error(f"Failed to read the served {kind} model: {e}")
+        return None
+    return json.loads(raw) if raw else None
+
+
+class ModelManager:
+    """
+    Keeps the live model of one registry kind ("dkt", "dqn") and swaps in newer versions without a restart.
+
+    A watcher thread polls <MODEL_REGISTRY_DIR>/<kind>/. A new version is loaded into a fresh module,
+    prepared for serving (e.g. quantized) and warmed up off the request path, then published by
+    replacing a single (model, version) reference. A request that already took `active()` finishes on the model it started with.
+    """
+
+    def __init__(
+        self,
+        kind: str,
+        build_fn: Callable[[], nn.Module],
+        initial: tuple[nn.Module, str],
+        prepare_fn: Callable[[nn.Module], nn.Module] | None = None,
+        warmup_fn: Callable[[nn.Module], None] | None = None,
+        on_swap: Callable[[nn.Module, str], None] | None = None,
+        poll_seconds: float = 30.0,
+        device: torch.device | str = "cpu",
+    ):
+        self.kind = kind
+        self.build_fn = build_fn
+        self.prepare_fn = prepare_fn
+        self.warmup_fn = warmup_fn
+        self.on_swap = on_swap
+        self.poll_seconds = poll_seconds
+        self.device = device
+        self._active = initial
+        self._failed_version: str | None = None
+        self._refresh_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._owner_pid: int | None = None
+        self._start_lock = threading.Lock()
+
+    def active(self) -> tuple[nn.Module, str]:
+        """Returns (model, version). Take it once per request and use that pair throughout."""
+        self.start_watching()
+        return self._active
+
+    @property
+    def model(self) -> nn.Module:
+        return self._active[0]
+
+    @property
+    def version(self) -> str:
+        return self._active[1]
+
+    def refresh(self) -> bool:
+        """Loads and activates the latest registry version if it differs from the active one."""
+        latest = registry.latest_version(self.kind)
+        if latest is None or latest == self.version or latest == self._failed_version:
+            return False
+
+        with self._refresh_lock:
+            if latest == self.version:
+                return False
+            try:
+                model = self.build_fn()
+                load_weights(model, registry.weights_path(self.kind, latest), map_location=self.device)
+                model.eval()
+                if self.prepare_fn is not None:
+                    model = self.prepare_fn(model)
+                if self.warmup_fn is not None:
+                    self.warmup_fn(model)
+            except Exception as e:
+                logger.error(f"Failed to load {self.kind} version {latest}, keeping {self.version}: {e}")
+                self._failed_version = latest
+                return False
+
+            previous = self.version
+            if self.on_swap is not None:
+                self.on_swap(model, latest)
+            self._active = (model, latest)
+            logger.info(f"Swapped {self.kind} model {previous} -> {latest}")
+            return True
+
+    def start_watching(self):
+        # Services are built at import time, before Celery forks its workers,
+        # so the watcher is started lazily inside the process that uses it.
+        if self.poll_seconds <= 0 or (self._thread is not None and self._owner_pid == os.getpid()):
+            return
+        with self._start_lock:
+            if self._thread is None or self._owner_pid != os.getpid():
+                self._thread = threading.Thread(target=self._watch, name=f"{self.kind}-model-watcher", daemon=True)
+                self._owner_pid = os.getpid()
+                self._thread.start()
+
+    def _watch(self):
+        while True:
+            time.sleep(self.poll_seconds)
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"{self.kind} model watcher error: {e}")
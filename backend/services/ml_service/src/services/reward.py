@@ -0,0 +1,22 @@
+def calculate_reward(
+    mastery_delta: float, behavior_delta: float, concept_difficulty: float, student_ability: float
+) -> float:
+    """
+    R_t = w1 * R_knowledge + w2 * R_engagement - w3 * R_load.
+    Free of service dependencies so offline environments (experiments/) compute the same reward.
+    Works elementwise on NumPy arrays as well.
+    """
+    w1, w2, w3 = 1.0, 0.5, 0.2
+
+    # R_knowledge
+    r_know = mastery_delta
+
+    # R_engagement (negative delta in procrastination is good)
+    r_engage = -behavior_delta
+
+    # R_load
+    load_diff = concept_difficulty - student_ability
+    load_diff = load_diff * (load_diff > 0)  # max(0, .) for scalars and arrays alike
+    r_load = load_diff * load_diff
+
+    return (w1 * r_know) + (w2 * r_engage) - (w3 * r_load)
@@ -1,16 +1,69 @@
-# import numpy as np
-# import torch
+import asyncio
+import os
+
+import numpy as np
+import torch
 from loguru import logger
 
+from .. import async_database
 from ..config import settings
-from ..database import get_all_student_knowledge, get_behavioral_profile
-from ..models.rl import RLAgent
-from ..utils import CONCEPT_TO_INDEX, get_concept_index
-
-INPUT_DIM = settings.INPUT_DIM_RL + 11
+from ..models.rl import DQN, STATE_FEATURES, RLAgent
+from ..utils import get_concept_from_index, get_concept_index
+from .cpu_executor import run_cpu_bound
+from .model_manager import ModelManager
+from .reward import calculate_reward
+from .rl_learner import BackgroundLearner
+from .rl_transitions import TransitionPublisher
+from .state_cache import student_state_cache
+
+INPUT_DIM = settings.INPUT_DIM_RL + STATE_FEATURES
 OUTPUT_DIM = settings.OUTPUT_DIM_RL
-
-rl_agent = RLAgent(INPUT_DIM, OUTPUT_DIM)
+# Actors only: experience goes to the central learner (src/training/dqn_learner.py), which owns the replay memory
+REMOTE_LEARNER = settings.RL_LEARNER_MODE == "remote"
+
+rl_agent = RLAgent(
+    INPUT_DIM,
+    OUTPUT_DIM,
+    quantize=settings.INFERENCE_QUANTIZE,
+    quantization_tolerance=settings.QUANTIZATION_TOLERANCE,
+    memory_capacity=1 if REMOTE_LEARNER else settings.RL_REPLAY_CAPACITY,
+    memory_path=None if REMOTE_LEARNER else settings.RL_REPLAY_PATH,
+    prioritized=settings.RL_PRIORITIZED_REPLAY,
+    per_alpha=settings.RL_PER_ALPHA,
+    per_beta=settings.RL_PER_BETA,
+)
+
+
+def _warmup_dqn(model: DQN):
+    with torch.no_grad():
+        model(torch.zeros((1, INPUT_DIM)))
+
+
+# Published "dqn" registry versions replace the agent's policy without a restart. A local learner would
+# lose what it trained online to any published version, so it only follows them when configured to.
+FOLLOW_REGISTRY = REMOTE_LEARNER or settings.RL_LOCAL_FOLLOW_REGISTRY
+rl_models = ModelManager(
+    "dqn",
+    lambda: DQN(INPUT_DIM, OUTPUT_DIM),
+    initial=(rl_agent.policy_net, "legacy" if os.path.exists(rl_agent.model_path) else "untrained"),
+    warmup_fn=_warmup_dqn,
+    on_swap=rl_agent.install_policy,
+    poll_seconds=settings.MODEL_WATCH_INTERVAL_SECONDS if FOLLOW_REGISTRY else 0,
+)
+if FOLLOW_REGISTRY:
+    rl_models.refresh()
+
+rl_learner: BackgroundLearner | TransitionPublisher
+if REMOTE_LEARNER:
+    rl_learner = TransitionPublisher(settings.RL_TRANSITION_STREAM, maxlen=settings.RL_TRANSITION_STREAM_MAXLEN)
+else:
+    rl_learner = BackgroundLearner(
+        rl_agent,
+        train_every=settings.RL_TRAIN_EVERY_TRANSITIONS,
+        train_interval=settings.RL_TRAIN_INTERVAL_SECONDS,
+        checkpoint_interval=settings.RL_CHECKPOINT_INTERVAL_SECONDS,
+        target_sync_steps=settings.RL_TARGET_SYNC_STEPS,
+    )
 
 
 class RLEngine:
@@ -26,11 +79,9 @@ class RLEngine:
         Constructs state S_t and queries the agent.
         """
         # 1. Fetch State Components
-        # K_t: Knowledge State (from local DB)
-        knowledge_map = get_all_student_knowledge(student_id)  # {cid: mastery}
-
-        # B_t: Behavioral Profile (from local DB - synced via events)
-        behavior_profile = get_behavioral_profile(student_id)
+        # K_t (Knowledge, dense by concept index) + B_t (Behavior, synced via events):
+        # served from the state cache, which DB writes invalidate
+        student_features = await self._cached_student_features(student_id)
 
         # psi: Cognitive Profile (passed from request to avoid circular dependency)
         cognitive_profile = profile_data.get("cognitive_profile", {})
@@ -38,30 +89,80 @@ class RLEngine:
 
         # 2. Vectorize State S_t
         # This must match the model's expected input structure strictly.
-        state_vector = self._vectorize_state(knowledge_map, behavior_profile, cognitive_profile, preferences)
+        state_vector = np.concatenate([student_features, self._profile_features(cognitive_profile, preferences)])
 
         # 3. Determine Valid Actions (Concepts)
         # We map UUIDs to Indices [0..99]
-        valid_indices = [get_concept_index(cid) for cid in valid_concept_ids if cid in CONCEPT_TO_INDEX]
+        valid_indices = [
+            idx for idx in (get_concept_index(cid) for cid in valid_concept_ids) if idx is not None and idx < OUTPUT_DIM
+        ]
 
         if not valid_indices:
             # Fallback: if no valid concepts mapped, allow all (exploration)
             valid_indices = list(range(OUTPUT_DIM))
 
         # 4. Select Action
-        action_idx = rl_agent.select_action(state_vector, valid_indices)
+        action_idx = await run_cpu_bound(rl_agent.select_action, state_vector, valid_indices)
 
         # 5. Decode Action -> Concept ID
-        # Invert the mapping. Ideally, utils has INDEX_TO_CONCEPT.
-        # Doing a linear search for now (MVP).
-        selected_concept_id = None
-        for cid, idx in CONCEPT_TO_INDEX.items():
-            if idx == action_idx:
-                selected_concept_id = cid
-                break
+        selected_concept_id = get_concept_from_index(action_idx)
 
         return selected_concept_id or valid_concept_ids[0]
 
+    async def get_recommendations_batch(self, requests: list[dict]) -> list[str]:
+        """
+        Batched get_recommendation for many students.
+        requests: [{"student_id", "valid_concept_ids", "student_profile"}, ...]
+        Knowledge and behavior are fetched with one set-based query each, the states are stacked
+        into one (n, INPUT_DIM) tensor and the per-row action masks are applied in one pass.
+        """
+        if not requests:
+            return []
+        student_ids = [str(r["student_id"]) for r in requests]
+
+        # 1. Fetch State Components for everyone (cache first, then one query per component for the misses)
+        unique_ids = list(dict.fromkeys(student_ids))
+        features = await self._cache_call(student_state_cache.get_many, unique_ids)
+        missing = [sid for sid in unique_ids if sid not in features]
+        if missing:
+            features.update(await self._load_student_features(missing))
+
+        # 2. Vectorize States
+        states = np.stack(
+            [
+                np.concatenate(
+                    [
+                        features[sid],
+                        self._profile_features(
+                            r["student_profile"].get("cognitive_profile", {}),
+                            r["student_profile"].get("learning_preferences", {}),
+                        ),
+                    ]
+                )
+                for sid, r in zip(student_ids, requests, strict=True)
+            ]
+        )
+
+        # 3. Valid action masks (rows without mapped concepts allow all actions)
+        mask = np.zeros((len(requests), OUTPUT_DIM), dtype=bool)
+        for row, r in enumerate(requests):
+            # get_concept_index reloads the vocabulary on a miss, so newly synced concepts become actions
+            indices = [
+                idx
+                for idx in (get_concept_index(cid) for cid in r["valid_concept_ids"])
+                if idx is not None and idx < OUTPUT_DIM
+            ]
+            mask[row, indices] = True
+
+        # 4. Select Actions
+        actions = await run_cpu_bound(rl_agent.select_actions, states, mask)
+
+        # 5. Decode
+        return [
+            get_concept_from_index(int(action)) or (r["valid_concept_ids"][0] if r["valid_concept_ids"] else "")
+            for action, r in zip(actions, requests, strict=True)
+        ]
+
     async def process_feedback(
         self,
         student_id: str,
@@ -73,9 +174,11 @@ class RLEngine:
         1. Reconstructs S_t (if not provided).
         2. Calculates Reward R_t.
         3. Fetches S_{t+1}.
-        4. Stores transition in Agent Memory.
-        5. Triggers training.
+        4. Queues the transition for the background learner, in-process or the central one (training happens there).
         """
+        # 3. State S_{t+1} (Next); built once, it also serves as the S_t approximation below
+        next_state = await self._build_current_state_vector(student_id, {})
+
         # 1. State S_t (Previous)
         # In a stateless API, we might need to reconstruct it or have the client pass it back.
         # If client passed it (ideal), use it. Else, approximate using current state (noisy).
@@ -85,7 +188,7 @@ class RLEngine:
             # Approximation (Not ideal for RL, but functional for MVP)
             # We assume state hasn't changed drastically *except* for the component we just updated.
             # Real implementation would cache S_t in Redis with a session_id.
-            state = self._build_current_state_vector(student_id, {})
+            state = next_state
 
         # 2. Calculate Reward
         # reward_components: { "mastery_delta": 0.2, "behavior_delta": -0.1, "difficulty": 0.5 }
@@ -97,55 +200,75 @@ class RLEngine:
             student_ability=0.5,
         )
 
-        # 3. State S_{t+1} (Next)
-        next_state = self._build_current_state_vector(student_id, {})
-
         # 4. Action Index
         action_idx = get_concept_index(action_concept_id)
+        if action_idx is None or action_idx >= OUTPUT_DIM:
+            logger.warning(f"RL feedback from {student_id} skipped: concept {action_concept_id} has no action slot")
+            return
 
-        # 5. Store & Train
+        # 5. Queue for the learner
         # Done = False (Continuous learning)
-        rl_agent.store_transition(state, action_idx, reward, next_state, False)
-        rl_agent.train_step()
-        rl_agent.save_checkpoint()
-        logger.info(f"RL Agent trained on feedback from {student_id}. Reward: {reward}")
+        rl_learner.enqueue(state, action_idx, reward, next_state, False)
+        logger.info(f"RL feedback queued from {student_id}. Reward: {reward}")
 
     def calculate_reward(
         self, mastery_delta: float, behavior_delta: float, concept_difficulty: float, student_ability: float
     ) -> float:
-        w1, w2, w3 = 1.0, 0.5, 0.2
-
-        # R_knowledge
-        r_know = mastery_delta
-
-        # R_engagement (negative delta in procrastination is good)
-        r_engage = -behavior_delta
-
-        # R_load
-        load_diff = max(0, concept_difficulty - student_ability)
-        r_load = load_diff * load_diff
-
-        total_reward = (w1 * r_know) + (w2 * r_engage) - (w3 * r_load)
-        return float(total_reward)
+        return float(calculate_reward(mastery_delta, behavior_delta, concept_difficulty, student_ability))
 
-    def _build_current_state_vector(self, student_id: str, profile_override: dict) -> list[float]:
-        # Helper to fetch fresh data and vectorize
-        k_map = get_all_student_knowledge(student_id)
-        b_prof = get_behavioral_profile(student_id)
+    async def _build_current_state_vector(self, student_id: str, profile_override: dict) -> np.ndarray:
+        # Helper to fetch current data (through the state cache) and vectorize
         # We might miss static profile data here if not passed, defaulting to 0.5
-        return self._vectorize_state(k_map, b_prof, {}, {})
+        return np.concatenate([await self._cached_student_features(student_id), self._profile_features({}, {})])
 
-    def _vectorize_state(self, k_map, b_prof, c_prof, prefs) -> list[float]:
+    async def _cached_student_features(self, student_id: str) -> np.ndarray:
+        features = await self._cache_call(student_state_cache.get, student_id)
+        if features is None:
+            features = (await self._load_student_features([student_id]))[student_id]
+        return features
+
+    async def _load_student_features(self, student_ids: list[str]) -> dict[str, np.ndarray]:
+        """
+        DB-derived features of the students, one query per component, stored in the state cache.
+        A failed query falls back to the empty state for this request, which is not cached.
         """
-        Flattens all dictionaries into a single fixed-size list.
+        clock = await self._cache_call(student_state_cache.clock)
+        knowledge, behavior = await asyncio.gather(
+            async_database.get_mastery_vectors_batch(student_ids, raise_errors=True),
+            async_database.get_behavioral_profiles_batch(student_ids, raise_errors=True),
+            return_exceptions=True,
+        )
+        failed = isinstance(knowledge, Exception) or isinstance(behavior, Exception)
+        if isinstance(knowledge, Exception):
+            knowledge = np.full((len(student_ids), settings.OUTPUT_DIM_DKT), np.nan)
+        if isinstance(behavior, Exception):
+            behavior = {sid: {} for sid in student_ids}
+
+        features = {sid: self._student_features(knowledge[row], behavior[sid]) for row, sid in enumerate(student_ids)}
+        if not failed:
+            for sid, vector in features.items():
+                await self._cache_call(student_state_cache.put, sid, vector, clock)
+        return features
+
+    async def _cache_call(self, fn, *args):
+        # The Redis tier does blocking network I/O; keep it off the event loop
+        if student_state_cache.use_redis:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def _vectorize_state(self, k_vec: np.ndarray, b_prof, c_prof, prefs) -> np.ndarray:
+        """
+        Flattens the mastery vector and the profile dictionaries into a single fixed-size float32 array.
         Order: [Knowledge... | Behavior... | Cognitive... | Prefs...]
         """
-        # 1. Knowledge (Sorted by Index)
-        k_vec = [0.0] * settings.INPUT_DIM_RL
-        for cid, mastery in k_map.items():
-            idx = get_concept_index(cid)
-            if 0 <= idx < settings.INPUT_DIM_RL:
-                k_vec[idx] = mastery
+        return np.concatenate([self._student_features(k_vec, b_prof), self._profile_features(c_prof, prefs)])
+
+    def _student_features(self, k_vec: np.ndarray, b_prof) -> np.ndarray:
+        """The DB-derived, cacheable part of the state: [Knowledge... | Behavior...]."""
+        # 1. Knowledge (already indexed by concept; unknown mastery -> 0.0)
+        knowledge = np.zeros(settings.INPUT_DIM_RL, dtype=np.float32)
+        n = min(len(k_vec), settings.INPUT_DIM_RL)
+        knowledge[:n] = np.nan_to_num(k_vec[:n], nan=0.0)
 
         # 2. Behavior (Fixed order: procrastination, gaming, engagement, hint, error)
         b_vec = [
@@ -155,7 +278,10 @@ class RLEngine:
             b_prof.get("hint_rate", 0.0),
             b_prof.get("error_rate", 0.0),
         ]
+        return np.concatenate([knowledge, np.asarray(b_vec, dtype=np.float32)])
 
+    def _profile_features(self, c_prof, prefs) -> np.ndarray:
+        """The request-supplied part of the state: [Cognitive... | Prefs...]."""
         # 3. Cognitive (memory, attention)
         c_vec = [c_prof.get("memory", 0.5), c_prof.get("attention", 0.5)]
 
@@ -167,7 +293,7 @@ class RLEngine:
             prefs.get("reading", 0.25),
         ]
 
-        return k_vec + b_vec + c_vec + p_vec
+        return np.asarray(c_vec + p_vec, dtype=np.float32)
 
 
 rl_engine = RLEngine()
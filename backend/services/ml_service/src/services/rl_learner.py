@@ -0,0 +1,134 @@
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+
+from loguru import logger
+
+from ..models.rl import RLAgent
+
+
+class BackgroundLearner:
+    """
+    Trains the RL agent off the request path.
+
+    Request handlers only `enqueue` transitions. A background thread moves them into the replay
+    memory and trains once `train_every` new transitions arrived or `train_interval` seconds passed
+    since the last round (one gradient step per new transition, as the inline training did).
+    The target network is synced every `target_sync_steps` gradient steps and the policy is
+    checkpointed at most every `checkpoint_interval` seconds (`checkpoint_fn`, by default the agent's
+    own file checkpoint; the central learner publishes registry versions instead).
+    """
+
+    def __init__(
+        self,
+        agent: RLAgent,
+        train_every: int,
+        train_interval: float,
+        checkpoint_interval: float,
+        target_sync_steps: int,
+        checkpoint_fn: Callable[[], object] | None = None,
+    ):
+        self.agent = agent
+        self.checkpoint_fn = checkpoint_fn or agent.save_checkpoint
+        self.train_every = max(1, train_every)
+        self.train_interval = train_interval
+        self.checkpoint_interval = checkpoint_interval
+        self.target_sync_steps = target_sync_steps
+        self._queue: queue.Queue[tuple] = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._owner_pid: int | None = None
+        self._start_lock = threading.Lock()
+
+        self.pending = 0  # Transitions stored since the last training round
+        self.steps_since_sync = 0
+        self.dirty = False  # Trained since the last checkpoint
+        self.last_train = time.monotonic()
+        self.last_checkpoint = time.monotonic()
+
+    def enqueue(self, state, action: int, reward: float, next_state, done: bool):
+        self.start()
+        self._queue.put((state, action, reward, next_state, done))
+
+    def start(self):
+        # The engine is built at import time, before the server forks its workers,
+        # so the thread is started lazily inside the process that uses it.
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._owner_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="rl-learner", daemon=True)
+                self._owner_pid = os.getpid()
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Trains on whatever is still queued and writes a final checkpoint."""
+        if self._thread is None or self._owner_pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._drain(block_for=self._wait_time())
+            try:
+                self._tick(force=False)
+            except Exception as e:
+                logger.error(f"RL learner round failed: {e}")
+
+        self._drain(block_for=0)
+        try:
+            self._tick(force=True)
+        except Exception as e:
+            logger.error(f"RL learner final round failed: {e}")
+
+    def _wait_time(self) -> float:
+        # Wake up for the next time-based round or checkpoint, whichever comes first
+        now = time.monotonic()
+        deadlines = [self.last_train + self.train_interval]
+        if self.dirty:
+            deadlines.append(self.last_checkpoint + self.checkpoint_interval)
+        return min(max(0.0, min(deadlines) - now), 1.0)
+
+    def _drain(self, block_for: float):
+        """Moves queued transitions into the replay memory."""
+        try:
+            item = self._queue.get(timeout=block_for) if block_for > 0 else self._queue.get_nowait()
+        except queue.Empty:
+            return
+        while True:
+            try:
+                self.agent.store_transition(*item)
+                self.pending += 1
+            except Exception as e:
+                # e.g. a client-supplied prev_state_vector of the wrong length
+                logger.error(f"Dropping malformed RL transition: {e}")
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+    def _tick(self, force: bool):
+        now = time.monotonic()
+        due = self.pending >= self.train_every or (self.pending and now - self.last_train >= self.train_interval)
+        if self.pending and (due or force):
+            steps = self.agent.train_step(self.pending)
+            self.pending = 0
+            self.last_train = now
+            if steps:
+                self.dirty = True
+                self.steps_since_sync += steps
+                if self.steps_since_sync >= self.target_sync_steps:
+                    self.agent.sync_target()
+                    self.steps_since_sync = 0
+                logger.debug(f"RL learner: {steps} gradient steps, memory {len(self.agent.memory)}")
+
+        if self.dirty and (force or now - self.last_checkpoint >= self.checkpoint_interval):
+            self.checkpoint_fn()
+            self.dirty = False
+            self.last_checkpoint = now
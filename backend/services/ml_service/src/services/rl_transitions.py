@@ -0,0 +1,108 @@
+import os
+import queue
+import threading
+
+import numpy as np
+import redis
+from loguru import logger
+
+from ..config import settings
+
+
+def encode_transition(state, action: int, reward: float, next_state, done: bool) -> dict:
+    """Stream entry fields of one transition (states as float32 bytes)."""
+    return {
+        "state": np.asarray(state, dtype=np.float32).tobytes(),
+        "action": int(action),
+        "reward": float(reward),
+        "next_state": np.asarray(next_state, dtype=np.float32).tobytes(),
+        "done": int(bool(done)),
+    }
+
+
+def decode_transition(fields: dict) -> tuple:
+    """Inverse of `encode_transition` for the raw (bytes) fields returned by XREAD."""
+    return (
+        np.frombuffer(fields[b"state"], dtype=np.float32),
+        int(fields[b"action"]),
+        float(fields[b"reward"]),
+        np.frombuffer(fields[b"next_state"], dtype=np.float32),
+        bool(int(fields[b"done"])),
+    )
+
+
+class TransitionPublisher:
+    """
+    Actor side of the central learner: ships transitions to a Redis stream instead of training locally.
+
+    Same interface as BackgroundLearner (`enqueue`, `start`, `stop`), so the RL engine does not care
+    which one it has. `enqueue` only puts the transition on an in-process queue; a sender thread
+    XADDs whatever accumulated in one pipeline. The stream is capped at about `maxlen` entries, so a
+    learner that is down loses the oldest experience instead of filling Redis. If Redis is
+    unreachable the batch is dropped (logged), as the local learner drops malformed transitions.
+    """
+
+    def __init__(self, stream: str, maxlen: int, max_batch: int = 256):
+        self.stream = stream
+        self.maxlen = maxlen
+        self.max_batch = max_batch
+        self._queue: queue.Queue[dict] = queue.Queue()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._owner_pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._redis: redis.Redis | None = None
+
+    def enqueue(self, state, action: int, reward: float, next_state, done: bool):
+        self.start()
+        self._queue.put(encode_transition(state, action, reward, next_state, done))
+
+    def start(self):
+        # Started lazily inside the process that uses it (the engine is built before the workers fork)
+        if self._thread is not None and self._owner_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._owner_pid != os.getpid():
+                self._queue = queue.Queue()
+                self._stop.clear()
+                self._redis = redis.Redis.from_url(settings.REDIS_URL)
+                self._thread = threading.Thread(target=self._run, name="rl-transition-publisher", daemon=True)
+                self._owner_pid = os.getpid()
+                self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Sends whatever is still queued."""
+        if self._thread is None or self._owner_pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._send(self._take(block_for=1.0))
+        while batch := self._take(block_for=0):
+            self._send(batch)
+
+    def _take(self, block_for: float) -> list[dict]:
+        try:
+            batch = [self._queue.get(timeout=block_for) if block_for > 0 else self._queue.get_nowait()]
+        except queue.Empty:
+            return []
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send(self, batch: list[dict]):
+        if not batch:
+            return
+        try:
+            pipe = self._redis.pipeline(transaction=False)
+            for fields in batch:
+                pipe.xadd(self.stream, fields, maxlen=self.maxlen, approximate=True)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"Dropping {len(batch)} RL transitions, stream write failed: {e}")
@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+
+import numpy as np
+import redis
+from loguru import logger
+
+from ..config import settings
+
+_KEY_PREFIX = "ml:rl:state:"
+_VERSION_PREFIX = "ml:rl:state:version:"
+_INVALIDATE_CHANNEL = "ml:rl:state:invalidate"
+_CLOCK_KEY = "ml:rl:state:clock"
+# Per-student versions only have to outlive the reads in flight when they were written
+_VERSION_TTL_SECONDS = 3600
+
+# Stamps the students (version keys, then their entry keys) with a new clock value and drops the entries
+_INVALIDATE_SCRIPT = """
+local clock = redis.call("incr", KEYS[1])
+local n = (#KEYS - 1) / 2
+for i = 2, n + 1 do
+    redis.call("set", KEYS[i], clock, "EX", ARGV[1])
+    redis.call("del", KEYS[i + n])
+end
+return clock
+"""
+
+# Stores a value only if the student was not invalidated since the reader took the clock
+_PUT_IF_CURRENT_SCRIPT = """
+if tonumber(redis.call("get", KEYS[1]) or "0") > tonumber(ARGV[1]) then
+    return 0
+end
+redis.call("set", KEYS[2], ARGV[2], "EX", ARGV[3])
+return 1
+"""
+
+
+class StudentStateCache:
+    """
+    Per-student cache of the DB-derived part of the RL state (knowledge slots + behavior features).
+
+    Tier 1 is an in-process LRU with a TTL. The optional tier 2 is Redis (float32 bytes), shared by all
+    API processes. Writers call `invalidate` after their commit, which drops the local entries (and the
+    Redis keys) and publishes the ids over REDIS_URL, so every process drops its local copies too,
+    including writes from the Celery DKT worker.
+
+    A reader that fetched from the DB before a write could still store the old state after the
+    invalidation. Readers therefore take `clock()` before their DB read and pass it to `put`. Every
+    invalidation stamps its students with a newer clock value, and `put` skips a student stamped after
+    the reader's clock, so writes for other students never hold back the store. Locally the stamps of
+    the last `max_size` invalidated students are kept (older ones are covered by a floor); the shared
+    tier keeps them in per-student Redis keys and compares atomically.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float, use_redis: bool = False):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.use_redis = use_redis
+        self._entries: OrderedDict[str, tuple[np.ndarray, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._redis: redis.Redis | None = None
+        self._listener: threading.Thread | None = None
+        self._owner_pid: int | None = None
+        self._start_lock = threading.Lock()
+        self._clock = 0
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        self._version_floor = 0
+
+    def get(self, student_id: str) -> np.ndarray | None:
+        with self._lock:
+            entry = self._entries.get(student_id)
+            if entry is not None:
+                if time.monotonic() - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end(student_id)
+                    return entry[0]
+                del self._entries[student_id]
+
+        client = self._client()
+        if not self.use_redis:
+            return None
+        try:
+            raw = client.get(_KEY_PREFIX + student_id)
+        except redis.RedisError as e:
+            logger.error(f"State cache Redis read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        vector = np.frombuffer(raw, dtype=np.float32)
+        self._put_local(student_id, vector)
+        return vector
+
+    def get_many(self, student_ids: list[str]) -> dict[str, np.ndarray]:
+        """Cached vectors of the given students (misses are left out). One Redis MGET for the local misses."""
+        found: dict[str, np.ndarray] = {}
+        now = time.monotonic()
+        with self._lock:
+            for sid in student_ids:
+                entry = self._entries.get(sid)
+                if entry is not None and now - entry[1] <= self.ttl_seconds:
+                    self._entries.move_to_end(sid)
+                    found[sid] = entry[0]
+
+        missing = [sid for sid in student_ids if sid not in found]
+        client = self._client()
+        if not self.use_redis or not missing:
+            return found
+        try:
+            values = client.mget([_KEY_PREFIX + sid for sid in missing])
+        except redis.RedisError as e:
+            logger.error(f"State cache Redis read failed: {e}")
+            return found
+        for sid, raw in zip(missing, values, strict=True):
+            if raw is not None:
+                found[sid] = np.frombuffer(raw, dtype=np.float32)
+                self._put_local(sid, found[sid])
+        return found
+
+    def clock(self) -> tuple[int, int]:
+        """Taken before a DB read and passed to `put`; -1 skips the shared tier (clock not readable)."""
+        client = self._client()
+        with self._lock:
+            local = self._clock
+        if not self.use_redis:
+            return local, -1
+        try:
+            shared = client.get(_CLOCK_KEY)
+        except redis.RedisError as e:
+            logger.error(f"State cache Redis read failed: {e}")
+            return local, -1
+        return local, int(shared or 0)
+
+    def put(self, student_id: str, vector: np.ndarray, clock: tuple[int, int]):
+        vector = np.ascontiguousarray(vector, dtype=np.float32)
+        client = self._client()
+        with self._lock:
+            if self._versions.get(student_id, self._version_floor) > clock[0]:
+                return
+            self._put_local_locked(student_id, vector)
+        if self.use_redis and clock[1] >= 0:
+            try:
+                client.eval(
+                    _PUT_IF_CURRENT_SCRIPT,
+                    2,
+                    _VERSION_PREFIX + student_id,
+                    _KEY_PREFIX + student_id,
+                    clock[1],
+                    vector.tobytes(),
+                    max(1, int(self.ttl_seconds)),
+                )
+            except redis.RedisError as e:
+                logger.error(f"State cache Redis write failed: {e}")
+
+    def invalidate(self, student_ids: Iterable[str]):
+        student_ids = list(dict.fromkeys(str(sid) for sid in student_ids))
+        if not student_ids:
+            return
+        self._drop_local(student_ids)
+        client = self._client()
+        try:
+            pipe = client.pipeline(transaction=False)
+            if self.use_redis:
+                pipe.eval(
+                    _INVALIDATE_SCRIPT,
+                    1 + 2 * len(student_ids),
+                    _CLOCK_KEY,
+                    *[_VERSION_PREFIX + sid for sid in student_ids],
+                    *[_KEY_PREFIX + sid for sid in student_ids],
+                    _VERSION_TTL_SECONDS,
+                )
+            pipe.publish(_INVALIDATE_CHANNEL, ",".join(student_ids))
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.error(f"State cache Redis invalidation failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._clock += 1
+            self._versions.clear()
+            self._version_floor = self._clock
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _put_local(self, student_id: str, vector: np.ndarray):
+        with self._lock:
+            self._put_local_locked(student_id, vector)
+
+    def _put_local_locked(self, student_id: str, vector: np.ndarray):
+        self._entries[student_id] = (vector, time.monotonic())
+        self._entries.move_to_end(student_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _drop_local(self, student_ids: Iterable[str]):
+        with self._lock:
+            self._clock += 1
+            for sid in student_ids:
+                self._entries.pop(sid, None)
+                self._versions[sid] = self._clock
+                self._versions.move_to_end(sid)
+            # Stamps are in clock order, so the evicted ones all lie below the floor
+            while len(self._versions) > self.max_size:
+                _, version = self._versions.popitem(last=False)
+                self._version_floor = max(self._version_floor, version)
+
+    def _client(self) -> redis.Redis:
+        # Created (and the invalidation listener started) lazily inside the process that uses it
+        if self._redis is None or self._owner_pid != os.getpid():
+            with self._start_lock:
+                if self._redis is None or self._owner_pid != os.getpid():
+                    self._redis = redis.Redis.from_url(settings.REDIS_URL)
+                    self._owner_pid = os.getpid()
+                    self.clear()
+                    self._listener = threading.Thread(target=self._listen, name="rl-state-invalidation", daemon=True)
+                    self._listener.start()
+        return self._redis
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = redis.Redis.from_url(settings.REDIS_URL).pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(_INVALIDATE_CHANNEL)
+                for message in pubsub.listen():
+                    self._drop_local(message["data"].decode().split(","))
+            except Exception as e:
+                logger.error(f"State cache invalidation listener error: {e}")
+                # Entries may have missed an invalidation while disconnected
+                self.clear()
+                time.sleep(1.0)
+
+
+student_state_cache = StudentStateCache(
+    settings.RL_STATE_CACHE_SIZE, settings.RL_STATE_CACHE_TTL_SECONDS, use_redis=settings.RL_STATE_CACHE_REDIS
+)
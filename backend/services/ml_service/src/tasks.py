@@ -1,48 +1,280 @@
+import json
+import uuid
+
+import redis
 from loguru import logger
+from sqlalchemy.exc import InterfaceError, OperationalError
 
 from .celery_app import celery_app
 from .config import settings
-from .database import append_interaction, update_knowledge_state_batch
-from .models.dkt import get_model
+from .database import append_interactions, update_knowledge_state_batch
 from .services.inference_service import inference_service
 
-# Initialize the model when starting the worker
-# In the future, weights will be loaded here: model.load_state_dict(torch.load(...))
-model = get_model(settings)
+# Global client for worker (initialized lazily)
+_redis_client = None
+
+# Students that may have pending interactions (the sweeper's work list)
+_PENDING_STUDENTS_KEY = "ml:dkt:pending_students"
+# Pending interactions that cannot be stored, as {"student_id", "item", "error"} JSON records
+_DEAD_LETTER_KEY = "ml:dkt:dead_letter"
+# The database is unreachable: the items are fine and stay queued for the next task
+_TRANSIENT_DB_ERRORS = (OperationalError, InterfaceError)
+
+# Deletes the lock only if we still own it (it may have expired and been taken over)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# Renews the lock if we still own it, optionally dropping the first ARGV[3] (handled) pending items
+# and moving ARGV[4..] (records of the ones that could not be stored) to the dead-letter list
+_RENEW_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call("expire", KEYS[1], ARGV[2])
+for i = 4, #ARGV do
+    redis.call("rpush", KEYS[3], ARGV[i])
+end
+if tonumber(ARGV[3]) > 0 then
+    redis.call("ltrim", KEYS[2], ARGV[3], -1)
+end
+return 1
+"""
+
+# Takes the student off the sweeper's list if the queue is empty (checked atomically with a push)
+_FORGET_IF_EMPTY_SCRIPT = """
+if redis.call("llen", KEYS[1]) > 0 then
+    return 0
+end
+redis.call("srem", KEYS[2], ARGV[1])
+return 1
+"""
+
+
+def get_redis():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+    return _redis_client
 
 
-@celery_app.task(name="process_student_interaction")
-def process_student_interaction(student_id: str, concept_id: str, is_correct: bool):
+def _pending_key(student_id: str) -> str:
+    return f"ml:dkt:pending:{student_id}"
+
+
+def _lock_key(student_id: str) -> str:
+    return f"ml:dkt:lock:{student_id}"
+
+
+@celery_app.task(name="process_student_interaction", bind=True)
+def process_student_interaction(self, student_id: str, concept_id: str, is_correct: bool):
     """
     Full DKT Pipeline:
     1. Append to History (Sequence Store).
     2. Run LSTM Inference on new sequence.
     3. Update Knowledge State (Snapshot Store).
+
+    With DKT_COALESCE_INTERACTIONS, the interaction is queued per student and whichever task
+    holds the student's lock drains the queue, so a burst of answers costs one append,
+    one inference and one snapshot write.
+
+    The task id is stored with the interaction, so a redelivered task or a re-run append is not
+    added to the history twice.
     """
     logger.info(f"ML Worker: Processing {student_id} on {concept_id} (Correct: {is_correct})")
+    event_id = self.request.id or uuid.uuid4().hex
 
     try:
-        # 1. Persist the Interaction Event into Sequence History
-        append_interaction(student_id, concept_id, is_correct)
+        if not settings.DKT_COALESCE_INTERACTIONS:
+            return _process_interactions(student_id, [(concept_id, is_correct)], [event_id])
 
-        # 2. Run DKT Model
-        # This returns the mastery prob for ALL concepts based on the updated history
-        full_mastery_map = inference_service.predict_next_state(student_id, concept_id, is_correct)
+        pipe = get_redis().pipeline()
+        pipe.rpush(_pending_key(student_id), json.dumps([concept_id, is_correct, event_id]))
+        pipe.sadd(_PENDING_STUDENTS_KEY, student_id)
+        pipe.execute()
+        return _drain_pending(student_id)
+
+    except Exception as e:
+        logger.error(f"Error in ML task: {e}")
+        raise e
+
+
+@celery_app.task(name="drain_pending_interactions")
+def drain_pending_interactions(student_id: str):
+    return _drain_pending(student_id)
 
-        logger.info(f"DKT Update: Calculated mastery for {len(full_mastery_map)} concepts.")
 
-        # 3. Update Snapshot DB (Postgres knowledge_states)
-        # We perform a batch update because DKT updates probabilities for ALL concepts,
-        # not just the one practiced.
-        db_updates = []
-        for c_id, mastery in full_mastery_map.items():
-            db_updates.append({"student_id": student_id, "concept_id": c_id, "mastery_level": mastery})
+@celery_app.task(name="sweep_pending_interactions")
+def sweep_pending_interactions():
+    """
+    Periodic (celery beat): queues a drain for every student with pending interactions and no lock.
+    A drainer that died leaves its items behind, and otherwise only the student's next answer would
+    pick them up.
+    """
+    client = get_redis()
+    requeued = 0
+    for student_id in client.sscan_iter(_PENDING_STUDENTS_KEY):
+        if client.eval(_FORGET_IF_EMPTY_SCRIPT, 2, _pending_key(student_id), _PENDING_STUDENTS_KEY, student_id):
+            continue
+        if client.exists(_lock_key(student_id)):
+            continue  # Being drained (or the dead holder's lock has not expired yet)
+        drain_pending_interactions.delay(student_id)
+        requeued += 1
+    if requeued:
+        logger.info(f"Requeued the pending interactions of {requeued} student(s).")
+    return {"students_requeued": requeued}
+
 
-        if db_updates:
-            update_knowledge_state_batch(db_updates)
+def _drain_pending(student_id: str) -> dict:
+    """
+    Processes the student's pending interactions in arrival order while holding the student lock.
+    Returns immediately if another task holds the lock: that task will pick our item up.
+
+    Items stay in the pending list until append_interactions has stored them, so a failure or a
+    dead worker leaves them for the next task (or the sweeper). The lock TTL is renewed before and
+    after every batch; a drainer that lost its lock stops without trimming. Items that cannot be
+    stored (malformed, or rejected by the database on their own) go to the dead-letter list instead
+    of blocking the queue; a database outage leaves the queue as it is.
+    """
+    client = get_redis()
+    pending_key, lock_key = _pending_key(student_id), _lock_key(student_id)
+    result = {"student_id": student_id, "status": "coalesced", "concepts_updated": 0}
 
-        return {"student_id": student_id, "status": "synchronized", "concepts_updated": len(db_updates)}
+    while True:
+        token = uuid.uuid4().hex
+        if not client.set(lock_key, token, nx=True, ex=settings.DKT_COALESCE_LOCK_TTL_SECONDS):
+            return result
 
+        try:
+            while _renew_lock(client, lock_key, token, pending_key, stored=0):
+                raw_items = client.lrange(pending_key, 0, -1)
+                if not raw_items:
+                    break
+                items, dead = _parse_pending(student_id, raw_items)
+                items, seq_len, failed = _store_pending(student_id, items)
+                dead.extend(failed)
+                # Handled: drop them from the queue (items pushed meanwhile are behind them and stay)
+                if not _renew_lock(client, lock_key, token, pending_key, stored=len(raw_items), dead=dead):
+                    logger.warning(f"DKT lock of {student_id} expired while draining; leaving the queue to its owner")
+                    return result
+                if dead:
+                    logger.error(f"Moved {len(dead)} pending interaction(s) of {student_id} to {_DEAD_LETTER_KEY}")
+                if items:
+                    result = _update_mastery(student_id, [(c_id, correct) for c_id, correct, _ in items], seq_len)
+        finally:
+            client.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+        # An item pushed after our last drain but before the release found the lock taken
+        # and returned; take the lock again so it is not left behind. An empty queue also takes the
+        # student off the sweeper's list.
+        if client.eval(_FORGET_IF_EMPTY_SCRIPT, 2, pending_key, _PENDING_STUDENTS_KEY, student_id):
+            return result
+
+
+def _parse_pending(student_id: str, raw_items: list[str]) -> tuple[list[tuple[str, bool, str | None]], list[str]]:
+    """Decoded (concept_id, is_correct, event_id) items, and dead-letter records of the malformed ones."""
+    items, dead, seen = [], [], set()
+    for raw in raw_items:
+        try:
+            item = json.loads(raw)
+            concept_id, correct = item[0], bool(item[1])
+            event_id = item[2] if len(item) > 2 else None  # Queued before events had ids
+            if not isinstance(concept_id, str):
+                raise ValueError(f"concept_id is not a string: {concept_id!r}")
+        except (ValueError, TypeError, IndexError, KeyError) as e:
+            dead.append(_dead_letter(student_id, raw, e))
+            continue
+        # A redelivered task queues its event again
+        if event_id is not None:
+            if event_id in seen:
+                continue
+            seen.add(event_id)
+        items.append((concept_id, correct, event_id))
+    return items, dead
+
+
+def _store_pending(
+    student_id: str, items: list[tuple[str, bool, str | None]]
+) -> tuple[list[tuple[str, bool, str | None]], int, list[str]]:
+    """
+    Appends the items in one statement. If that fails for any reason but an outage, they are retried one
+    by one so a single bad item cannot hold back the others. Returns the stored items, the history
+    length and dead-letter records of the rest.
+    """
+    if not items:
+        return [], 0, []
+    try:
+        seq_len = append_interactions(
+            student_id, [(c_id, correct) for c_id, correct, _ in items], [event_id for *_, event_id in items]
+        )
+        return items, seq_len, []
+    except _TRANSIENT_DB_ERRORS:
+        raise
     except Exception as e:
-        logger.error(f"Error in ML task: {e}")
-        raise e
+        logger.error(f"Storing {len(items)} pending interaction(s) of {student_id} failed ({e}); retrying one by one")
+        return _append_one_by_one(student_id, items)
+
+
+def _append_one_by_one(
+    student_id: str, items: list[tuple[str, bool, str | None]]
+) -> tuple[list[tuple[str, bool, str | None]], int, list[str]]:
+    """Stores the items separately. Returns the stored ones, the history length and records of the rest."""
+    stored, dead, seq_len = [], [], 0
+    for concept_id, correct, event_id in items:
+        try:
+            seq_len = append_interactions(student_id, [(concept_id, correct)], [event_id])
+        except _TRANSIENT_DB_ERRORS:
+            raise
+        except Exception as e:
+            dead.append(_dead_letter(student_id, json.dumps([concept_id, correct, event_id]), e))
+            continue
+        stored.append((concept_id, correct, event_id))
+    return stored, seq_len, dead
+
+
+def _dead_letter(student_id: str, raw: str, error: Exception) -> str:
+    return json.dumps({"student_id": student_id, "item": raw, "error": str(getattr(error, "orig", error))[:500]})
+
+
+def _renew_lock(client, lock_key: str, token: str, pending_key: str, stored: int, dead: list[str] = ()) -> bool:
+    ttl = settings.DKT_COALESCE_LOCK_TTL_SECONDS
+    return bool(client.eval(_RENEW_LOCK_SCRIPT, 3, lock_key, pending_key, _DEAD_LETTER_KEY, token, ttl, stored, *dead))
+
+
+def _process_interactions(
+    student_id: str, interactions: list[tuple[str, bool]], event_ids: list[str | None] | None = None
+) -> dict:
+    # 1. Persist the Interaction Events into Sequence History (in order)
+    seq_len = append_interactions(student_id, interactions, event_ids)
+    return _update_mastery(student_id, interactions, seq_len)
+
+
+def _update_mastery(student_id: str, interactions: list[tuple[str, bool]], seq_len: int) -> dict:
+    # 2. Run DKT Model
+    # This returns the mastery prob for ALL concepts based on the updated history.
+    # With a cached LSTM state this only steps through the new interactions; otherwise the history is replayed.
+    full_mastery_map = inference_service.predict_next_state(student_id, interactions, seq_len)
+
+    logger.info(
+        f"DKT Update: Calculated mastery for {len(full_mastery_map)} concepts from {len(interactions)} interaction(s)."
+    )
+
+    # 3. Update Snapshot DB (Postgres knowledge_states)
+    # We perform a batch update because DKT updates probabilities for ALL concepts,
+    # not just the one practiced.
+    db_updates = []
+    for c_id, mastery in full_mastery_map.items():
+        db_updates.append({"student_id": student_id, "concept_id": c_id, "mastery_level": mastery})
+
+    # Only concepts that moved by at least KNOWLEDGE_WRITE_EPSILON are written.
+    written = update_knowledge_state_batch(db_updates, epsilon=settings.KNOWLEDGE_WRITE_EPSILON)
+
+    return {
+        "student_id": student_id,
+        "status": "synchronized",
+        "interactions": len(interactions),
+        "concepts_updated": written,
+    }
@@ -0,0 +1,163 @@
+import math
+import random
+from collections.abc import Iterator
+
+import torch
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from torch.utils.data import IterableDataset, get_worker_info
+
+from ..utils import get_concept_index
+
+# One student's (windowed) history: [(concept_index, correct), ...]
+Sequence = list[tuple[int, bool]]
+
+
+def _worker_shard() -> tuple[int, int]:
+    """(worker_id, num_workers) of the current DataLoader worker, (0, 1) in the main process."""
+    info = get_worker_info()
+    return (info.id, info.num_workers) if info is not None else (0, 1)
+
+
+def split_windows(sequence: Sequence, max_len: int) -> Iterator[Sequence]:
+    """
+    Cuts a long history into windows of at most max_len.
+    Windows overlap by one item, so every interaction after the first is a prediction target exactly once.
+    """
+    if len(sequence) < 2:
+        return
+    step = max(max_len - 1, 1)
+    for start in range(0, len(sequence) - 1, step):
+        yield sequence[start : start + max_len]
+
+
+def collate_sequences(batch: list[Sequence], num_concepts: int):
+    """
+    Builds right-padded DKT training tensors from raw sequences.
+    Step t feeds interaction t and is scored on the concept/correctness of interaction t+1.
+    Returns (x, target_concepts, labels, lengths); x/targets/labels are (batch, max_len - 1).
+    """
+    lengths = torch.tensor([len(seq) - 1 for seq in batch], dtype=torch.long)
+    steps = int(lengths.max())
+    x = torch.zeros((len(batch), steps), dtype=torch.long)
+    target_concepts = torch.zeros((len(batch), steps), dtype=torch.long)
+    labels = torch.zeros((len(batch), steps), dtype=torch.float32)
+
+    for i, seq in enumerate(batch):
+        n = len(seq) - 1
+        x[i, :n] = torch.tensor([c + (num_concepts if ok else 0) for c, ok in seq[:-1]], dtype=torch.long)
+        target_concepts[i, :n] = torch.tensor([c for c, _ in seq[1:]], dtype=torch.long)
+        labels[i, :n] = torch.tensor([float(ok) for _, ok in seq[1:]])
+
+    return x, target_concepts, labels, lengths
+
+
+class PostgresSequenceDataset(IterableDataset):
+    """
+    Streams per-student sequences out of `interaction_log` with a server-side cursor,
+    fetching `chunk_size` rows at a time, so memory stays bounded regardless of table size.
+
+    Students are assigned to the train/val split and to DataLoader workers by a hash of their id,
+    so every worker reads a disjoint shard over its own connection.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        split: str = "train",
+        val_percent: int = 10,
+        max_seq_len: int = 200,
+        chunk_size: int = 10000,
+    ):
+        self.database_url = database_url
+        self.split = split
+        self.val_percent = val_percent
+        self.max_seq_len = max_seq_len
+        self.chunk_size = chunk_size
+
+    def __iter__(self) -> Iterator[Sequence]:
+        worker_id, num_workers = _worker_shard()
+        query = text("""
+            SELECT student_id, concept_id, correct
+            FROM interaction_log
+            WHERE (abs(hashtext(student_id::text)::bigint) % 100 < :val_percent) = :is_val
+              AND (abs(hashtext(student_id::text)::bigint) / 100) % :num_workers = :worker_id
+            ORDER BY student_id, seq
+        """)
+        params = {
+            "val_percent": self.val_percent,
+            "is_val": self.split == "val",
+            "num_workers": num_workers,
+            "worker_id": worker_id,
+        }
+
+        # Engines must not cross process boundaries: every worker opens its own connection.
+        engine = create_engine(self.database_url, poolclass=NullPool)
+        try:
+            with engine.connect() as conn:
+                result = conn.execution_options(stream_results=True, yield_per=self.chunk_size).execute(query, params)
+                current_student = None
+                sequence: Sequence = []
+                for student_id, concept_id, correct in result:
+                    if student_id != current_student:
+                        yield from split_windows(sequence, self.max_seq_len)
+                        current_student, sequence = student_id, []
+                    idx = get_concept_index(concept_id)
+                    if idx is not None:  # Concepts outside the vocabulary are skipped
+                        sequence.append((idx, bool(correct)))
+                yield from split_windows(sequence, self.max_seq_len)
+        finally:
+            engine.dispose()
+
+
+class SyntheticSequenceDataset(IterableDataset):
+    """
+    Offline fixture: deterministic simulated students for running the trainer without a database.
+
+    Each student practices a handful of concepts; P(correct) = sigmoid(ability + skill - difficulty)
+    and skill grows with every attempt, so there is a real learning signal for DKT to pick up.
+    """
+
+    def __init__(
+        self,
+        num_students: int = 2000,
+        num_concepts: int = 123,
+        min_len: int = 10,
+        max_len: int = 150,
+        split: str = "train",
+        val_percent: int = 10,
+        max_seq_len: int = 200,
+        seed: int = 42,
+    ):
+        self.num_students = num_students
+        self.num_concepts = num_concepts
+        self.min_len = min_len
+        self.max_len = max_len
+        self.split = split
+        self.val_percent = val_percent
+        self.max_seq_len = max_seq_len
+        self.seed = seed
+        rng = random.Random(seed)
+        self.difficulty = [rng.gauss(0.0, 1.0) for _ in range(num_concepts)]
+
+    def __iter__(self) -> Iterator[Sequence]:
+        worker_id, num_workers = _worker_shard()
+        for student in range(worker_id, self.num_students, num_workers):
+            if (student % 100 < self.val_percent) != (self.split == "val"):
+                continue
+            yield from split_windows(self._simulate(student), self.max_seq_len)
+
+    def _simulate(self, student: int) -> Sequence:
+        rng = random.Random(self.seed * 1_000_003 + student)
+        ability = rng.gauss(0.0, 1.0)
+        concepts = rng.sample(range(self.num_concepts), k=min(8, self.num_concepts))
+        skill = dict.fromkeys(concepts, 0.0)
+
+        sequence: Sequence = []
+        for _ in range(rng.randint(self.min_len, self.max_len)):
+            concept = rng.choice(concepts)
+            p_correct = 1.0 / (1.0 + math.exp(-(ability + skill[concept] - self.difficulty[concept])))
+            correct = rng.random() < p_correct
+            skill[concept] += 0.3 if correct else 0.15
+            sequence.append((concept, correct))
+        return sequence
@@ -0,0 +1,136 @@
+"""
+Central DQN learner.
+
+With RL_LEARNER_MODE=remote the API processes are pure actors: they serve recommendations and push
+every feedback transition to the Redis stream RL_TRANSITION_STREAM. This process is the only one
+that trains. It reads the stream through a consumer group (entries are acknowledged once they are
+handed to the training thread, so a restart re-reads what it had not taken yet), trains with the same
+BackgroundLearner schedule as the in-process mode, and publishes the policy as a new "dqn" registry
+version every RL_CHECKPOINT_INTERVAL_SECONDS. Actors swap it in through their model watcher
+(MODEL_WATCH_INTERVAL_SECONDS), so no request ever waits for training or weight loading.
+
+Usage (from ml_service/):
+    python -m src.training.dqn_learner
+    python -m src.training.dqn_learner --keep-versions 10
+"""
+
+import argparse
+import signal
+import threading
+
+import redis
+from loguru import logger
+
+from ..config import settings
+from ..models import registry
+from ..models.growth import load_weights
+from ..models.rl import DQN, STATE_FEATURES, RLAgent
+from ..services.rl_learner import BackgroundLearner
+from ..services.rl_transitions import decode_transition
+from ..utils import vocabulary
+
+# Same state layout as RLEngine: knowledge slots + 5 behavior + 2 cognitive + 4 preference features
+INPUT_DIM = settings.INPUT_DIM_RL + STATE_FEATURES
+OUTPUT_DIM = settings.OUTPUT_DIM_RL
+GROUP = "dqn-learner"
+CONSUMER = "learner"
+
+
+def build_agent() -> RLAgent:
+    """Agent owning the replay memory, starting from the latest published policy (else the bundled weights)."""
+    agent = RLAgent(
+        INPUT_DIM,
+        OUTPUT_DIM,
+        memory_capacity=settings.RL_REPLAY_CAPACITY,
+        memory_path=settings.RL_REPLAY_PATH,
+        prioritized=settings.RL_PRIORITIZED_REPLAY,
+        per_alpha=settings.RL_PER_ALPHA,
+        per_beta=settings.RL_PER_BETA,
+    )
+    version = registry.latest_version("dqn")
+    if version:
+        policy = DQN(INPUT_DIM, OUTPUT_DIM)
+        load_weights(policy, registry.weights_path("dqn", version), map_location="cpu")
+        agent.install_policy(policy, version)
+    return agent
+
+
+def ensure_group(client: redis.Redis, stream: str):
+    try:
+        client.xgroup_create(stream, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def consume(client: redis.Redis, stream: str, read_count: int, learner: BackgroundLearner, stop: threading.Event):
+    """Feeds stream entries to the learner until `stop` is set."""
+    ensure_group(client, stream)
+    # Entries delivered to a previous run but never acknowledged come first ("0"), then new ones (">")
+    cursor = "0"
+    logger.info(f"DQN learner consuming {stream} ({len(vocabulary)} concepts, {OUTPUT_DIM} actions)")
+
+    while not stop.is_set():
+        try:
+            response = client.xreadgroup(
+                GROUP, CONSUMER, {stream: cursor}, count=read_count, block=None if cursor == "0" else 1000
+            )
+        except redis.RedisError as e:
+            logger.error(f"Transition stream read failed: {e}")
+            stop.wait(1.0)
+            continue
+
+        entries = response[0][1] if response else []
+        if cursor == "0" and not entries:
+            cursor = ">"
+            continue
+        for _, fields in entries:
+            try:
+                learner.enqueue(*decode_transition(fields))
+            except Exception as e:
+                logger.error(f"Dropping undecodable RL transition: {e}")
+        if entries:
+            try:
+                client.xack(stream, GROUP, *[entry_id for entry_id, _ in entries])
+            except redis.RedisError as e:
+                # Unacknowledged entries are delivered again after a restart (replayed twice at worst)
+                logger.error(f"Transition stream ack failed: {e}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stream", default=settings.RL_TRANSITION_STREAM)
+    parser.add_argument("--read-count", type=int, default=512, help="Stream entries read per call")
+    parser.add_argument("--keep-versions", type=int, default=settings.RL_REGISTRY_KEEP_VERSIONS)
+    args = parser.parse_args()
+
+    agent = build_agent()
+
+    def publish():
+        version = agent.publish_policy({"source": "dqn_learner"})
+        if version:
+            registry.prune("dqn", args.keep_versions)
+            logger.info(f"Published DQN version {version} (replay memory {len(agent.memory)})")
+
+    learner = BackgroundLearner(
+        agent,
+        train_every=settings.RL_TRAIN_EVERY_TRANSITIONS,
+        train_interval=settings.RL_TRAIN_INTERVAL_SECONDS,
+        checkpoint_interval=settings.RL_CHECKPOINT_INTERVAL_SECONDS,
+        target_sync_steps=settings.RL_TARGET_SYNC_STEPS,
+        checkpoint_fn=publish,
+    )
+    learner.start()
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    consume(redis.Redis.from_url(settings.REDIS_URL), args.stream, args.read_count, learner, stop)
+
+    logger.info("DQN learner stopping; training on the remaining transitions and publishing.")
+    learner.stop(timeout=60.0)
+
+
+if __name__ == "__main__":
+    main()
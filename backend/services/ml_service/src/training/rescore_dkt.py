@@ -0,0 +1,188 @@
+"""
+Full-population DKT re-scoring.
+
+After new DKT weights are deployed, every student's `knowledge_states` snapshot is stale until they
+answer another question. This job walks all students with an interaction history in keyset chunks,
+scores their last DKT_MAX_SEQ_LEN interactions across a process pool (packed batches), and bulk-writes
+the refreshed mastery maps. Progress is checkpointed after every chunk, so an interrupted run resumes
+where it stopped.
+
+Usage (from ml_service/):
+    python -m src.training.rescore_dkt --processes 4
+    python -m src.training.rescore_dkt --resume
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import UTC, datetime
+
+import numpy as np
+import torch
+from loguru import logger
+
+from ..config import settings
+from ..models import registry
+from ..models.dkt import DKT
+from ..models.growth import load_weights
+from ..utils import CONCEPT_TO_INDEX
+
+LEGACY_WEIGHTS = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "data", "dkt_model.pth"
+)
+
+# Per-process model, loaded once by the pool initializer
+_worker_model: DKT | None = None
+
+
+def _init_worker(weights_path: str, dims: tuple[int, int, int, int]):
+    global _worker_model
+    torch.set_num_threads(1)  # One core per pool process
+    _worker_model = DKT(*dims)
+    load_weights(_worker_model, weights_path, map_location="cpu")
+    _worker_model.eval()
+
+
+def _score_chunk(student_ids: list[str], sequences: list[list[int]], batch_size: int) -> tuple[list[str], np.ndarray]:
+    """Runs packed DKT batches over the chunk. Returns ids and their last-step predictions (n, output_dim)."""
+    assert _worker_model is not None
+    outputs = []
+    with torch.no_grad():
+        for start in range(0, len(sequences), batch_size):
+            batch = sequences[start : start + batch_size]
+            lengths = torch.tensor([len(seq) for seq in batch], dtype=torch.long)
+            x = torch.zeros((len(batch), int(lengths.max())), dtype=torch.long)
+            for i, seq in enumerate(batch):
+                x[i, : len(seq)] = torch.tensor(seq, dtype=torch.long)
+            prediction, _ = _worker_model.step(x, None, lengths)
+            outputs.append(prediction.numpy())
+    return student_ids, np.concatenate(outputs) if outputs else np.empty((0, 0), dtype=np.float32)
+
+
+def resolve_weights(path: str | None) -> str:
+    if path:
+        return path
+    version = registry.latest_version("dkt")
+    return registry.weights_path("dkt", version) if version else LEGACY_WEIGHTS
+
+
+def load_checkpoint(path: str, weights_path: str) -> dict:
+    if os.path.exists(path):
+        with open(path) as f:
+            state = json.load(f)
+        if state.get("weights") == weights_path:
+            return state
+        logger.warning(f"Checkpoint {path} belongs to other weights ({state.get('weights')}); starting over.")
+    return new_state(weights_path)
+
+
+def new_state(weights_path: str) -> dict:
+    return {"weights": weights_path, "after": None, "students": 0, "rows_written": 0, "completed": False}
+
+
+def save_checkpoint(path: str, state: dict):
+    state["updated_at"] = datetime.now(UTC).isoformat()
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--weights", default=None, help="state_dict to score with (default: latest registry version)")
+    parser.add_argument("--chunk-students", type=int, default=1000, help="Students read and written per chunk")
+    parser.add_argument("--batch-size", type=int, default=256, help="Sequences per forward pass")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--checkpoint", default=None, help="Progress file (default: next to the registry)")
+    parser.add_argument("--resume", action="store_true", help="Continue from the checkpoint instead of restarting")
+    args = parser.parse_args()
+
+    # Imported here so pool processes (which only import this module) never open DB connections
+    from ..database import get_student_histories_batch, list_students_with_history, update_knowledge_state_batch
+
+    weights_path = resolve_weights(args.weights)
+    checkpoint_path = args.checkpoint or os.path.join(registry.kind_dir("dkt"), "rescore_checkpoint.json")
+    os.makedirs(os.path.dirname(checkpoint_path), exist_ok=True)
+    state = load_checkpoint(checkpoint_path, weights_path) if args.resume else new_state(weights_path)
+    if state["completed"]:
+        logger.info(f"Checkpoint {checkpoint_path} says this run already completed; nothing to do.")
+        return
+    logger.info(f"Re-scoring with {weights_path}, starting after {state['after'] or 'the beginning'}")
+
+    dims = (settings.INPUT_DIM_DKT, settings.HIDDEN_DIM, settings.LAYER_DIM, settings.OUTPUT_DIM_DKT)
+    concept_slots = [(c_id, idx) for c_id, idx in CONCEPT_TO_INDEX.items() if idx < settings.OUTPUT_DIM_DKT]
+    slots = {c_id: idx for c_id, idx in CONCEPT_TO_INDEX.items() if idx < settings.INPUT_DIM_DKT}
+
+    def read_chunk(after: str | None) -> tuple[str | None, list[str], list[list[int]]]:
+        """The chunk's last listed id (the cursor) and the students with a non-empty model input."""
+        listed = list_students_with_history(after, args.chunk_students)
+        histories = get_student_histories_batch(listed, settings.DKT_MAX_SEQ_LEN)
+        student_ids, sequences = [], []
+        for sid in listed:
+            seq = [
+                slots[item["concept_id"]] + (settings.INPUT_DIM_DKT if item["correct"] else 0)
+                for item in histories.get(sid, [])
+                if item["concept_id"] in slots  # Concepts unknown to the model are skipped
+            ]
+            # Only unknown concepts in the window: nothing to score (packed sequences cannot be empty)
+            if seq:
+                student_ids.append(sid)
+                sequences.append(seq)
+        return (listed[-1] if listed else None), student_ids, sequences
+
+    def write_chunk(student_ids: list[str], predictions: np.ndarray) -> int:
+        updates = [
+            {"student_id": sid, "concept_id": c_id, "mastery_level": float(predictions[row, idx])}
+            for row, sid in enumerate(student_ids)
+            for c_id, idx in concept_slots
+        ]
+        return update_knowledge_state_batch(updates, epsilon=settings.KNOWLEDGE_WRITE_EPSILON)
+
+    start = time.perf_counter()
+    scored_this_run = 0
+    in_flight: deque[tuple[str, Future]] = deque()
+
+    with ProcessPoolExecutor(args.processes, initializer=_init_worker, initargs=(weights_path, dims)) as pool:
+        after = state["after"]
+        exhausted = False
+        while not exhausted or in_flight:
+            # Keep every process busy while the main process reads ahead and writes back
+            while not exhausted and len(in_flight) < args.processes * 2:
+                last_id, student_ids, sequences = read_chunk(after)
+                if last_id is None:
+                    exhausted = True
+                    break
+                after = last_id
+                in_flight.append((after, pool.submit(_score_chunk, student_ids, sequences, args.batch_size)))
+
+            if not in_flight:
+                break
+
+            # Results are committed in submission order so the checkpoint never skips a chunk
+            chunk_last_id, future = in_flight.popleft()
+            student_ids, predictions = future.result()
+            state["rows_written"] += write_chunk(student_ids, predictions)
+            state["students"] += len(student_ids)
+            state["after"] = chunk_last_id
+            save_checkpoint(checkpoint_path, state)
+
+            scored_this_run += len(student_ids)
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Re-scored {state['students']} students ({scored_this_run / elapsed:.1f} students/s), "
+                f"{state['rows_written']} rows written"
+            )
+
+    state["completed"] = True
+    save_checkpoint(checkpoint_path, state)
+
+    elapsed = time.perf_counter() - start
+    rate = scored_this_run / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Done: {scored_this_run} students in {elapsed:.1f}s ({rate:.1f} students/s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Concept vocabulary sync.
+
+Fetches every concept from the Knowledge Graph service and gives the ones the ML service has not seen
+yet the next free model slots in concept_mapping.json (existing slots never move). Running processes
+pick the new concepts up on their next lookup miss (CONCEPT_VOCABULARY_RELOAD_SECONDS). Concepts past
+the current model dimensions become usable after a restart: the dimensions then grow in steps of
+CONCEPT_SLOT_GROWTH and the existing DKT/DQN checkpoints are warm-started into them (models/growth.py).
+
+Usage (from ml_service/):
+    python -m src.training.sync_vocabulary
+    python -m src.training.sync_vocabulary --kg-url http://localhost:8002 --dry-run
+"""
+
+import argparse
+import json
+import urllib.request
+
+from loguru import logger
+
+from ..config import settings
+from ..utils import vocabulary
+
+
+def fetch_concept_ids(kg_url: str, page_size: int, timeout: float) -> list[str]:
+    """All concept ids of the Knowledge Graph, paging through GET /api/v1/concepts."""
+    concept_ids: list[str] = []
+    skip = 0
+    while True:
+        url = f"{kg_url.rstrip('/')}/api/v1/concepts?skip={skip}&limit={page_size}"
+        with urllib.request.urlopen(url, timeout=timeout) as response:
+            page = json.load(response)
+        concept_ids.extend(item["id"] for item in page["items"])
+        skip += page_size
+        if not page["items"] or skip >= page["total"]:
+            return concept_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync the concept vocabulary with the Knowledge Graph")
+    parser.add_argument("--kg-url", default=settings.KG_SERVICE_URL, help="Knowledge Graph service base URL")
+    parser.add_argument("--page-size", type=int, default=500)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    parser.add_argument("--dry-run", action="store_true", help="Report new concepts without saving")
+    args = parser.parse_args()
+
+    try:
+        concept_ids = fetch_concept_ids(args.kg_url, args.page_size, args.timeout)
+    except Exception as e:
+        logger.error(f"Failed to fetch concepts from {args.kg_url}: {e}")
+        raise
+
+    capacity_before = vocabulary.capacity(settings.INPUT_DIM_DKT, settings.CONCEPT_SLOT_GROWTH)
+    new = vocabulary.allocate(concept_ids)
+    capacity = vocabulary.capacity(settings.INPUT_DIM_DKT, settings.CONCEPT_SLOT_GROWTH)
+    logger.info(f"{len(concept_ids)} concepts in the Knowledge Graph, {len(new)} new ({len(vocabulary)} in vocabulary)")
+    if not new:
+        return
+    if args.dry_run:
+        logger.info(f"Dry run; not saving {vocabulary.path}")
+        return
+
+    vocabulary.save()
+    logger.info(f"Saved {vocabulary.path} (slots {min(new.values())}-{max(new.values())} assigned)")
+    if capacity > capacity_before:
+        logger.info(
+            f"Model dimensions grow from {capacity_before} to {capacity} concepts; "
+            "restart the ML service and learners to serve the new concepts (checkpoints are warm-started)."
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Offline DKT trainer.
+
+Streams interaction sequences (Postgres `interaction_log`, or a synthetic fixture with --synthetic),
+trains on packed variable-length batches with multi-worker loading, and publishes the epoch with the
+best held-out AUC as a new version in the model registry (<MODEL_REGISTRY_DIR>/dkt/<version>.pth).
+Serving hot-swaps published versions in, so a run is only published if its val AUC reaches --min-auc
+and is at most --max-auc-drop below the latest published version's; --synthetic runs also need
+--publish. Runs that are not published keep their best weights under <MODEL_REGISTRY_DIR>/dkt/runs/<version>/.
+
+Usage (from ml_service/):
+    python -m src.training.train_dkt --synthetic --epochs 3
+    python -m src.training.train_dkt --epochs 10 --workers 4 --batch-size 64
+"""
+
+import argparse
+import os
+import time
+from functools import partial
+
+import numpy as np
+import torch
+import torch.nn.functional as F  # noqa: N812
+from loguru import logger
+from torch.utils.data import DataLoader
+
+from ..config import settings
+from ..models import registry
+from ..models.dkt import DKT
+from ..models.growth import load_weights
+from .data import PostgresSequenceDataset, SyntheticSequenceDataset, collate_sequences
+
+
+def roc_auc(labels: np.ndarray, scores: np.ndarray) -> float:
+    """Rank-based (Mann-Whitney) ROC AUC with average ranks for ties."""
+    positives = int(labels.sum())
+    negatives = len(labels) - positives
+    if positives == 0 or negatives == 0:
+        return float("nan")
+
+    order = np.argsort(scores, kind="mergesort")
+    sorted_scores = scores[order]
+    ranks = np.empty(len(scores), dtype=np.float64)
+    # Average rank of each run of equal scores
+    _, starts, counts = np.unique(sorted_scores, return_index=True, return_counts=True)
+    avg = starts + (counts + 1) / 2.0
+    ranks[order] = np.repeat(avg, counts)
+
+    return float((ranks[labels == 1].sum() - positives * (positives + 1) / 2.0) / (positives * negatives))
+
+
+def run_epoch(model: DKT, loader: DataLoader, optimizer: torch.optim.Optimizer | None = None) -> dict:
+    """
+    One pass over the loader; trains when an optimizer is given, otherwise evaluates.
+    Returns loss, throughput (scored interactions per second) and AUC.
+    """
+    training = optimizer is not None
+    model.train(training)
+    total_loss, samples = 0.0, 0
+    all_labels, all_scores = [], []
+    start = time.perf_counter()
+
+    with torch.set_grad_enabled(training):
+        for x, target_concepts, labels, lengths in loader:
+            output = model(x, lengths)  # (batch, steps, num_concepts)
+            scores = output.gather(2, target_concepts.unsqueeze(-1)).squeeze(-1)
+            mask = torch.arange(x.size(1)).unsqueeze(0) < lengths.unsqueeze(1)
+
+            loss = F.binary_cross_entropy(scores[mask].clamp(1e-6, 1 - 1e-6), labels[mask])
+            if training:
+                optimizer.zero_grad()
+                loss.backward()
+                torch.nn.utils.clip_grad_norm_(model.parameters(), 5.0)
+                optimizer.step()
+
+            count = int(mask.sum())
+            total_loss += loss.item() * count
+            samples += count
+            all_labels.append(labels[mask].numpy())
+            all_scores.append(scores[mask].detach().numpy())
+
+    elapsed = time.perf_counter() - start
+    return {
+        "loss": total_loss / max(samples, 1),
+        "samples": samples,
+        "samples_per_sec": samples / elapsed if elapsed > 0 else 0.0,
+        "auc": roc_auc(np.concatenate(all_labels), np.concatenate(all_scores)) if samples else float("nan"),
+    }
+
+
+def build_datasets(args):
+    if args.synthetic:
+        common = {
+            "num_students": args.synthetic_students,
+            "num_concepts": settings.INPUT_DIM_DKT,
+            "val_percent": args.val_percent,
+            "max_seq_len": args.max_seq_len,
+            "seed": args.seed,
+        }
+        return SyntheticSequenceDataset(split="train", **common), SyntheticSequenceDataset(split="val", **common)
+
+    common = {
+        "database_url": settings.DATABASE_URL,
+        "val_percent": args.val_percent,
+        "max_seq_len": args.max_seq_len,
+        "chunk_size": args.chunk_size,
+    }
+    return PostgresSequenceDataset(split="train", **common), PostgresSequenceDataset(split="val", **common)
+
+
+def publish_blocker(args, val_auc: float) -> str | None:
+    """Why the run must not be published (serving hot-swaps every published version), or None."""
+    if args.synthetic and not args.publish:
+        return "synthetic run; pass --publish to serve it"
+    if not val_auc >= args.min_auc:  # NaN (single-class validation split) fails too
+        return f"val AUC below --min-auc {args.min_auc}"
+    current = registry.latest_version("dkt")
+    current_auc = registry.read_metadata("dkt", current).get("val_auc") if current else None
+    if current_auc is not None and not np.isnan(current_auc) and val_auc < current_auc - args.max_auc_drop:
+        return f"more than --max-auc-drop {args.max_auc_drop} below the served version {current} ({current_auc:.4f})"
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", action="store_true", help="Train on the built-in simulated students")
+    parser.add_argument("--synthetic-students", type=int, default=2000)
+    parser.add_argument("--epochs", type=int, default=5)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--max-seq-len", type=int, default=200, help="Longer histories are cut into windows")
+    parser.add_argument("--val-percent", type=int, default=10)
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows fetched per DB round trip")
+    parser.add_argument("--workers", type=int, default=2, help="DataLoader worker processes")
+    parser.add_argument("--threads", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="torch CPU threads")
+    parser.add_argument("--init-from", default=None, help="Warm-start from an existing state_dict")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--publish", action="store_true", help="Publish a --synthetic run too (if it passes the gate)")
+    parser.add_argument("--min-auc", type=float, default=0.6, help="Lowest val AUC that is published")
+    parser.add_argument(
+        "--max-auc-drop", type=float, default=0.01, help="Largest val AUC drop vs the published version allowed"
+    )
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    torch.set_num_threads(args.threads)
+
+    train_set, val_set = build_datasets(args)
+    collate = partial(collate_sequences, num_concepts=settings.INPUT_DIM_DKT)
+    loader_kwargs = {"batch_size": args.batch_size, "num_workers": args.workers, "collate_fn": collate}
+    train_loader = DataLoader(train_set, **loader_kwargs)
+    val_loader = DataLoader(val_set, **loader_kwargs)
+
+    model = DKT(settings.INPUT_DIM_DKT, settings.HIDDEN_DIM, settings.LAYER_DIM, settings.OUTPUT_DIM_DKT)
+    if args.init_from:
+        load_weights(model, args.init_from, map_location="cpu")
+    optimizer = torch.optim.Adam(model.parameters(), lr=args.lr)
+
+    version = registry.new_version()
+    run_dir = os.path.join(registry.kind_dir("dkt"), "runs", version)
+    best: dict | None = None
+
+    for epoch in range(1, args.epochs + 1):
+        train_stats = run_epoch(model, train_loader, optimizer)
+        val_stats = run_epoch(model, val_loader)
+        logger.info(
+            f"Epoch {epoch}/{args.epochs}: train loss {train_stats['loss']:.4f} "
+            f"({train_stats['samples_per_sec']:.0f} samples/s), "
+            f"val loss {val_stats['loss']:.4f}, val AUC {val_stats['auc']:.4f}"
+        )
+
+        registry.atomic_save(model.state_dict(), os.path.join(run_dir, f"epoch_{epoch}.pth"))
+        # NaN AUC (single-class validation split) never wins over a real one
+        if best is None or np.nan_to_num(val_stats["auc"], nan=-1.0) > np.nan_to_num(best["val_auc"], nan=-1.0):
+            best = {
+                "epoch": epoch,
+                "val_auc": val_stats["auc"],
+                "val_loss": val_stats["loss"],
+                "train_samples_per_sec": train_stats["samples_per_sec"],
+                "state_dict": {k: v.detach().clone() for k, v in model.state_dict().items()},
+            }
+
+    if best is None:
+        logger.error("No epochs were run; nothing to publish.")
+        return
+
+    state_dict = best.pop("state_dict")
+    metadata = {
+        **best,
+        "source": "synthetic" if args.synthetic else "interaction_log",
+        "input_dim": settings.INPUT_DIM_DKT,
+        "hidden_dim": settings.HIDDEN_DIM,
+        "layer_dim": settings.LAYER_DIM,
+        "output_dim": settings.OUTPUT_DIM_DKT,
+    }
+    blocker = publish_blocker(args, best["val_auc"])
+    if blocker:
+        best_path = os.path.join(run_dir, "best.pth")
+        registry.atomic_save(state_dict, best_path)
+        logger.warning(
+            f"Not published ({blocker}): best epoch {best['epoch']} (val AUC {best['val_auc']:.4f}) saved to "
+            f"{best_path}"
+        )
+        return
+    registry.publish("dkt", state_dict, metadata, version=version)
+    logger.info(f"Published DKT {version} (epoch {best['epoch']}, val AUC {best['val_auc']:.4f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,40 @@
-import json
 import os
 
 from loguru import logger
 
-# Path to the mapping file
-MAPPING_FILE = os.path.join(os.path.dirname(__file__), "concept_mapping.json")
-
-
-def load_concept_mapping():
-    """
-    Loads the mapping from UUIDs to Model Indices.
-    """
-    if not os.path.exists(MAPPING_FILE):
-        logger.warning(f"Mapping file not found at {MAPPING_FILE}. Using empty map.")
-        return {}
+from .config import settings
+from .vocabulary import ConceptVocabulary, VocabularyView
 
-    try:
-        with open(MAPPING_FILE) as f:
-            data = json.load(f)
-            # Ensure keys are strings (UUIDs) and values are ints
-            return {k: int(v) for k, v in data.items()}
-    except Exception as e:
-        logger.error(f"Failed to load concept mapping: {e}")
-        return {}
+# Path to the mapping file
+MAPPING_FILE = settings.CONCEPT_VOCABULARY_PATH or os.path.join(os.path.dirname(__file__), "concept_mapping.json")
 
+# Loaded on module import (effectively a singleton)
+vocabulary = ConceptVocabulary(MAPPING_FILE, reload_interval=settings.CONCEPT_VOCABULARY_RELOAD_SECONDS)
 
-# Load on module import (effectively a singleton)
-CONCEPT_TO_INDEX = load_concept_mapping()
+# Live read-only views of the vocabulary: each lookup or iteration reads the current snapshot, so
+# synced concepts show up and a reload on another thread never changes a dict mid-iteration
+CONCEPT_TO_INDEX = VocabularyView(vocabulary, "concept_to_index")
+INDEX_TO_CONCEPT = VocabularyView(vocabulary, "index_to_concept")
 
-# Create reverse mapping for RL decoding
-INDEX_TO_CONCEPT = {v: k for k, v in CONCEPT_TO_INDEX.items()}
+# The concept dimensions of DKT and DQN follow the vocabulary: once it outgrows the configured size,
+# models are built larger and smaller checkpoints are warm-started into them (models/growth.py).
+_capacity = vocabulary.capacity(settings.INPUT_DIM_DKT, settings.CONCEPT_SLOT_GROWTH)
+if _capacity > settings.INPUT_DIM_DKT:
+    logger.info(f"Concept vocabulary needs {_capacity} slots; growing the model dimensions.")
+    for _field in ("INPUT_DIM_DKT", "OUTPUT_DIM_DKT", "INPUT_DIM_RL", "OUTPUT_DIM_RL"):
+        setattr(settings, _field, max(getattr(settings, _field), _capacity))
 
 
-def get_concept_index(concept_id: str) -> int:
+def get_concept_index(concept_id: str) -> int | None:
     """
-    Returns the integer index for a concept UUID.
-    Returns 0 (default) if unknown, to prevent crashes.
+    Returns the model slot of a concept UUID, or None if the concept is not in the vocabulary
+    (callers skip it instead of mixing it into another concept's slot).
     """
-    return CONCEPT_TO_INDEX.get(concept_id, 0)
+    return vocabulary.index(concept_id)
 
 
 def get_concept_from_index(index: int) -> str | None:
     """
     Returns the UUID for a model integer index.
     """
-    return INDEX_TO_CONCEPT.get(index)
+    return vocabulary.concept(index)
@@ -0,0 +1,178 @@
+import json
+import math
+import os
+import threading
+import time
+from collections.abc import Iterable, Iterator, Mapping
+
+from loguru import logger
+
+
+class ConceptVocabulary:
+    """
+    Bidirectional concept_id <-> model slot mapping with O(1) lookups both ways.
+
+    Slots are append-only: a concept keeps its slot forever and a new concept always gets the next
+    free slot, so two concepts never share one. Concepts without a slot are unknown (None); they no
+    longer borrow slot 0. The mapping is the {concept_id: slot} JSON of concept_mapping.json, written by
+    `python -m src.training.sync_vocabulary`. A lookup miss re-reads the file when it changed, at most
+    once every `reload_interval` seconds, so running processes pick up synced concepts.
+
+    Updates are copy-on-write: both dicts are replaced as a whole and never mutated afterwards, so a
+    reader iterating over one (e.g. through a `VocabularyView`) is safe against a reload on another thread.
+    """
+
+    def __init__(self, path: str, reload_interval: float = 30.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        # Immutable snapshots, swapped under the lock (reverse mapping first, so every visible concept resolves)
+        self.concept_to_index: dict[str, int] = {}
+        self.index_to_concept: dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._mtime: float | None = None
+        self._last_check = 0.0
+        self.reload()
+
+    def __len__(self) -> int:
+        return len(self.concept_to_index)
+
+    def __contains__(self, concept_id: str) -> bool:
+        return concept_id in self.concept_to_index
+
+    @property
+    def size(self) -> int:
+        """Number of slots in use (highest slot + 1)."""
+        return max(self.index_to_concept, default=-1) + 1
+
+    def capacity(self, minimum: int, step: int) -> int:
+        """Model dimension needed for the vocabulary: at least `minimum`, grown in multiples of `step`."""
+        return max(minimum, math.ceil(self.size / step) * step)
+
+    def index(self, concept_id: str) -> int | None:
+        idx = self.concept_to_index.get(concept_id)
+        if idx is None and self._maybe_reload():
+            idx = self.concept_to_index.get(concept_id)
+        return idx
+
+    def concept(self, index: int) -> str | None:
+        return self.index_to_concept.get(index)
+
+    def reload(self) -> bool:
+        """Re-reads the mapping file if it changed. Returns whether new concepts were added."""
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            if self._mtime is None:
+                logger.warning(f"Concept vocabulary not found at {self.path}. Using an empty vocabulary.")
+                self._mtime = 0.0
+            return False
+        if mtime == self._mtime:
+            return False
+        initial = not self.concept_to_index
+
+        try:
+            with open(self.path) as f:
+                mapping = {str(k): int(v) for k, v in json.load(f).items()}
+            added = self.merge(mapping)
+        except Exception as e:
+            logger.error(f"Failed to load concept vocabulary from {self.path}: {e}")
+            return False
+        self._mtime = mtime
+        if added and not initial:
+            logger.info(f"Concept vocabulary reloaded: {added} new concepts ({len(self)} total)")
+        return added > 0
+
+    def merge(self, mapping: dict[str, int]) -> int:
+        """
+        Adds the concepts of `mapping` that are not known yet. A mapping that moves a known concept
+        or reuses a taken slot is rejected (ValueError) as a whole. Returns how many were added.
+        """
+        with self._lock:
+            new = {}
+            for concept_id, idx in mapping.items():
+                known = self.concept_to_index.get(concept_id)
+                if known is not None:
+                    if known != idx:
+                        raise ValueError(f"Concept {concept_id} moved from slot {known} to {idx}")
+                    continue
+                owner = self.index_to_concept.get(idx, new.get(idx))
+                if owner is not None or idx < 0:
+                    raise ValueError(f"Slot {idx} of {concept_id} is invalid or taken by {owner}")
+                new[idx] = concept_id
+            if new:
+                self._publish({concept_id: idx for idx, concept_id in new.items()})
+            return len(new)
+
+    def allocate(self, concept_ids: Iterable[str]) -> dict[str, int]:
+        """Gives every unknown concept the next free slot. Returns the new {concept_id: slot} entries."""
+        with self._lock:
+            next_slot = self.size
+            new = {}
+            for concept_id in dict.fromkeys(concept_ids):
+                if concept_id not in self.concept_to_index:
+                    new[concept_id] = next_slot
+                    next_slot += 1
+            if new:
+                self._publish(new)
+            return new
+
+    def save(self):
+        """Writes the mapping (ordered by slot) to a temp file + rename, so readers never see a partial file."""
+        with self._lock:
+            mapping = {self.index_to_concept[idx]: idx for idx in sorted(self.index_to_concept)}
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w") as f:
+            json.dump(mapping, f, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.path.getmtime(self.path)
+
+    def _publish(self, new: dict[str, int]):
+        """Swaps in copies extended by the new {concept_id: slot} entries (caller holds the lock)."""
+        self.index_to_concept = {**self.index_to_concept, **{idx: concept_id for concept_id, idx in new.items()}}
+        self.concept_to_index = {**self.concept_to_index, **new}
+
+    def _maybe_reload(self) -> bool:
+        now = time.monotonic()
+        if now - self._last_check < self.reload_interval:
+            return False
+        self._last_check = now
+        return self.reload()
+
+
+class VocabularyView(Mapping):
+    """
+    Read-only view of one direction of a vocabulary that always reads its current snapshot.
+    Every call (and every iteration) works on a single snapshot, which is never mutated.
+    """
+
+    def __init__(self, vocabulary: ConceptVocabulary, attribute: str):
+        self._vocabulary = vocabulary
+        self._attribute = attribute
+
+    def snapshot(self) -> dict:
+        return getattr(self._vocabulary, self._attribute)
+
+    def __getitem__(self, key):
+        return self.snapshot()[key]
+
+    def __iter__(self) -> Iterator:
+        return iter(self.snapshot())
+
+    def __len__(self) -> int:
+        return len(self.snapshot())
+
+    def __contains__(self, key) -> bool:
+        return key in self.snapshot()
+
+    def get(self, key, default=None):
+        return self.snapshot().get(key, default)
+
+    def keys(self):
+        return self.snapshot().keys()
+
+    def items(self):
+        return self.snapshot().items()
+
+    def values(self):
+        return self.snapshot().values()
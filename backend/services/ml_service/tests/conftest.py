@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Add project root to sys.path to allow imports from 'src'
+project_root = os.path.realpath(os.path.join(os.path.dirname(__file__), ".."))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+
+# The settings are read at import time; the tests below never connect to these
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import redis
+
+fakeredis = pytest.importorskip("fakeredis")
+
+from src.services.state_cache import StudentStateCache
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Every Redis client of the cache (values, pub/sub listener) talks to one in-memory server."""
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(redis.Redis, "from_url", lambda url, **kwargs: fakeredis.FakeRedis(server=server, **kwargs))
+    return server
+
+
+def vector(value: float) -> np.ndarray:
+    return np.full(4, value, dtype=np.float32)
+
+
+@pytest.mark.parametrize("use_redis", [False, True])
+def test_put_lands_when_another_student_was_invalidated(fake_redis, use_redis):
+    """Student B's write between A's read and A's put must not keep A out of the cache."""
+    cache = StudentStateCache(max_size=100, ttl_seconds=60, use_redis=use_redis)
+
+    clock = cache.clock()
+    cache.invalidate(["student-b"])
+    cache.put("student-a", vector(1.0), clock)
+
+    np.testing.assert_array_equal(cache.get("student-a"), vector(1.0))
+    if use_redis:
+        # Another process reads it from the shared tier
+        other = StudentStateCache(max_size=100, ttl_seconds=60, use_redis=True)
+        np.testing.assert_array_equal(other.get("student-a"), vector(1.0))
+
+
+@pytest.mark.parametrize("use_redis", [False, True])
+def test_put_skipped_when_the_student_was_invalidated(fake_redis, use_redis):
+    """A's state read before A's own write is stale and never stored."""
+    cache = StudentStateCache(max_size=100, ttl_seconds=60, use_redis=use_redis)
+
+    clock = cache.clock()
+    cache.invalidate(["student-a"])
+    cache.put("student-a", vector(1.0), clock)
+
+    assert cache.get("student-a") is None
+    if use_redis:
+        other = StudentStateCache(max_size=100, ttl_seconds=60, use_redis=True)
+        assert other.get("student-a") is None
+
+
+def test_evicted_versions_still_block_stale_puts(fake_redis):
+    """Only the last max_size stamps are kept locally; the floor keeps older invalidations effective."""
+    cache = StudentStateCache(max_size=2, ttl_seconds=60)
+
+    clock = cache.clock()
+    cache.invalidate(["student-a"])
+    cache.invalidate(["student-b", "student-c", "student-d"])
+    cache.put("student-a", vector(1.0), clock)
+
+    assert cache.get("student-a") is None
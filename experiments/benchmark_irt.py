@@ -0,0 +1,198 @@
+# experiments/benchmark_irt.py
+
+"""
+Benchmark of the ML service's IRT ability estimators.
+
+1. Per-call latency: the original estimator (Python loop over 61 grid points x every answered item)
+   against the vectorized grid, EAP and Newton-Raphson MLE estimators, for several history lengths.
+2. Simulated adaptive tests: simulees with known theta answer items targeted at the current estimate
+   (as /api/v1/irt/evaluate does). Compares the fixed 15-item stop with the standard-error stop: average
+   test length (= round trips per test) and RMSE of the final theta.
+3. Per-concept ("concept" dimensions) adaptive tests: simulees with a true theta per concept (global theta
+   plus a N(0, 0.5) deviation) until every concept's SE is below the threshold. Compares picking the concept
+   with the highest posterior variance against round-robin and random concepts: average test length, and
+   per-concept RMSE against crediting the single global theta to every concept (the previous behaviour).
+   Uses the service's length cap (items per path concept within [IRT_MAX_ITEMS, IRT_CONCEPT_MAX_ITEMS]).
+
+Usage (from the repository root):
+    python experiments/benchmark_irt.py
+    python experiments/benchmark_irt.py --simulees 5000 --se-threshold 0.4
+    python experiments/benchmark_irt.py --concepts 8 --concept-simulees 500
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from vectorized_simulation import ML_SERVICE_DIR
+
+
+def load_engine_class():
+    os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+    os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+    if ML_SERVICE_DIR not in sys.path:
+        sys.path.insert(0, ML_SERVICE_DIR)
+    from src.services.irt_engine import IRTEngine
+
+    return IRTEngine
+
+
+def reference_estimate(engine, history):
+    """The original estimate_ability: scalar loop over the grid and the items."""
+    if not history:
+        return 0.0
+    thetas = np.linspace(-3.0, 3.0, 61)
+    log_likelihoods = np.zeros_like(thetas)
+    for i, theta in enumerate(thetas):
+        ll = 0.0
+        for item in history:
+            b = engine.normalize_difficulty(item["difficulty"])
+            prob = np.clip(engine.sigmoid(theta - b), 1e-9, 1.0 - 1e-9)
+            ll += np.log(prob) if item["correct"] else np.log(1.0 - prob)
+        log_likelihoods[i] = ll
+    return float(thetas[np.argmax(log_likelihoods)])
+
+
+def random_history(rng, length):
+    difficulty = rng.uniform(1.0, 10.0, length)
+    correct = rng.random(length) < 0.5
+    return [{"difficulty": float(d), "correct": bool(c)} for d, c in zip(difficulty, correct, strict=True)]
+
+
+def time_call(fn, histories):
+    start = time.perf_counter()
+    for history in histories:
+        fn(history)
+    return (time.perf_counter() - start) / len(histories) * 1e6
+
+
+def benchmark_latency(engine_class, rng, calls):
+    engines = {name: engine_class(estimator=name) for name in ("grid", "eap", "mle")}
+    print(f"Per-call latency (us, mean of {calls} calls):")
+    print(f"  {'items':>5} {'loop (orig)':>12} {'grid':>8} {'eap':>8} {'mle':>8} {'speedup':>8}")
+    for length in (5, 15, 30, 60):
+        histories = [random_history(rng, length) for _ in range(calls)]
+        mismatches = sum(reference_estimate(engines["grid"], h) != engines["grid"].estimate(h)[0] for h in histories)
+        if mismatches:
+            print(f"  [warning] vectorized grid differs from the loop on {mismatches}/{calls} histories")
+        loop = time_call(lambda h: reference_estimate(engines["grid"], h), histories)
+        timings = {name: time_call(engine.estimate, histories) for name, engine in engines.items()}
+        print(
+            f"  {length:>5} {loop:>12.1f} {timings['grid']:>8.1f} {timings['eap']:>8.1f} {timings['mle']:>8.1f} "
+            f"{loop / timings['eap']:>7.0f}x"
+        )
+
+
+def simulate_test(engine, true_theta, rng, stop_rule):
+    history = []
+    theta, se = engine.estimate(history)
+    while True:
+        difficulty = engine.get_next_target_difficulty(theta)
+        b = engine.normalize_difficulty(difficulty)
+        history.append({"difficulty": difficulty, "correct": bool(rng.random() < engine.sigmoid(true_theta - b))})
+        theta, se = engine.estimate(history)
+        if stop_rule(len(history), se):
+            return theta, len(history)
+
+
+def benchmark_tests(engine_class, rng, simulees, se_threshold):
+    true_thetas = np.clip(rng.normal(0.0, 1.0, simulees), -3.0, 3.0)
+    print(f"\nSimulated adaptive tests ({simulees} simulees, theta ~ N(0, 1)):")
+    for name in ("grid", "eap", "mle"):
+        engine = engine_class(estimator=name, se_threshold=se_threshold)
+        rules = {"fixed 15": lambda n, se: n >= 15, f"SE <= {se_threshold}": engine.should_stop}
+        for rule_name, rule in rules.items():
+            start = time.perf_counter()
+            results = np.array([simulate_test(engine, t, rng, rule) for t in true_thetas])
+            elapsed = time.perf_counter() - start
+            rmse = np.sqrt(np.mean((results[:, 0] - true_thetas) ** 2))
+            print(
+                f"  {name:<4} {rule_name:<11} avg items {results[:, 1].mean():5.1f} | RMSE {rmse:.3f} | "
+                f"{elapsed / simulees * 1e3:.2f} ms per test"
+            )
+
+
+def simulate_concept_test(engine, true_thetas, rng, pick_concept):
+    concept_ids = [f"c{i}" for i in range(len(true_thetas))]
+    history = []
+    abilities = engine.estimate_concepts(history, concept_ids)
+    while not engine.should_stop_concepts(len(history), abilities):
+        concept = pick_concept(abilities, len(history))
+        index = concept_ids.index(concept)
+        difficulty = engine.get_next_target_difficulty(abilities.concept_thetas[index])
+        b = engine.normalize_difficulty(difficulty)
+        correct = bool(rng.random() < engine.sigmoid(true_thetas[index] - b))
+        history.append({"difficulty": difficulty, "correct": correct, "concept_id": concept})
+        abilities = engine.estimate_concepts(history, concept_ids)
+    return abilities, len(history)
+
+
+def benchmark_concepts(engine_class, rng, simulees, num_concepts, se_threshold, items_per_concept, max_items):
+    engine = engine_class(
+        concept_se_threshold=se_threshold,
+        concept_items_per_concept=items_per_concept,
+        concept_max_items=max_items,
+        concept_shrinkage_sd=0.5,
+    )
+    item_cap = engine.max_items_for_concepts(num_concepts)
+    global_thetas = rng.normal(0.0, 1.0, simulees)
+    true_thetas = global_thetas[:, None] + rng.normal(0.0, 0.5, (simulees, num_concepts))
+    strategies = {
+        "max variance": lambda abilities, n: abilities.most_uncertain_concept(),
+        "round robin": lambda abilities, n: abilities.concept_ids[n % num_concepts],
+        "random": lambda abilities, n: abilities.concept_ids[rng.integers(num_concepts)],
+    }
+    print(
+        f"\nPer-concept adaptive tests ({simulees} simulees, {num_concepts} concepts, "
+        f"stop at concept SE <= {se_threshold} or {item_cap} items):"
+    )
+    for name, pick in strategies.items():
+        start = time.perf_counter()
+        lengths, errors, global_errors = [], [], []
+        for truth in true_thetas:
+            abilities, length = simulate_concept_test(engine, truth, rng, pick)
+            lengths.append(length)
+            errors.append(abilities.concept_thetas - truth)
+            global_errors.append(abilities.theta - truth)
+        elapsed = time.perf_counter() - start
+        print(
+            f"  {name:<12} avg items {np.mean(lengths):5.1f} | SE stop {np.mean(np.array(lengths) < item_cap):4.0%} | "
+            f"concept RMSE {np.sqrt(np.mean(np.square(errors))):.3f} "
+            f"(global theta for all: {np.sqrt(np.mean(np.square(global_errors))):.3f}) | "
+            f"{elapsed / sum(lengths) * 1e6:.0f} us per estimate"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=200, help="Estimator calls per history length")
+    parser.add_argument("--simulees", type=int, default=2000)
+    parser.add_argument("--se-threshold", type=float, default=0.5)
+    parser.add_argument("--concepts", type=int, default=6, help="Concepts per simulated goal path")
+    parser.add_argument("--concept-simulees", type=int, default=300)
+    parser.add_argument("--concept-se-threshold", type=float, default=0.6)
+    parser.add_argument("--concept-items-per-concept", type=int, default=5)
+    parser.add_argument("--concept-max-items", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    engine_class = load_engine_class()
+    rng = np.random.default_rng(args.seed)
+    benchmark_latency(engine_class, rng, args.calls)
+    benchmark_tests(engine_class, rng, args.simulees, args.se_threshold)
+    benchmark_concepts(
+        engine_class,
+        rng,
+        args.concept_simulees,
+        args.concepts,
+        args.concept_se_threshold,
+        args.concept_items_per_concept,
+        args.concept_max_items,
+    )
+
+
+if __name__ == "__main__":
+    main()
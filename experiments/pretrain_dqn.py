@@ -0,0 +1,169 @@
+# experiments/pretrain_dqn.py
+
+"""
+Offline DQN pretraining on the simulated student population.
+
+Steps `--envs` environments in lockstep (one batched select_actions per tick), stores every tick's
+transitions with one ReplayBuffer.add_batch call and runs `--train-steps` gradient steps per tick.
+Exploration decays linearly from --epsilon-start to --epsilon-end. Reports environment steps per second
+for the whole loop and for the simulation alone, then evaluates the greedy policy against the adaptive
+path with the vectorized simulator. The result is a state_dict in the format of the service's
+rl_model.pth; only a policy that completes at least as many students as the adaptive path is marked
+deployable, and --publish (a "dqn" registry version the service hot-swaps in, in RL_LEARNER_MODE=remote
+or with RL_LOCAL_FOLLOW_REGISTRY) is skipped otherwise.
+
+Usage (from the repository root):
+    python experiments/pretrain_dqn.py --envs 512 --env-steps 500000
+    python experiments/pretrain_dqn.py --output backend/services/ml_service/src/models/data/rl_model.pth
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from rl_environment import StudentEnv
+from simulation_env import KnowledgeGraphMock
+from vectorized_simulation import Curriculum, PathPolicy, RLPolicy, StudentPopulation, load_rl_agent, simulate
+
+
+def build_agent(args):
+    agent = load_rl_agent()  # Also puts the ML service on sys.path
+    import torch
+    from src.models.replay import ReplayBuffer
+    from src.models.rl import DQN
+
+    if args.init == "fresh":
+        torch.manual_seed(args.seed)
+        agent.install_policy(DQN(agent.input_dim, agent.output_dim), "fresh")
+    agent.memory = ReplayBuffer(args.replay_capacity, agent.input_dim)
+    agent.batch_size = args.batch_size
+    agent.policy_net.train()
+    return agent
+
+
+def evaluate(agent, students, seed):
+    """Completion and dropout rates of the greedy policy vs the adaptive path on a fresh population."""
+    results = {}
+    for policy in (PathPolicy(adaptive=True), RLPolicy(agent)):
+        population = StudentPopulation(students, Curriculum(KnowledgeGraphMock()), rng=np.random.default_rng(seed))
+        simulate(policy, population, max_steps=300)
+        results[policy.name] = (population.completed.mean(), population.dropped_out.mean(), population.steps.mean())
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--envs", type=int, default=512, help="Environments stepped together")
+    parser.add_argument("--env-steps", type=int, default=500000, help="Total environment steps (all envs)")
+    parser.add_argument("--train-steps", type=int, default=4, help="Gradient steps per tick")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--replay-capacity", type=int, default=200000)
+    parser.add_argument("--target-sync", type=int, default=500, help="Gradient steps between target syncs")
+    parser.add_argument("--epsilon-start", type=float, default=1.0)
+    parser.add_argument("--epsilon-end", type=float, default=0.05)
+    parser.add_argument("--epsilon-decay", type=float, default=0.5, help="Fraction of the run spent decaying")
+    parser.add_argument("--max-episode-steps", type=int, default=200)
+    parser.add_argument("--profile", default="struggling", choices=["strong", "average", "struggling"])
+    parser.add_argument(
+        "--init", default="fresh", choices=["fresh", "bundled"], help="Start from random or rl_model.pth"
+    )
+    parser.add_argument("--output", default=os.path.join("experiments", "rl_model.pth"))
+    parser.add_argument("--publish", action="store_true", help="Also publish a 'dqn' registry version")
+    parser.add_argument("--eval-students", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    agent = build_agent(args)
+    env = StudentEnv(
+        args.envs,
+        args.profile,
+        args.max_episode_steps,
+        knowledge_slots=agent.input_dim - 11,
+        action_dim=agent.output_dim,
+        seed=args.seed,
+    )
+    obs, info = env.reset()
+
+    ticks = max(1, args.env_steps // args.envs)
+    decay_ticks = max(1, int(ticks * args.epsilon_decay))
+    gradient_steps = 0
+    env_seconds = 0.0
+    episodes, completions, returns = 0, 0, []
+    start = time.perf_counter()
+
+    for tick in range(ticks):
+        agent.epsilon = args.epsilon_start + (args.epsilon_end - args.epsilon_start) * min(1.0, tick / decay_ticks)
+        agent.policy_net.eval()  # No dropout while acting
+        actions = agent.select_actions(obs, info["action_mask"])
+        agent.policy_net.train()
+
+        env_start = time.perf_counter()
+        next_obs, rewards, terminated, truncated, info = env.step(actions)
+        env_seconds += time.perf_counter() - env_start
+
+        # Truncated episodes are stored as terminal too: their next observation already belongs to a new episode
+        agent.memory.add_batch(obs, actions, rewards, next_obs, (terminated | truncated).astype(np.float32))
+        obs = next_obs
+
+        steps = agent.train_step(args.train_steps)
+        if gradient_steps // args.target_sync != (gradient_steps + steps) // args.target_sync:
+            agent.sync_target()
+        gradient_steps += steps
+
+        episodes += info["episodes_finished"]
+        completions += info["episodes_completed"]
+        returns.extend(info["episode_returns"].tolist())
+        if (tick + 1) % max(1, ticks // 10) == 0:
+            elapsed = time.perf_counter() - start
+            recent = returns[-1000:]
+            print(
+                f"[{(tick + 1) * args.envs:>9} env steps] {(tick + 1) * args.envs / elapsed:>9,.0f} steps/s | "
+                f"epsilon {agent.epsilon:.2f} | episodes {episodes} | "
+                f"completed {completions / max(1, episodes):.1%} | "
+                f"return {np.mean(recent) if recent else 0.0:.3f}"
+            )
+
+    elapsed = time.perf_counter() - start
+    total_steps = ticks * args.envs
+    print(f"\n{total_steps} env steps, {gradient_steps} gradient steps in {elapsed:.1f}s:")
+    print(
+        f"{total_steps / elapsed:,.0f} env steps/s overall, {total_steps / env_seconds:,.0f} env steps/s simulation only"
+    )
+
+    from src.models import registry
+
+    state_dict = {k: v.detach().clone() for k, v in agent.policy_net.state_dict().items()}
+    registry.atomic_save(state_dict, args.output)
+
+    agent.epsilon = 0.0
+    agent.policy_net.eval()
+    print(f"\nGreedy evaluation on {args.eval_students} students:")
+    results = evaluate(agent, args.eval_students, args.seed + 1)
+    for name, (completed, dropped, steps) in results.items():
+        print(f"  {name:<10} completed {completed:6.1%} | dropped out {dropped:6.1%} | avg steps {steps:6.1f}")
+    (baseline, *_), (policy, *_) = results.values()
+    deployable = policy >= baseline
+
+    print(f"\n[Saved] {args.output}")
+    if not deployable:
+        print(
+            f"[Not deployable] The policy completes {policy:.1%} of students vs {baseline:.1%} for the adaptive "
+            "path; keep the service's current model."
+        )
+    else:
+        print(
+            "[Deployable] Copy it to the service's src/models/data/rl_model.pth, or use --publish "
+            "(followed in RL_LEARNER_MODE=remote or with RL_LOCAL_FOLLOW_REGISTRY)."
+        )
+    if args.publish:
+        if deployable:
+            version = agent.publish_policy({"source": "pretrain_dqn", "env_steps": total_steps})
+            print(f"[Published] dqn version {version}")
+        else:
+            print("[Not published] --publish skipped for a policy worse than the adaptive path.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# experiments/rl_environment.py
+
+"""
+Gym-style environment for pretraining the service's DQN offline.
+
+`StudentEnv` runs `num_envs` independent episodes of one simulated student each (the SimulatedStudent
+model over the KnowledgeGraphMock curriculum, vectorized by StudentPopulation) and follows the Gymnasium
+vector-env API without depending on it:
+
+    obs, info = env.reset(seed=0)
+    obs, rewards, terminated, truncated, info = env.step(actions)
+
+Observations use the service's state layout (RLEngine._vectorize_state), curriculum concept i is
+action i, and info["action_mask"] marks the concepts a student may take next. Finished episodes restart
+automatically, so the returned observation of a finished row already belongs to its next episode (its
+transition is terminal, so the DQN target ignores it).
+
+Rewards: the service's calculate_reward (knowledge gain and cognitive load), plus `progress_reward` for
+every goal-path concept passed for the first time, `completion_reward` when the path is finished and
+minus `dropout_penalty` on dropout. The engagement term gets no signal: the simulator has no procrastination
+index, and fatigue (which every passed quiz lowers) let policies farm reward by cycling easy remedials.
+"""
+
+import sys
+
+import numpy as np
+
+from simulation_env import KnowledgeGraphMock
+from vectorized_simulation import ML_SERVICE_DIR, Curriculum, StudentPopulation
+
+if ML_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, ML_SERVICE_DIR)
+from src.services.reward import calculate_reward  # noqa: E402  (dependency-free module of the ML service)
+
+STATE_FEATURES = 11  # Behavior (5) + Cognitive (2) + Preferences (4) after the knowledge slots
+
+
+class StudentEnv:
+    def __init__(
+        self,
+        num_envs,
+        profile_type="struggling",
+        max_episode_steps=200,
+        knowledge_slots=123,
+        action_dim=123,
+        seed=None,
+        progress_reward=0.5,
+        completion_reward=5.0,
+        dropout_penalty=5.0,
+    ):
+        self.num_envs = num_envs
+        self.max_episode_steps = max_episode_steps
+        self.knowledge_slots = knowledge_slots
+        self.action_dim = action_dim
+        self.observation_dim = knowledge_slots + STATE_FEATURES
+        self.curriculum = Curriculum(KnowledgeGraphMock())
+        self.profile_type = profile_type
+        self.progress_reward = progress_reward
+        self.completion_reward = completion_reward
+        self.dropout_penalty = dropout_penalty
+        self._seed = seed
+        self._rows = np.arange(num_envs)
+
+    def reset(self, seed=None):
+        rng = np.random.default_rng(self._seed if seed is None else seed)
+        self.population = StudentPopulation(self.num_envs, self.curriculum, self.profile_type, rng)
+        self.episode_return = np.zeros(self.num_envs)
+        return self._observe(), {"action_mask": self.action_mask()}
+
+    def action_mask(self):
+        return self.population.action_mask(self._rows, self.action_dim)
+
+    def step(self, actions):
+        population = self.population
+        curriculum = self.curriculum
+        concepts = np.asarray(actions, dtype=np.int64)
+        if (concepts >= curriculum.size).any():
+            raise ValueError("Action outside the curriculum; select actions with info['action_mask']")
+
+        mastery_before = population.knowledge[self._rows, concepts]
+        passed_before = population.passed[:, curriculum.path].sum(axis=1)
+        ability = population.knowledge[:, curriculum.path].mean(axis=1)
+
+        population.step(self._rows, concepts)
+
+        completed = population.completed
+        rewards = calculate_reward(
+            mastery_delta=population.knowledge[self._rows, concepts] - mastery_before,
+            behavior_delta=0.0,
+            concept_difficulty=curriculum.difficulty[concepts] * 0.1,  # Same 0-1 scale as the quiz
+            student_ability=ability,
+        )
+        # Each path concept pays once, so repeating quizzes cannot farm it
+        rewards = rewards + self.progress_reward * (population.passed[:, curriculum.path].sum(axis=1) - passed_before)
+        rewards = rewards + self.completion_reward * completed - self.dropout_penalty * population.dropped_out
+        rewards = rewards.astype(np.float32)
+        self.episode_return += rewards
+
+        terminated = population.dropped_out | completed
+        truncated = ~terminated & (population.steps >= self.max_episode_steps)
+        done = np.flatnonzero(terminated | truncated)
+
+        info = {
+            "episodes_finished": len(done),
+            "episodes_completed": int(completed[done].sum()),
+            "episode_returns": self.episode_return[done].copy(),
+        }
+        if len(done):
+            population.reset_rows(done)
+            self.episode_return[done] = 0.0
+        info["action_mask"] = self.action_mask()
+        return self._observe(), rewards, terminated, truncated, info
+
+    def _observe(self):
+        return self.population.rl_states(self._rows, self.knowledge_slots)
@@ -0,0 +1,373 @@
+# experiments/vectorized_simulation.py
+
+"""
+Vectorized student-population simulator for offline policy evaluation.
+
+Same student model as SimulatedStudent (learn -> quiz, fatigue, consecutive-failure dropout) and the
+same curriculum as KnowledgeGraphMock, but the whole population lives in NumPy arrays and advances
+one tick for every student at once. Shards of the population run in a process pool, so 10^5-10^6
+students take seconds. Policies are pluggable; besides the static and adaptive paths of
+run_simulation.py, "rl" drives the service's RLAgent (batched select_actions) on the same population.
+
+Usage (from the repository root):
+    python experiments/vectorized_simulation.py --students 100000 --workers 8
+    python experiments/vectorized_simulation.py --policies static adaptive rl --students 200000
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from simulation_env import KnowledgeGraphMock
+from student_agent import SimulatedStudent
+
+ML_SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "backend", "services", "ml_service")
+
+
+def profile_parameters(profile_type):
+    """Learning parameters of a SimulatedStudent profile (read from the class, so both stay in sync)."""
+    student = SimulatedStudent(profile_type=profile_type)
+    return {
+        "learning_rate": student.learning_rate,
+        "fatigue_accrual": student.fatigue_accrual,
+        "base_knowledge": student.base_knowledge,
+        "resilience": student.resilience,
+    }
+
+
+class Curriculum:
+    """KnowledgeGraphMock as index arrays: concept i <-> column i of the population matrices."""
+
+    def __init__(self, kg):
+        self.ids = list(kg.concepts)
+        index = {cid: i for i, cid in enumerate(self.ids)}
+        self.size = len(self.ids)
+        self.difficulty = np.array([kg.get_concept(cid)["difficulty"] for cid in self.ids])
+        self.is_remedial = np.array(["_rem" in cid for cid in self.ids])
+        self.path = np.array([index[cid] for cid in kg.get_linear_path()])
+
+        # remedial[c]: remedial concept of c (-1 if none); target[r]: the concept remedial r supports
+        self.remedial = np.full(self.size, -1)
+        self.target = np.full(self.size, -1)
+        for cid in self.ids:
+            rem = kg.get_remedial(cid)
+            if rem:
+                self.remedial[index[cid]] = index[rem["id"]]
+                self.target[index[rem["id"]]] = index[cid]
+
+        # prerequisites[c, p]: p must be passed before c is unlocked
+        self.prerequisites = np.zeros((self.size, self.size), dtype=bool)
+        for src, dst in kg.graph.edges:
+            self.prerequisites[index[dst], index[src]] = True
+
+
+class StudentPopulation:
+    """
+    Knowledge (n, concepts), fatigue, failure counters and outcome statistics of n students.
+    `step` applies SimulatedStudent.learn + attempt_quiz to a subset of rows in one pass.
+    """
+
+    def __init__(self, n, curriculum, profile_type="struggling", rng=None):
+        params = profile_parameters(profile_type)
+        self.n = n
+        self.curriculum = curriculum
+        self.rng = rng or np.random.default_rng()
+        self.learning_rate = params["learning_rate"]
+        self.fatigue_accrual = params["fatigue_accrual"]
+        self.resilience = params["resilience"]
+        self.base_knowledge = params["base_knowledge"]
+
+        self.knowledge = np.full((n, curriculum.size), self.base_knowledge)
+        self.fatigue = np.zeros(n)
+        self.consecutive_failures = np.zeros(n, dtype=np.int64)
+        self.dropped_out = np.zeros(n, dtype=bool)
+        self.passed = np.zeros((n, curriculum.size), dtype=bool)
+
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.failures = np.zeros(n, dtype=np.int64)
+        self.total_score = np.zeros(n)
+
+    @property
+    def completed(self):
+        return self.passed[:, self.curriculum.path].all(axis=1) & ~self.dropped_out
+
+    @property
+    def active(self):
+        return ~self.dropped_out & ~self.passed[:, self.curriculum.path].all(axis=1)
+
+    def unlocked(self, rows):
+        """(len(rows), concepts) bool: every prerequisite passed. Remedials follow their target concept."""
+        blocked = (self.curriculum.prerequisites[None, :, :] & ~self.passed[rows, None, :]).any(axis=2)
+        unlocked = ~blocked
+        has_target = self.curriculum.target >= 0
+        unlocked[:, has_target] = unlocked[:, self.curriculum.target[has_target]]
+        return unlocked
+
+    def open_concepts(self, rows):
+        """Unlocked core concepts not passed yet, plus the remedials of those concepts."""
+        curriculum = self.curriculum
+        open_concepts = self.unlocked(rows) & ~self.passed[rows]
+        open_concepts[:, curriculum.is_remedial] = False
+        has_target = curriculum.target >= 0
+        open_concepts[:, has_target] = open_concepts[:, curriculum.target[has_target]]
+        return open_concepts
+
+    def action_mask(self, rows, action_dim):
+        """open_concepts padded to the agent's action space (curriculum concept i = action i)."""
+        mask = np.zeros((len(rows), action_dim), dtype=bool)
+        mask[:, : self.curriculum.size] = self.open_concepts(rows)
+        return mask
+
+    def reset_rows(self, rows):
+        """Starts the given students over (new episodes in the RL environment)."""
+        self.knowledge[rows] = self.base_knowledge
+        self.fatigue[rows] = 0.0
+        self.consecutive_failures[rows] = 0
+        self.dropped_out[rows] = False
+        self.passed[rows] = False
+        self.steps[rows] = 0
+        self.failures[rows] = 0
+        self.total_score[rows] = 0.0
+
+    def step(self, rows, concepts):
+        """One learn + quiz of concept concepts[i] by student rows[i]. Returns whether each passed."""
+        difficulty = self.curriculum.difficulty[concepts]
+        is_remedial = self.curriculum.is_remedial[concepts]
+
+        # 1. Learn (Zone of Proximal Development, remedial boost, fatigue penalty)
+        current_k = self.knowledge[rows, concepts]
+        gap = difficulty - current_k
+        gain = np.where(gap > 0.4, 0.2, np.where(gap < -0.2, 0.5, 1.5)) * self.learning_rate
+        gain *= np.where(is_remedial, 4.0, 1.0)
+        gain *= 1.0 - np.minimum(0.95, self.fatigue[rows])
+        current_k = np.minimum(1.0, current_k + gain)
+        self.knowledge[rows, concepts] = current_k
+        fatigue = np.minimum(1.0, self.fatigue[rows] + self.fatigue_accrual)
+
+        # 2. Quiz
+        advantage = current_k - difficulty * 0.1
+        passed = self.rng.random(len(rows)) < 1 / (1 + np.exp(-8 * advantage))
+        score = np.where(passed, self.rng.uniform(0.70, 1.0, len(rows)), self.rng.uniform(0.30, 0.69, len(rows)))
+
+        failures = np.where(passed, 0, self.consecutive_failures[rows] + 1)
+        self.consecutive_failures[rows] = failures
+        self.fatigue[rows] = np.where(passed, np.maximum(0.0, fatigue - 0.4), np.minimum(1.0, fatigue + 0.05))
+        self.dropped_out[rows] |= failures >= self.resilience
+
+        self.passed[rows[passed], concepts[passed]] = True
+        self.steps[rows] += 1
+        self.failures[rows] += ~passed
+        self.total_score[rows] += score
+        return passed
+
+    def rl_states(self, rows, knowledge_slots):
+        """
+        RL state vectors in RLEngine._vectorize_state order: [Knowledge | Behavior | Cognitive | Prefs].
+        Concept i of the curriculum occupies knowledge slot (and action) i.
+        """
+        n = len(rows)
+        states = np.zeros((n, knowledge_slots + 11), dtype=np.float32)
+        states[:, : self.curriculum.size] = self.knowledge[rows]
+        fatigue = self.fatigue[rows]
+        error_rate = self.failures[rows] / np.maximum(1, self.steps[rows])
+        # Behavior: procrastination, gaming, engagement, hint, error
+        states[:, knowledge_slots + 0] = fatigue
+        states[:, knowledge_slots + 2] = 1.0 - fatigue
+        states[:, knowledge_slots + 4] = error_rate
+        # Cognitive (memory, attention) and preferences (visual, auditory, kinesthetic, reading) at their defaults
+        states[:, knowledge_slots + 5 : knowledge_slots + 7] = 0.5
+        states[:, knowledge_slots + 7 :] = 0.25
+        return states
+
+
+class PathPolicy:
+    """The linear path of run_group: "static" retries a failed concept, "adaptive" inserts its remedial first."""
+
+    def __init__(self, adaptive):
+        self.name = "adaptive" if adaptive else "static"
+        self.adaptive = adaptive
+
+    def reset(self, population):
+        self.position = np.zeros(population.n, dtype=np.int64)
+        self.in_remedial = np.zeros(population.n, dtype=bool)
+
+    def select(self, population, rows):
+        curriculum = population.curriculum
+        core = curriculum.path[self.position[rows]]
+        return np.where(self.in_remedial[rows], curriculum.remedial[core], core)
+
+    def observe(self, population, rows, concepts, passed):
+        in_remedial = self.in_remedial[rows]
+        # Passed remedial -> back to the original concept; passed original -> next concept on the path
+        self.position[rows[passed & ~in_remedial]] += 1
+        self.in_remedial[rows[passed & in_remedial]] = False
+        if self.adaptive:
+            # Failed original with a remedial available -> remedial first (a failed remedial is retried)
+            start = ~passed & ~in_remedial & (population.curriculum.remedial[concepts] >= 0)
+            self.in_remedial[rows[start]] = True
+
+
+class RLPolicy:
+    """Batched RLAgent.select_actions over unlocked, not yet passed concepts (and their remedials)."""
+
+    name = "rl"
+
+    def __init__(self, agent):
+        self.agent = agent
+        self.knowledge_slots = agent.input_dim - 11
+
+    def reset(self, population):
+        pass
+
+    def select(self, population, rows):
+        mask = population.action_mask(rows, self.agent.output_dim)
+        return self.agent.select_actions(population.rl_states(rows, self.knowledge_slots), mask)
+
+    def observe(self, population, rows, concepts, passed):
+        pass
+
+
+def load_rl_agent(weights=None, epsilon=0.0, **agent_kwargs):
+    """The service's RLAgent with its bundled weights (or `weights`), in eval mode."""
+    # The service settings are read at import time; nothing here connects to Redis or Postgres
+    os.environ.setdefault("REDIS_URL", "redis://localhost:6379/0")
+    os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+    if ML_SERVICE_DIR not in sys.path:
+        sys.path.insert(0, ML_SERVICE_DIR)
+    import torch
+    from src.config import settings
+    from src.models.rl import RLAgent
+
+    agent_kwargs.setdefault("memory_capacity", 1)
+    agent = RLAgent(settings.INPUT_DIM_RL + 11, settings.OUTPUT_DIM_RL, **agent_kwargs)
+    if weights:
+        agent.policy_net.load_state_dict(torch.load(weights, map_location="cpu"))
+    agent.policy_net.eval()
+    agent.epsilon = epsilon
+    return agent
+
+
+def make_policy(name, rl_weights=None, epsilon=0.0):
+    if name == "static":
+        return PathPolicy(adaptive=False)
+    if name == "adaptive":
+        return PathPolicy(adaptive=True)
+    if name == "rl":
+        return RLPolicy(load_rl_agent(rl_weights, epsilon))
+    raise ValueError(f"Unknown policy: {name}")
+
+
+def simulate(policy, population, max_steps=1000):
+    """Runs ticks until every student completed or dropped out (or max_steps). Returns the tick count."""
+    policy.reset(population)
+    for tick in range(max_steps):
+        rows = np.flatnonzero(population.active)
+        if len(rows) == 0:
+            return tick
+        concepts = policy.select(population, rows)
+        passed = population.step(rows, concepts)
+        policy.observe(population, rows, concepts, passed)
+    return max_steps
+
+
+def summarize(population):
+    """Sums over the shard, merged across shards by `merge`."""
+    quizzes = population.steps
+    avg_score = np.where(quizzes > 0, population.total_score / np.maximum(1, quizzes), 0.0)
+    return {
+        "students": population.n,
+        "completed": int(population.completed.sum()),
+        "dropped_out": int(population.dropped_out.sum()),
+        "avg_score": float(avg_score.sum()),
+        "steps": int(quizzes.sum()),
+        "fatigue": float(population.fatigue.sum()),
+    }
+
+
+def _simulate_shard(policy_name, n, profile_type, seed, max_steps, rl_weights, epsilon):
+    if policy_name == "rl":
+        import torch
+
+        torch.set_num_threads(1)  # One core per pool process
+    curriculum = Curriculum(KnowledgeGraphMock())
+    population = StudentPopulation(n, curriculum, profile_type, np.random.default_rng(seed))
+    simulate(make_policy(policy_name, rl_weights, epsilon), population, max_steps)
+    return summarize(population)
+
+
+def merge(summaries):
+    total = {key: sum(s[key] for s in summaries) for key in summaries[0]}
+    n = total["students"]
+    return {
+        "completion_rate": total["completed"] / n,
+        "dropout_rate": total["dropped_out"] / n,
+        # Neither finished nor dropped out within max_steps (e.g. a policy cycling between concepts)
+        "unfinished_rate": (n - total["completed"] - total["dropped_out"]) / n,
+        "avg_score": total["avg_score"] / n,
+        "avg_steps": total["steps"] / n,
+        "avg_fatigue": total["fatigue"] / n,
+        "student_steps": total["steps"],
+    }
+
+
+def run_policy(pool, policy_name, args):
+    shards = [min(args.shard_size, args.students - start) for start in range(0, args.students, args.shard_size)]
+    futures = [
+        pool.submit(
+            _simulate_shard,
+            policy_name,
+            size,
+            args.profile,
+            args.seed * 100003 + i,
+            args.max_steps,
+            args.rl_weights,
+            args.epsilon,
+        )
+        for i, size in enumerate(shards)
+    ]
+    return merge([f.result() for f in futures])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=100000)
+    parser.add_argument("--profile", default="struggling", choices=["strong", "average", "struggling"])
+    parser.add_argument("--policies", nargs="+", default=["static", "adaptive"], choices=["static", "adaptive", "rl"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--shard-size", type=int, default=25000, help="Students per pool task")
+    parser.add_argument("--max-steps", type=int, default=1000)
+    parser.add_argument("--rl-weights", default=None, help="DQN state_dict (default: the service's rl_model.pth)")
+    parser.add_argument("--epsilon", type=float, default=0.0, help="Exploration rate of the rl policy")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"Population: {args.students} students (profile: {args.profile}), {args.workers} processes")
+    results = {}
+    with ProcessPoolExecutor(args.workers) as pool:
+        for name in args.policies:
+            start = time.perf_counter()
+            results[name] = run_policy(pool, name, args)
+            elapsed = time.perf_counter() - start
+            print(f"[{name}] {elapsed:.2f}s, {results[name]['student_steps'] / elapsed:,.0f} student-steps/s")
+
+    print("\n--- POLICY COMPARISON ---")
+    print(f"{'Metric':<20} | " + " | ".join(f"{name:<12}" for name in results))
+    print("-" * (23 + 15 * len(results)))
+    rows = [
+        ("Completion Rate", "completion_rate", "{:<12.1%}"),
+        ("Dropout Rate", "dropout_rate", "{:<12.1%}"),
+        ("Unfinished", "unfinished_rate", "{:<12.1%}"),
+        ("Avg Quiz Score", "avg_score", "{:<12.2%}"),
+        ("Avg Steps Taken", "avg_steps", "{:<12.1f}"),
+        ("Final Fatigue", "avg_fatigue", "{:<12.2f}"),
+    ]
+    for label, key, fmt in rows:
+        print(f"{label:<20} | " + " | ".join(fmt.format(r[key]) for r in results.values()))
+
+
+if __name__ == "__main__":
+    main()